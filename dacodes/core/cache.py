@@ -0,0 +1,12 @@
+from django.core.cache import caches
+
+SHARED_CACHE = 'shared'
+
+
+def shared_cache():
+    """
+    cache seen by every worker, for the state that must not diverge between
+    processes (revoked tokens, content versions, the users that read from
+    the primary), it can not be process local (see core.checks)
+    """
+    return caches[SHARED_CACHE]
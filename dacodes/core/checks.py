@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .cache import SHARED_CACHE
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    the state of core.cache.shared_cache must be seen by every worker, a
+    backend local to the process would let them disagree on it
+    """
+    backend = settings.CACHES.get(SHARED_CACHE, {}).get('BACKEND')
+
+    if backend is None:
+        return [Error(
+            f"The '{SHARED_CACHE}' cache is not configured.",
+            hint="Add it to CACHES with a backend every worker can reach.",
+            id='core.E001',
+        )]
+
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"The '{SHARED_CACHE}' cache uses {backend}, which is local to the process.",
+            hint="Use the database cache, memcached or another backend every worker can reach.",
+            id='core.E002',
+        )]
+
+    return []
@@ -0,0 +1,124 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .cache import shared_cache
+
+STICKY_CACHE_KEY = 'core:user:{}:primary'
+
+
+class RoutingState:
+    """
+    database routing of the request being served, created by the middleware
+    """
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def get_routing_state():
+    return _state.get()
+
+
+@contextmanager
+def routing_state():
+    token = _state.set(RoutingState())
+
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def use_replica(state):
+    """
+    send the reads of the request to a replica, the same one for all of them
+    """
+    replicas = getattr(settings, 'REPLICA_DATABASES', [])
+
+    if state is not None and replicas and not state.wrote:
+        state.replica = random.choice(replicas)
+
+
+@contextmanager
+def primary_reads():
+    """
+    read from the primary inside the block, for results that are cached by a
+    version the replicas may not have caught up with
+    """
+    state = _state.get()
+    replica = state.replica if state is not None else None
+
+    if replica is not None:
+        state.replica = None
+
+    try:
+        yield
+    finally:
+        if replica is not None:
+            state.replica = replica
+
+
+def _sticky_cache_key(user_id):
+    return STICKY_CACHE_KEY.format(user_id)
+
+
+def stick_to_primary(user_id):
+    """
+    read from the primary the requests of the user for a while, so they see
+    their own writes before the replicas catch up, on whichever worker they
+    are served
+    """
+    if getattr(settings, 'REPLICA_DATABASES', []):
+        shared_cache().set(
+            _sticky_cache_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user_id):
+    if not getattr(settings, 'REPLICA_DATABASES', []):
+        return False
+
+    return shared_cache().get(_sticky_cache_key(user_id), False)
+
+
+class ReplicaRouter:
+    """
+    Writes, transactions and every read that is not of a read-only request
+    go to the primary, the reads of the read-only requests chosen by
+    ReplicaReadViewSet go to a replica
+    """
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+
+        # the database cache holds the shared state of the workers
+        if (state is None or state.replica is None or state.wrote
+                or model._meta.app_label == 'django_cache'):
+            return DEFAULT_DB_ALIAS
+
+        # reads inside a transaction must see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+
+        # a write of the database cache is not a write of the request
+        if state is not None and model._meta.app_label != 'django_cache':
+            state.wrote = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
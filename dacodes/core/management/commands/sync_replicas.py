@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the sqlite primary database over the files of the replicas "
+        "(REPLICA_DATABASES), the local stand-ins of the read replicas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help="keep copying every INTERVAL seconds, simulating the replica lag")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replicas = [connections[alias].settings_dict for alias in settings.REPLICA_DATABASES]
+
+        if not replicas:
+            raise CommandError("There are no replicas, set DATABASE_REPLICAS")
+
+        for settings_dict in [primary] + replicas:
+            if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError("Only sqlite databases can be copied")
+
+        while True:
+            start = time.perf_counter()
+            self.copy(primary['NAME'], [replica['NAME'] for replica in replicas])
+            self.stdout.write(
+                f"copied to {len(replicas)} replicas in {time.perf_counter() - start:.2f}s")
+
+            if options['interval'] is None:
+                return
+
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_names):
+        # the backup API copies a consistent snapshot while the primary is written
+        source = sqlite3.connect(str(source_name))
+
+        try:
+            for target_name in target_names:
+                target = sqlite3.connect(str(target_name))
+
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
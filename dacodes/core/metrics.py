@@ -0,0 +1,168 @@
+import threading
+import time
+from bisect import bisect_left
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class QueryRecorder:
+    """
+    execute wrapper that counts the queries and adds up their time
+    """
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+
+    if not pairs:
+        return ''
+
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labels, labels), value
+
+
+class Histogram:
+    """
+    cumulative buckets as Prometheus expects them, an observation is a
+    binary search and three additions under a lock
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            counts, total = self._values.get(labels, (None, 0))
+
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + (float('inf'), ), counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket',
+                    _labels(self.labels, labels, [('le', _number(bound))]),
+                    cumulative
+                )
+
+            yield f'{self.name}_sum', _labels(self.labels, labels), total
+            yield f'{self.name}_count', _labels(self.labels, labels), cumulative
+
+
+class Registry:
+    """
+    metrics of the process, every worker process serves its own
+    """
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+        return metric
+
+    def render(self):
+        """
+        Prometheus text exposition format 0.0.4
+        """
+        lines = []
+
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'http_requests_total',
+    "Requests by route, method and status code.",
+    labels=('route', 'method', 'status')
+))
+REQUEST_DURATION = registry.register(Histogram(
+    'http_request_duration_seconds',
+    "Time to build the response of a request.",
+    labels=('route', 'method')
+))
+REQUEST_PHASE_DURATION = registry.register(Histogram(
+    'http_request_phase_duration_seconds',
+    "Time of a request spent in the database, in the view (serialization "
+    "included) and rendering the response.",
+    labels=('route', 'phase')
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    'http_request_db_queries',
+    "Database queries executed by a request.",
+    labels=('route', ),
+    buckets=QUERY_BUCKETS
+))
@@ -0,0 +1,206 @@
+import asyncio
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .db_router import routing_state, stick_to_primary
+from .metrics import (
+    REQUEST_DURATION,
+    REQUEST_PHASE_DURATION,
+    REQUEST_QUERIES,
+    REQUESTS,
+    QueryRecorder,
+)
+
+
+def get_route(view_func, request):
+    """
+    label of the view of a request, ``LessonsAvailableViewSet.send_test`` for
+    the actions of a viewset
+    """
+    view_class = getattr(view_func, 'cls', None)
+
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+
+    if action is None:
+        return view_class.__name__
+
+    return f'{view_class.__name__}.{action}'
+
+
+@contextmanager
+def record_queries(request):
+    """
+    count the queries of the request run by the current thread
+    """
+    timing = getattr(request, '_timing', None)
+
+    with ExitStack() as stack:
+        if timing is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing.queries))
+
+        yield
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.route = 'unmatched'
+        self.queries = QueryRecorder()
+        self.view_start = None
+        self.view_end = None
+        self.view_db_time = 0.0
+        self.render_end = None
+
+    def mark_view_start(self):
+        self.view_start = time.perf_counter()
+        self.view_db_time = self.queries.time
+
+    def mark_view_end(self):
+        if self.view_end is None:
+            self.view_end = time.perf_counter()
+            self.view_db_time = self.queries.time - self.view_db_time
+
+    def mark_render_end(self, response):
+        self.render_end = time.perf_counter()
+
+    def phases(self, end):
+        """
+        seconds spent in the database, in the view without its queries and
+        rendering the response
+        """
+        phases = {'db': self.queries.time}
+
+        if self.view_start is not None:
+            view_end = self.view_end or end
+            phases['view'] = max(view_end - self.view_start - self.view_db_time, 0.0)
+            phases['render'] = (self.render_end - view_end) if self.render_end else 0.0
+
+        return phases
+
+
+class ServerTimingMiddleware:
+    """
+    Time the database queries, the view and the render of every request. The
+    timings are sent in a ``Server-Timing`` header and aggregated by route
+    into the histograms served by the metrics view
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, 'SERVER_TIMING_HEADER', True)
+        self._async = asyncio.iscoroutinefunction(get_response)
+
+        if self._async:
+            # marks the instance as a coroutine function for the handler
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        timing = request._timing = RequestTiming()
+
+        with record_queries(request):
+            response = self.get_response(request)
+
+        return self.finish(request, timing, response)
+
+    async def __acall__(self, request):
+        timing = request._timing = RequestTiming()
+
+        with record_queries(request):
+            response = await self.get_response(request)
+
+        return self.finish(request, timing, response)
+
+    def finish(self, request, timing, response):
+        end = time.perf_counter()
+        timing.mark_view_end()
+        total = end - timing.start
+        phases = timing.phases(end)
+
+        REQUESTS.inc(timing.route, request.method, str(response.status_code))
+        REQUEST_DURATION.observe(total, timing.route, request.method)
+        REQUEST_QUERIES.observe(timing.queries.count, timing.route)
+
+        for phase, duration in phases.items():
+            REQUEST_PHASE_DURATION.observe(duration, timing.route, phase)
+
+        if self.header:
+            response['Server-Timing'] = ', '.join(
+                [f'db;dur={phases["db"] * 1000:.3f};desc="{timing.queries.count} queries"']
+                + [
+                    f'{phase};dur={duration * 1000:.3f}'
+                    for phase, duration in phases.items() if phase != 'db'
+                ]
+                + [f'total;dur={total * 1000:.3f}']
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, '_timing', None)
+
+        if timing is not None:
+            timing.route = get_route(view_func, request)
+            timing.mark_view_start()
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, '_timing', None)
+
+        if timing is not None and not response.is_rendered:
+            timing.mark_view_end()
+            response.add_post_render_callback(timing.mark_render_end)
+
+        return response
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Hold the database routing state of every request. The reads go to the
+    primary unless the view chooses a replica, and a user that wrote reads
+    from the primary for REPLICA_STICKY_SECONDS
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._async = asyncio.iscoroutinefunction(get_response)
+
+        if self._async:
+            # marks the instance as a coroutine function for the handler
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        with routing_state() as state:
+            response = self.get_response(request)
+
+        return self.finish(request, state, response)
+
+    async def __acall__(self, request):
+        with routing_state() as state:
+            response = await self.get_response(request)
+
+        return self.finish(request, state, response)
+
+    def finish(self, request, state, response):
+        user = getattr(request, 'user', None)
+
+        if state.wrote and user is not None and user.is_authenticated:
+            stick_to_primary(user.pk)
+
+        return response
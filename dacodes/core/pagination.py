@@ -0,0 +1,194 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_CACHE_KEY = 'core:count:{}'
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Cursor pagination over (created_at, id) of TimeStampedModel querysets.
+
+    http://api.example.org/courses/?limit=100
+    http://api.example.org/courses/?cursor=<opaque cursor>&limit=100
+    http://api.example.org/courses/?cursor=<opaque cursor>&count=true
+
+    Pages are read with an indexed range condition instead of skipping rows
+    and the total is only computed, and cached, when ``count`` is requested.
+    Requests with ``offset`` keep the limit/offset behaviour.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.offset_query_param in request.query_params:
+            self.use_cursor = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.use_cursor = True
+        self.limit = self.get_limit(request)
+
+        if self.limit is None:
+            return None
+
+        self.request = request
+        self.count = None
+
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor['reverse']
+
+        if reverse:
+            queryset = queryset.order_by('-created_at', '-id')
+        else:
+            queryset = queryset.order_by('created_at', 'id')
+
+        if cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(cursor))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+
+        return results
+
+    def get_position_filter(self, cursor):
+        created_at = cursor['created_at']
+        pk = cursor['id']
+
+        # NULL created_at sort first on ascending order
+        if not cursor['reverse']:
+            if created_at is None:
+                return Q(created_at__isnull=True, id__gt=pk) | Q(created_at__isnull=False)
+
+            return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+        if created_at is None:
+            return Q(created_at__isnull=True, id__lt=pk)
+
+        return (Q(created_at__isnull=True)
+                | Q(created_at__lt=created_at)
+                | Q(created_at=created_at, id__lt=pk))
+
+    def get_count(self, queryset):
+        """
+        total rows of the queryset, cached for a few seconds
+        """
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 30)
+
+        try:
+            sql = str(queryset.query)
+        except Exception:
+            return super().get_count(queryset)
+
+        key = COUNT_CACHE_KEY.format(hashlib.md5(sql.encode()).hexdigest())
+        count = cache.get(key)
+
+        if count is None:
+            count = super().get_count(queryset)
+            cache.set(key, count, timeout)
+
+        return count
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        response = OrderedDict()
+
+        if self.count is not None:
+            response['count'] = self.count
+
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['nullable'] = True
+
+        return response_schema
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+
+        if not self.has_next or len(self.page) == 0:
+            return None
+
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+
+        if not self.has_previous or len(self.page) == 0:
+            return None
+
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        position = {
+            'c': instance.created_at.isoformat() if instance.created_at else None,
+            'i': instance.pk,
+            'r': reverse,
+        }
+        token = urlsafe_b64encode(
+            json.dumps(position, separators=(',', ':')).encode()
+        ).decode()
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+
+        if not token:
+            return None
+
+        try:
+            position = json.loads(urlsafe_b64decode(token.encode()).decode())
+            created_at = position['c']
+
+            if created_at is not None:
+                created_at = parse_datetime(created_at)
+
+                if created_at is None:
+                    raise ValueError(position['c'])
+
+            return {
+                'created_at': created_at,
+                'id': int(position['i']),
+                'reverse': bool(position['r']),
+            }
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
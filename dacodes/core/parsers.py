@@ -0,0 +1,104 @@
+import io
+import json
+from collections import namedtuple
+
+import numpy as np
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONStream:
+    """
+    decoded elements of a NDJSON body, read lazily one line at a time, a line
+    that can not be decoded is an element too, as a ``ParseError``
+    """
+    def __init__(self, stream, encoding):
+        self._stream = stream
+        self._encoding = encoding
+
+    def __iter__(self):
+        for number, element in self.numbered():
+            yield element
+
+    def numbered(self):
+        """
+        (line number, element) pairs, the blank lines are skipped so the
+        position of an element is not its line
+        """
+        if self._stream is None:
+            return
+
+        for number, line in enumerate(self._stream, start=1):
+            line = line.strip()
+
+            if not line:
+                continue
+
+            try:
+                yield number, json.loads(line.decode(self._encoding))
+            except ValueError as ex:
+                yield number, ParseError(f"line {number}: {ex}")
+
+
+def numbered(elements):
+    """
+    (line number, element) of the elements of a NDJSON body, the position of
+    the element for any other iterable
+    """
+    if isinstance(elements, NDJSONStream):
+        return elements.numbered()
+
+    return enumerate(elements, start=1)
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline delimited JSON, the body is read lazily one line at a time so
+    ``request.data`` is a ``NDJSONStream`` of the decoded elements
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+
+        return NDJSONStream(stream, encoding)
+
+
+CSVTable = namedtuple('CSVTable', ['header', 'rows'])
+
+
+class CSVParser(BaseParser):
+    """
+    Comma separated integers with an optional header row, the body is parsed
+    straight into a 2-D NumPy array so ``request.data`` is a
+    ``CSVTable(header, rows)`` where ``header`` is None when it was not sent
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+
+        if stream is None:
+            return CSVTable(None, np.empty((0, 0), dtype=np.int64))
+
+        lines = stream.read().decode(encoding).lstrip().split('\n', 1)
+        header = None
+
+        if any(character.isalpha() for character in lines[0]):
+            header = [column.strip() for column in lines.pop(0).split(',')]
+
+        text = '\n'.join(lines)
+
+        if not text.strip():
+            return CSVTable(header, np.empty((0, len(header or [])), dtype=np.int64))
+
+        try:
+            rows = np.loadtxt(
+                io.StringIO(text), delimiter=',', dtype=np.int64, ndmin=2)
+        except ValueError as ex:
+            raise ParseError(f"CSV parse error - {ex}")
+
+        return CSVTable(header, rows)
@@ -1,10 +1,13 @@
 from rest_framework import permissions
 
+from .roles import has_role
+
+
 class HasValidTeacherRole(permissions.BasePermission):
     message = 'Role not allowed'
 
     def has_permission(self, request, view):
-        if not request.user.groups.filter(name__in=["TEACHER"]).exists():
+        if not has_role(request.user, "TEACHER"):
             return False
 
         return True
@@ -14,7 +17,7 @@ class HasValidStudentRole(permissions.BasePermission):
     message = 'Role not allowed'
 
     def has_permission(self, request, view):
-        if not request.user.groups.filter(name__in=["STUDENT"]).exists():
+        if not has_role(request.user, "STUDENT"):
             return False
 
-        return True
\ No newline at end of file
+        return True
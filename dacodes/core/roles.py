@@ -0,0 +1,66 @@
+import time
+
+# seconds the roles of a user are kept in the memory of the process. The
+# groups changes are only invalidated in the process that made them, the
+# other workers read the groups again at most this long after the change
+ROLES_LOCAL_CACHE_TIMEOUT = 5
+ROLES_LOCAL_CACHE_SIZE = 10000
+
+_local_roles = {}
+
+
+def get_user_roles(user):
+    """
+    names of the groups of the user, resolved once per request and cached
+    in the process for a few seconds
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_cached_roles', None)
+
+    if roles is not None:
+        return roles
+
+    roles = _get_local_roles(user.pk)
+
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        _set_local_roles(user.pk, roles)
+
+    user._cached_roles = roles
+
+    return roles
+
+
+def has_role(user, *roles):
+    return not get_user_roles(user).isdisjoint(roles)
+
+
+def invalidate_user_roles(*user_ids):
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+
+    for user_id in user_ids:
+        _local_roles.pop(user_id, None)
+
+
+def _get_local_roles(user_id):
+    entry = _local_roles.get(user_id)
+
+    if entry is None:
+        return None
+
+    expires, roles = entry
+
+    if expires < time.monotonic():
+        _local_roles.pop(user_id, None)
+        return None
+
+    return roles
+
+
+def _set_local_roles(user_id, roles):
+    if len(_local_roles) >= ROLES_LOCAL_CACHE_SIZE:
+        _local_roles.clear()
+
+    _local_roles[user_id] = (time.monotonic() + ROLES_LOCAL_CACHE_TIMEOUT, roles)
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from .tokens import REFRESH_TOKEN, InvalidToken, revoke_token, verify_token
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, data):
+        """
+        check the refresh token and that its user is still active, the token
+        is revoked here so it is accepted once even by concurrent requests
+        """
+        try:
+            claims = verify_token(data['refresh'], REFRESH_TOKEN)
+        except InvalidToken as ex:
+            raise serializers.ValidationError(str(ex), code='authorization')
+
+        user = get_user_model().objects.filter(
+            pk=claims['uid'], is_active=True
+        ).first()
+
+        if user is None:
+            raise serializers.ValidationError(
+                "User inactive or deleted.", code='authorization')
+
+        if not revoke_token(claims):
+            raise serializers.ValidationError("Token revoked.", code='authorization')
+
+        data['claims'] = claims
+        data['user'] = user
+
+        return data
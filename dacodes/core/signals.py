@@ -0,0 +1,40 @@
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .roles import invalidate_user_roles
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_user_roles(instance.pk)
+        return
+
+    # group.user_set changes, a clear does not send the affected users
+    if action == 'pre_clear':
+        instance._cleared_user_ids = list(
+            instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_user_roles(*getattr(instance, '_cleared_user_ids', []))
+    elif action.startswith('post_'):
+        invalidate_user_roles(*(pk_set or []))
+
+
+@receiver(pre_save, sender=Group)
+def group_renamed(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous_name = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('name', flat=True).first()
+
+    if previous_name != instance.name:
+        invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
@@ -1,3 +1,256 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from elearning.models import Course
+
+from .cache import SHARED_CACHE
+from .checks import check_shared_cache
+from .db_router import (
+    ReplicaRouter,
+    is_sticky,
+    primary_reads,
+    routing_state,
+    use_replica,
+)
+from .metrics import Histogram
+from .roles import get_user_roles, has_role
+from .tokens import REFRESH_TOKEN, revoke_token, verify_token
+
+
+class RolesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = Group.objects.create(name='TEACHER')
+        self.user = User.objects.create_user('user')
+        self.user.groups.add(self.teacher)
+
+    def roles(self):
+        return get_user_roles(User.objects.get(pk=self.user.pk))
+
+    def test_roles_are_resolved_once(self):
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(has_role(user, 'TEACHER'))
+            self.assertFalse(has_role(user, 'STUDENT'))
+
+        user = User.objects.get(pk=self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(has_role(user, 'TEACHER'))
+
+    def test_roles_are_invalidated_on_group_changes(self):
+        self.assertEqual(self.roles(), {'TEACHER'})
+
+        student = Group.objects.create(name='STUDENT')
+        student.user_set.add(self.user)
+        self.assertEqual(self.roles(), {'TEACHER', 'STUDENT'})
+
+        self.user.groups.remove(student)
+        self.assertEqual(self.roles(), {'TEACHER'})
+
+        self.teacher.name = 'ADMIN'
+        self.teacher.save()
+        self.assertEqual(self.roles(), {'ADMIN'})
+
+        self.teacher.user_set.clear()
+        self.assertEqual(self.roles(), set())
+
+
+class SignedTokenTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', password='student')
+        Group.objects.create(name='STUDENT').user_set.add(self.user)
+
+    def obtain(self):
+        response = self.client.post(
+            reverse('token_obtain'),
+            {'username': 'student', 'password': 'student'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return response.data
+
+    def test_access_token_is_verified_without_queries(self):
+        tokens = self.obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        # the two conditional GET validators and the course listing, neither
+        # the users nor the revocation list are read
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/elearning/students/courses/')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_rotates_and_revoke_blocks_tokens(self):
+        tokens = self.obtain()
+
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        tokens = self.obtain()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.post(
+            reverse('token_revoke'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_a_refresh_token_is_revoked_once(self):
+        claims = verify_token(self.obtain()['refresh'], REFRESH_TOKEN)
+
+        self.assertTrue(revoke_token(claims))
+        self.assertFalse(revoke_token(claims))
+
+    def test_concurrent_refreshes_of_a_token_succeed_once(self):
+        refresh = self.obtain()['refresh']
+        claims = verify_token(refresh, REFRESH_TOKEN)
+
+        # both requests verified the token before any of them revoked it
+        with patch('core.serializer.verify_token', return_value=claims):
+            responses = [
+                self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+                for _ in range(2)
+            ]
+
+        self.assertEqual([response.status_code for response in responses], [200, 400])
+
+    def test_the_shared_cache_can_not_be_process_local(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+        caches = {
+            'default': settings.CACHES['default'],
+            SHARED_CACHE: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        }
+
+        with override_settings(CACHES=caches):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['core.E002'])
+
+        with override_settings(CACHES={'default': settings.CACHES['default']}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['core.E001'])
+
+
+class ServerTimingTests(APITestCase):
+    def test_timings_are_sent_and_aggregated_by_action(self):
+        response = self.client.post(
+            reverse('logic_test'), [{'N': 1, 'M': 2}], format='json')
+
+        phases = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['db', 'view', 'render', 'total'])
+        self.assertIn('desc="0 queries"', response['Server-Timing'])
+
+        response = self.client.get('/api/elearning/students/courses/')
+        self.assertIn('Server-Timing', response)
+
+        metrics = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn(
+            'http_requests_total{route="logic_test",method="POST",status="200"}', metrics)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="CoursesAvailableViewSet.list",'
+            'method="GET",le="+Inf"}', metrics)
+        self.assertIn(
+            'http_request_phase_duration_seconds_count{route="logic_test",phase="render"}',
+            metrics)
+
+    def test_metrics_are_not_public(self):
+        remote = {'REMOTE_ADDR': '203.0.113.7'}
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), **remote).status_code, 403)
+
+        staff = User.objects.create_user('staff', password='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('metrics'), **remote).status_code, 200)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', "test", labels=('route', ), buckets=(0.1, 1))
+
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, 'a')
+
+        samples = {name + labels: value for name, labels, value in histogram.samples()}
+
+        self.assertEqual(samples['test_seconds_bucket{route="a",le="0.1"}'], 2)
+        self.assertEqual(samples['test_seconds_bucket{route="a",le="1"}'], 3)
+        self.assertEqual(samples['test_seconds_bucket{route="a",le="+Inf"}'], 4)
+        self.assertEqual(samples['test_seconds_count{route="a"}'], 4)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def test_only_the_reads_of_read_only_requests_go_to_a_replica(self):
+        self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+        with routing_state() as state:
+            self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+            use_replica(state)
+            self.assertEqual(self.router.db_for_read(User), 'replica')
+
+            with primary_reads():
+                self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+            self.assertEqual(self.router.db_for_read(User), 'replica')
+
+            # once the request writes it reads its writes
+            self.assertEqual(self.router.db_for_write(User), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+        self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaStickinessTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student')
+        self.user.groups.add(Group.objects.create(name='STUDENT'))
+        self.client.force_authenticate(self.user)
+
+    def test_users_that_write_read_from_the_primary(self):
+        course = Course.objects.create(name='basic')
+
+        self.client.get('/api/elearning/students/courses/')
+        self.assertFalse(is_sticky(self.user.pk))
+
+        response = self.client.post(reverse('course-subscribe', args=[course.id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(is_sticky(self.user.pk))
+
+    def test_writes_stick_to_the_primary_on_every_worker(self):
+        course = Course.objects.create(name='basic')
+        caches = dict(settings.CACHES, default={
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'another-worker',
+        })
+
+        self.client.post(reverse('course-subscribe', args=[course.id]))
+
+        with override_settings(CACHES=caches):
+            self.assertTrue(is_sticky(self.user.pk))
+
+    def test_reads_inside_a_transaction_go_to_the_primary(self):
+        with routing_state() as state:
+            use_replica(state)
+
+            with transaction.atomic():
+                self.assertEqual(ReplicaRouter().db_for_read(User), DEFAULT_DB_ALIAS)
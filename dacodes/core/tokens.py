@@ -0,0 +1,91 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+from .cache import shared_cache
+from .roles import get_user_roles
+
+ACCESS_TOKEN = 'access'
+REFRESH_TOKEN = 'refresh'
+
+REVOKED_TOKEN_KEY = 'core:token:revoked:{}'
+
+
+def _lifetime(token_type):
+    if token_type == ACCESS_TOKEN:
+        return getattr(settings, 'SIGNED_TOKEN_ACCESS_LIFETIME', 60 * 5)
+
+    return getattr(settings, 'SIGNED_TOKEN_REFRESH_LIFETIME', 60 * 60 * 24)
+
+
+def _salt(token_type):
+    return f'core.tokens.{token_type}'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def issue_token(user, token_type):
+    """
+    HMAC signed token with the user id and role claims
+    """
+    claims = {
+        'uid': user.pk,
+        'roles': sorted(get_user_roles(user)),
+        'jti': uuid.uuid4().hex,
+        'exp': int(time.time()) + _lifetime(token_type),
+    }
+
+    return signing.dumps(claims, salt=_salt(token_type), compress=True)
+
+
+def issue_token_pair(user):
+    return {
+        ACCESS_TOKEN: issue_token(user, ACCESS_TOKEN),
+        REFRESH_TOKEN: issue_token(user, REFRESH_TOKEN),
+    }
+
+
+def verify_token(token, token_type):
+    """
+    claims of a valid token, the signature and the expiration are checked,
+    and the revocation list of the shared cache for the refresh tokens only:
+    an access token is verified without any query, its short lifetime bounds
+    how long it outlives a revoke
+    """
+    try:
+        claims = signing.loads(
+            token,
+            salt=_salt(token_type),
+            max_age=_lifetime(token_type)
+        )
+    except signing.SignatureExpired:
+        raise InvalidToken('Token expired.')
+    except signing.BadSignature:
+        raise InvalidToken('Invalid token.')
+
+    if claims.get('exp', 0) < time.time():
+        raise InvalidToken('Token expired.')
+
+    if (token_type == REFRESH_TOKEN
+            and shared_cache().get(REVOKED_TOKEN_KEY.format(claims['jti'])) is not None):
+        raise InvalidToken('Token revoked.')
+
+    return claims
+
+
+def revoke_token(claims):
+    """
+    keep the token in the revocation list until it would expire anyway, the
+    add is atomic so it returns False for every request but the first one
+    that revokes the token
+    """
+    remaining = int(claims['exp'] - time.time())
+
+    if remaining <= 0:
+        return False
+
+    return shared_cache().add(REVOKED_TOKEN_KEY.format(claims['jti']), True, remaining)
@@ -1,4 +1,20 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.http import http_date, parse_http_date_safe
+
+from rest_framework import permissions, status
+from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .db_router import get_routing_state, is_sticky, use_replica
+from .metrics import registry
+from .serializer import RefreshTokenSerializer
+from .tokens import issue_token_pair
 
 
 class MultiSerializerViewSet(object):
@@ -9,3 +25,179 @@ class MultiSerializerViewSet(object):
             return self.custom_serializer_classes[self.action]
         except (KeyError, AttributeError):
             return super(MultiSerializerViewSet, self).get_serializer_class()
+
+
+class ReplicaReadViewSet(object):
+    """
+    the reads of the read-only actions go to a replica, unless the user wrote
+    in the last REPLICA_STICKY_SECONDS
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if (request.method in permissions.SAFE_METHODS
+                and self.action in self.replica_actions
+                and not is_sticky(request.user.pk)):
+            use_replica(get_routing_state())
+
+
+class ConditionalGetViewSet(object):
+    """
+    Conditional GET (ETag / Last-Modified) for viewsets of TimeStampedModel,
+    the validators come from MAX(updated_at) and COUNT(*) of the querysets the
+    response depends on, so a 304 is answered without loading or serializing.
+    A deleted row does not move MAX(updated_at), Last-Modified is only used
+    by the actions whose rows can not be deleted without a 404
+    """
+    conditional_actions = ('list', 'retrieve')
+    last_modified_actions = ('retrieve', )
+
+    def get_validator_querysets(self):
+        """ Return the querysets whose rows the response is built from."""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+        return [queryset]
+
+    def get_validators(self, request):
+        parts = [request.get_full_path(), request.user.pk]
+        last_modified = None
+
+        for queryset in self.get_validator_querysets():
+            values = queryset.order_by().aggregate(
+                last_modified=Max('updated_at'),
+                count=Count('pk')
+            )
+            parts.append((
+                queryset.model._meta.label,
+                values['count'],
+                values['last_modified'].isoformat() if values['last_modified'] else None,
+            ))
+
+            if values['last_modified'] is not None:
+                if last_modified is None or values['last_modified'] > last_modified:
+                    last_modified = values['last_modified']
+
+        etag = 'W/"{}"'.format(hashlib.md5(repr(parts).encode()).hexdigest())
+
+        return etag, last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+        if if_none_match:
+            etags = [value.strip() for value in if_none_match.split(',')]
+            return etag in etags or '*' in etags
+
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+
+        if if_modified_since is not None and last_modified is not None:
+            return int(last_modified.timestamp()) <= if_modified_since
+
+        return False
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+
+        return response
+
+    def conditional(self, request, handler, *args, **kwargs):
+        if request.method != 'GET' or self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(request)
+
+        if self.action not in self.last_modified_actions:
+            last_modified = None
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        return self.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, super(ConditionalGetViewSet, self).list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            request, super(ConditionalGetViewSet, self).retrieve, *args, **kwargs)
+
+
+class ObtainSignedTokenView(APIView):
+    """
+    exchange username and password for a signed access and refresh token pair
+    """
+    permission_classes = (permissions.AllowAny, )
+    authentication_classes = ()
+    serializer_class = AuthTokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        tokens = issue_token_pair(serializer.validated_data['user'])
+
+        return Response(tokens, status=status.HTTP_200_OK)
+
+
+class RefreshSignedTokenView(APIView):
+    """
+    exchange a refresh token for a new token pair, the refresh token is revoked
+    """
+    permission_classes = (permissions.AllowAny, )
+    authentication_classes = ()
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        tokens = issue_token_pair(serializer.validated_data['user'])
+
+        return Response(tokens, status=status.HTTP_200_OK)
+
+
+class RevokeSignedTokenView(APIView):
+    """
+    revoke a refresh token, the access tokens already issued are valid until
+    they expire (SIGNED_TOKEN_ACCESS_LIFETIME)
+    """
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def metrics(request):
+    """
+    request metrics of the process in the Prometheus text format, for the
+    scrapers of METRICS_ALLOWED_IPS and the staff
+    """
+    if (request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+            and not request.user.is_staff):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,10 +41,13 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'drf_yasg',
+    'core',
     'elearning',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +88,49 @@ DATABASES = {
     }
 }
 
+# read replicas of the default database, the read-only student endpoints read
+# from them. DATABASE_REPLICAS=2 sets up two copies of the sqlite file as
+# stand-ins, refreshed with the sync_replicas command
+REPLICA_DATABASES = []
+
+for index in range(int(os.environ.get('DATABASE_REPLICAS', 0))):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# seconds the reads of a user go to the primary after the user writes, it
+# must be longer than the lag of the replicas
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# compiled answer keys, rendered tests and dashboards live here, every process
+# keeps its own copies, keyed by the content versions of the shared cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dacodes',
+    },
+    # revoked tokens, content versions and the users that read from the
+    # primary, every worker must see the same entries so it can not be
+    # process local (see core.checks). It is a table of the database by
+    # default (manage.py createcachetable), memcached can be set with
+    # SHARED_CACHE_BACKEND and SHARED_CACHE_LOCATION
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'core_shared_cache'),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -105,15 +152,25 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # django rest framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ]
 }
 
+# seconds the totals requested with ?count=true on list endpoints are cached
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+
+# lifetime in seconds of the signed tokens issued by api/token/, only the
+# refresh tokens are checked against the revocation list, a revoked session
+# keeps its access token for SIGNED_TOKEN_ACCESS_LIFETIME at most
+SIGNED_TOKEN_ACCESS_LIFETIME = 60 * 5
+SIGNED_TOKEN_REFRESH_LIFETIME = 60 * 60 * 24
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -133,4 +190,16 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-LOGIN_URL = '/admin/'
\ No newline at end of file
+LOGIN_URL = '/admin/'
+
+# send the Server-Timing header with the db, view and render timings of
+# every request, the histograms of /metrics are collected either way
+SERVER_TIMING_HEADER = True
+
+# addresses allowed to read /metrics without a staff session, comma separated
+# in METRICS_ALLOWED_IPS, the per route traffic and latency are not public
+METRICS_ALLOWED_IPS = [
+    address.strip()
+    for address in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if address.strip()
+]
@@ -24,6 +24,8 @@ from drf_yasg import openapi
 
 from rest_framework.authtoken import views as views_authtoken
 
+from core import views as core_views
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Elearning API",
@@ -39,8 +41,12 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     url(r'^api/api-token-auth/$', views_authtoken.obtain_auth_token),
+    url(r'^api/token/$', core_views.ObtainSignedTokenView.as_view(), name='token_obtain'),
+    url(r'^api/token/refresh/$', core_views.RefreshSignedTokenView.as_view(), name='token_refresh'),
+    url(r'^api/token/revoke/$', core_views.RevokeSignedTokenView.as_view(), name='token_revoke'),
     path('api/elearning/', include('elearning.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', core_views.metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
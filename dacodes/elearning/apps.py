@@ -1,5 +1,8 @@
 from django.apps import AppConfig
 
 
-class RetoConfig(AppConfig):
-    name = 'reto'
+class ElearningConfig(AppConfig):
+    name = 'elearning'
+
+    def ready(self):
+        from . import signals  # noqa: F401
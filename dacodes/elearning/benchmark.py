@@ -0,0 +1,370 @@
+"""
+Benchmark and query budget suite of the elearning endpoints and services.
+
+A parametrized dataset is seeded (courses x lessons x questions x enrolled
+students) and every case is run a number of times, each run inside a
+transaction that is rolled back so the writes of one run do not change the
+next one. For every case it records the queries, the SQL time, the view
+and render time of the endpoints and the wall clock percentiles.
+"""
+import random
+import time
+
+import numpy as np
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.metrics import QueryRecorder
+from core.roles import invalidate_user_roles
+
+from .models import (
+    Answer,
+    Course,
+    CourseEnrollment,
+    Lesson,
+    LessonEnrollment,
+    Question,
+)
+from .services.content import (
+    get_catalog_version,
+    get_lesson_version,
+    get_user_progress_version,
+)
+from .services.logic import LogicTest, VectorLogicTest
+from .services.progress import refresh_course_progress, refresh_lesson_progress
+from .services.review import TestReview
+
+API_PREFIX = '/api/elearning'
+
+# most queries a warm run of each case can execute (savepoints included and
+# the reads of the content versions of the shared cache), they must not grow
+# with the size of the dataset
+QUERY_BUDGETS = {
+    'admin.course.list': 2,
+    'admin.course.retrieve': 2,
+    'admin.lesson.list': 2,
+    'admin.lesson.retrieve': 2,
+    'admin.question.list': 4,
+    'admin.question.retrieve': 4,
+    'admin.question.update': 15,
+    'students.course.list': 3,
+    'students.course.retrieve': 3,
+    'students.course.subscribe': 7,
+    'students.course.unlock_tree': 2,
+    'students.course.path': 2,
+    'students.progress': 2,
+    'students.lesson.list': 4,
+    'students.lesson.retrieve': 1,
+    'students.lesson.get_test': 2,
+    'students.lesson.send_test': 12,
+    'service.test_review': 10,
+    'service.logic_test': 0,
+    'service.vector_logic_test': 0,
+    'manager.course.can_subscribe': 2,
+    'manager.lesson.is_available_for_user': 2,
+    'manager.lesson.is_approved': 1,
+}
+
+
+class BenchmarkDataset:
+    """
+    A chain of courses, each with a chain of lessons, and students that
+    passed the first lesson of the first course and are subscribed to the
+    second one, plus an open course to subscribe to
+    """
+    def __init__(self, courses=2, lessons=3, questions=5, answers=4, students=10, seed=0):
+        self.rng = random.Random(seed)
+
+        self.teacher = User.objects.create_user(f'benchmark-{seed}-teacher')
+        self.students = [
+            User.objects.create_user(f'benchmark-{seed}-student-{index}')
+            for index in range(max(students, 1))
+        ]
+        self.student = self.students[0]
+
+        Group.objects.get_or_create(name='TEACHER')[0].user_set.add(self.teacher)
+        Group.objects.get_or_create(name='STUDENT')[0].user_set.add(*self.students)
+
+        self.courses = []
+        self.lessons = {}
+
+        for course_index in range(max(courses, 2)):
+            course = Course.objects.create(
+                name=f'benchmark course {course_index}',
+                dependent=self.courses[-1] if self.courses else None
+            )
+            self.courses.append(course)
+            self.lessons[course.id] = []
+
+            for lesson_index in range(max(lessons, 2)):
+                self.lessons[course.id].append(self.__create_lesson(
+                    course, lesson_index, questions, answers))
+
+        # a course without prerequisites nobody is subscribed to
+        self.open_course = Course.objects.create(name='benchmark open course')
+
+        self.course = self.courses[0]
+        self.approved_lesson, self.lesson = self.lessons[self.course.id][:2]
+        self.__enroll()
+        self.__read_versions()
+
+    def __create_lesson(self, course, index, total_questions, total_answers):
+        previous = self.lessons[course.id][-1] if self.lessons[course.id] else None
+        lesson = Lesson.objects.create(
+            course=course,
+            dependent=previous,
+            title=f'{course.name} lesson {index}',
+            description='benchmark',
+            approval_score=total_questions
+        )
+
+        Question.objects.bulk_create([
+            Question(
+                lesson=lesson,
+                description=f'question {index}',
+                score=1,
+                question_type='MULTIPLE_CHOOSE_A_CORRECT_ONE'
+            )
+            for index in range(total_questions)
+        ])
+        questions = list(Question.objects.by_lesson(lesson.id).order_by('id'))
+
+        Answer.objects.bulk_create([
+            Answer(question=question, description=f'answer {index}', is_correct=index == 0)
+            for question in questions
+            for index in range(max(total_answers, 2))
+        ])
+
+        return lesson
+
+    def __enroll(self):
+        CourseEnrollment.objects.bulk_create([
+            CourseEnrollment(user=student, course=self.course, approved_lesson_count=1)
+            for student in self.students
+        ])
+        LessonEnrollment.objects.bulk_create([
+            LessonEnrollment(
+                user=student,
+                lesson=lesson,
+                is_approved=lesson == self.approved_lesson,
+                score=lesson.approval_score if lesson == self.approved_lesson else 0
+            )
+            for student in self.students
+            for lesson in (self.approved_lesson, self.lesson)
+        ])
+
+        user_ids = [student.id for student in self.students]
+        refresh_course_progress(user_ids, [course.id for course in self.courses])
+        refresh_lesson_progress(user_ids, [
+            lesson.id for lessons in self.lessons.values() for lesson in lessons])
+
+    def __read_versions(self):
+        # the runs are rolled back, a version created by one of them would
+        # be created again by the next one
+        get_catalog_version()
+
+        for lessons in self.lessons.values():
+            for lesson in lessons:
+                get_lesson_version(lesson.id)
+
+        for user_id in self.user_ids():
+            get_user_progress_version(user_id)
+
+    def user_ids(self):
+        return [self.teacher.id] + [student.id for student in self.students]
+
+    def test_answers(self, lesson):
+        return [
+            {'id': question.id, 'answers': [{'id': question.answers.get(is_correct=True).id}]}
+            for question in Question.objects.by_lesson(lesson.id).prefetch_related('answers')
+        ]
+
+    def question_data(self, question):
+        answers = list(question.answers.order_by('id'))
+
+        return {
+            'description': question.description,
+            'score': question.score,
+            'question_type': question.question_type,
+            'lesson': question.lesson_id,
+            'answers': [
+                {'id': answer.id, 'description': answer.description, 'is_correct': answer.is_correct}
+                for answer in answers[:-1]
+            ] + [{'description': 'benchmark', 'is_correct': False}],
+        }
+
+    def scenarios(self, total):
+        return [
+            {'N': self.rng.randint(1, 10 ** 6), 'M': self.rng.randint(1, 10 ** 6)}
+            for _ in range(total)
+        ]
+
+
+def _percentiles(values):
+    return {
+        f'p{percentile}': round(float(np.percentile(values, percentile)), 3)
+        for percentile in (50, 90, 99)
+    }
+
+
+class Benchmark:
+    def __init__(self, dataset, iterations=20):
+        self.dataset = dataset
+        self.iterations = iterations
+        # a host the default ALLOWED_HOSTS of DEBUG accept
+        self.factory = APIRequestFactory(SERVER_NAME='localhost')
+
+    def endpoint_cases(self):
+        """
+        (name, method, path, user, data) of every router endpoint
+        """
+        dataset = self.dataset
+        course = dataset.course
+        lesson = dataset.lesson
+        question = Question.objects.by_lesson(lesson.id).order_by('id').first()
+
+        admin_course = f'{API_PREFIX}/admin/courses/{course.id}/'
+        admin_lesson = f'{admin_course}lessons/{lesson.id}/'
+        student_course = f'{API_PREFIX}/students/courses/{course.id}/'
+        student_lesson = f'{student_course}lessons/{lesson.id}/'
+
+        teacher = dataset.teacher
+        student = dataset.student
+
+        return [
+            ('admin.course.list', 'get', f'{API_PREFIX}/admin/courses/', teacher, None),
+            ('admin.course.retrieve', 'get', admin_course, teacher, None),
+            ('admin.lesson.list', 'get', f'{admin_course}lessons/', teacher, None),
+            ('admin.lesson.retrieve', 'get', admin_lesson, teacher, None),
+            ('admin.question.list', 'get', f'{admin_lesson}questions/', teacher, None),
+            ('admin.question.retrieve', 'get', f'{admin_lesson}questions/{question.id}/', teacher, None),
+            ('admin.question.update', 'put', f'{admin_lesson}questions/{question.id}/', teacher,
+             dataset.question_data(question)),
+            ('students.course.list', 'get', f'{API_PREFIX}/students/courses/', student, None),
+            ('students.course.retrieve', 'get', student_course, student, None),
+            ('students.course.subscribe', 'post',
+             f'{API_PREFIX}/students/courses/{dataset.open_course.id}/subscribe/', student, None),
+            ('students.course.unlock_tree', 'get',
+             f'{API_PREFIX}/students/courses/unlock_tree/', student, None),
+            ('students.course.path', 'get', f'{student_course}path/', student, None),
+            ('students.progress', 'get', f'{API_PREFIX}/students/progress/', student, None),
+            ('students.lesson.list', 'get', f'{student_course}lessons/', student, None),
+            ('students.lesson.retrieve', 'get', student_lesson, student, None),
+            ('students.lesson.get_test', 'get', f'{student_lesson}get_test/', student, None),
+            ('students.lesson.send_test', 'post', f'{student_lesson}send_test/', student,
+             {'questions': dataset.test_answers(lesson)}),
+        ]
+
+    def service_cases(self):
+        """
+        (name, callable) of the services and manager methods
+        """
+        dataset = self.dataset
+        student_id = dataset.student.id
+        answers = dataset.test_answers(dataset.lesson)
+        scenarios = dataset.scenarios(1000)
+
+        return [
+            ('service.test_review',
+             lambda: TestReview(student_id, dataset.lesson.id, answers).evaluate()),
+            ('service.logic_test', lambda: LogicTest(scenarios).get_results()),
+            ('service.vector_logic_test',
+             lambda: VectorLogicTest.from_scenarios(scenarios).get_results()),
+            ('manager.course.can_subscribe',
+             lambda: Course.objects.can_subscribe(dataset.courses[1].id, student_id)),
+            ('manager.lesson.is_available_for_user',
+             lambda: Lesson.objects.is_available_for_user(dataset.lesson.id, student_id)),
+            ('manager.lesson.is_approved',
+             lambda: Lesson.objects.is_approved(dataset.approved_lesson.id, student_id)),
+        ]
+
+    def run(self, names=None):
+        results = []
+
+        for name, method, path, user, data in self.endpoint_cases():
+            if names is None or name in names:
+                results.append(self.run_endpoint(name, method, path, user, data))
+
+        for name, function in self.service_cases():
+            if names is None or name in names:
+                results.append(self.run_case(name, lambda: (function(), None)))
+
+        return results
+
+    def run_endpoint(self, name, method, path, user, data):
+        match = resolve(path)
+
+        def request():
+            request = getattr(self.factory, method)(path, data, format='json')
+            force_authenticate(request, user=user)
+
+            view_start = time.perf_counter()
+            response = match.func(request, *match.args, **match.kwargs)
+            view_time = time.perf_counter() - view_start
+
+            render_start = time.perf_counter()
+            if hasattr(response, 'render'):
+                response.render()
+            render_time = time.perf_counter() - render_start
+
+            return response, (view_time, render_time)
+
+        return self.run_case(name, request)
+
+    def run_case(self, name, function):
+        queries = []
+        sql_times = []
+        wall_times = []
+        view_times = []
+        render_times = []
+        status_code = None
+
+        for _ in range(self.iterations):
+            recorder = QueryRecorder()
+
+            with transaction.atomic():
+                with connection.execute_wrapper(recorder):
+                    start = time.perf_counter()
+                    response, phases = function()
+                    wall_times.append((time.perf_counter() - start) * 1000)
+
+                transaction.set_rollback(True)
+
+            queries.append(recorder.count)
+            sql_times.append(recorder.time * 1000)
+
+            if phases is not None:
+                view_times.append(phases[0] * 1000)
+                render_times.append(phases[1] * 1000)
+                status_code = response.status_code
+
+        # the first run fills the caches, the budget applies to the others
+        result = {
+            'name': name,
+            'iterations': self.iterations,
+            'cold_queries': queries[0],
+            'queries': max(queries[1:] or queries),
+            'budget': QUERY_BUDGETS.get(name),
+            'sql_ms': _percentiles(sql_times),
+            'wall_ms': _percentiles(wall_times),
+        }
+
+        if status_code is not None:
+            result['status'] = status_code
+            result['view_ms'] = _percentiles(view_times)
+            result['render_ms'] = _percentiles(render_times)
+
+        return result
+
+    def cleanup(self):
+        invalidate_user_roles(*self.dataset.user_ids())
+
+
+def over_budget(results):
+    return [
+        result for result in results
+        if result['budget'] is not None and result['queries'] > result['budget']
+    ]
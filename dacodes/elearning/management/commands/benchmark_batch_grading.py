@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from elearning.services.answer_key import AnswerKey, AnswerKeyQuestion
+from elearning.services.batch_review import BatchTestReview
+from elearning.settings import QUESTION_TYPES
+
+
+class Command(BaseCommand):
+    help = "Measure the throughput of the batch grading engine on a synthetic answer key"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=10000)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--answers', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        answer_key = self.build_answer_key(rng, options['questions'], options['answers'])
+        submissions = self.build_submissions(
+            rng, answer_key, options['submissions'], options['answers'])
+
+        start = time.perf_counter()
+        results = BatchTestReview(answer_key.lesson_id, submissions, answer_key).grade()
+        elapsed = time.perf_counter() - start
+
+        approved = sum(1 for result in results if result['is_approved'])
+
+        self.stdout.write(
+            f"graded {len(results)} submissions ({approved} approved) "
+            f"in {elapsed:.3f}s, {len(results) / elapsed:,.0f} submissions/s"
+        )
+
+    def build_answer_key(self, rng, total_questions, total_answers):
+        questions = {}
+        answer_questions = {}
+        answer_id = 0
+
+        for question_id in range(1, total_questions + 1):
+            question_type = rng.choice(QUESTION_TYPES)[0]
+            answers = list(range(answer_id + 1, answer_id + total_answers + 1))
+            answer_id += total_answers
+
+            if question_type == "CHOOSE_ALL_THE_RIGHT":
+                correct = rng.sample(answers, 2)
+            else:
+                correct = [answers[0]]
+
+            for answer in answers:
+                answer_questions[answer] = question_id
+
+            questions[question_id] = AnswerKeyQuestion(
+                question_type, 1, f"question {question_id}", frozenset(correct))
+
+        return AnswerKey(1, 1, total_questions // 2, questions, answer_questions)
+
+    def build_submissions(self, rng, answer_key, total_submissions, total_answers):
+        answers_of = {}
+
+        for answer_id, question_id in answer_key.answer_questions.items():
+            answers_of.setdefault(question_id, []).append(answer_id)
+
+        return [
+            {
+                'user': user_id,
+                'questions': [
+                    {
+                        'id': question_id,
+                        'answers': [
+                            {'id': answer_id}
+                            for answer_id in rng.sample(answers, rng.randint(1, 2))
+                        ],
+                    }
+                    for question_id, answers in answers_of.items()
+                ],
+            }
+            for user_id in range(1, total_submissions + 1)
+        ]
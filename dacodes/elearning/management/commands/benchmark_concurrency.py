@@ -0,0 +1,269 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+
+from core.tokens import ACCESS_TOKEN, issue_token_pair
+from elearning.models import Answer, Course, CourseEnrollment, LessonEnrollment, UserAnswer
+from elearning.services.progress import refresh_course_progress
+
+API_PREFIX = '/api/elearning'
+WRITE_PATHS = ('/send_test/', '/subscribe/')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the student endpoints served by WSGI and by "
+        "ASGI under the same concurrent load of reads, failed send_test and "
+        "course subscribe writes on the current dataset (see generate_dataset)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='synthetic',
+                            help="prefix of the usernames of the students")
+        parser.add_argument('--students', type=int, default=50,
+                            help="students that make the requests")
+        parser.add_argument('--requests', type=int, default=500,
+                            help="requests of every mode")
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help="requests in flight at the same time")
+        parser.add_argument('--writes', type=float, default=0.3,
+                            help="fraction of the requests that are send_test or subscribe")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--mode', action='append', dest='modes',
+                            choices=('wsgi', 'asgi'),
+                            help="run only the mode, can be repeated")
+        parser.add_argument('--output', help="write the results as JSON to the file")
+
+    def handle(self, *args, **options):
+        workload = self.workload(options)
+        modes = options['modes'] or ['wsgi', 'asgi']
+        results = []
+
+        # the host of the requests of the test clients
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for mode in modes:
+                last_ids = self.last_ids()
+
+                try:
+                    results.append(self.run(mode, workload, options['concurrency']))
+                finally:
+                    self.undo_writes(*last_ids)
+
+        if options['output']:
+            report = {
+                'parameters': {
+                    key: options[key]
+                    for key in ('students', 'requests', 'concurrency', 'writes', 'seed')
+                },
+                'results': results,
+            }
+
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+    def run(self, mode, workload, concurrency):
+        if mode == 'wsgi':
+            result = self.run_wsgi(workload, concurrency)
+        else:
+            result = asyncio.run(self.run_asgi(workload, concurrency))
+
+        self.stdout.write(
+            f"{mode:<12} {result['requests_per_second']:>9.1f} req/s"
+            f"  errors {result['errors']:>4}"
+            f"  p50 {result['latency_ms']['p50']:>8.3f}ms"
+            f" p90 {result['latency_ms']['p90']:>8.3f}ms"
+            f" p99 {result['latency_ms']['p99']:>8.3f}ms"
+            f"  writes p50 {result['write_latency_ms']['p50']:>8.3f}ms"
+        )
+
+        return {'mode': mode, **result}
+
+    def workload(self, options):
+        """
+        (method, path without the api prefix, token, data) of every request,
+        the same list is sent in every mode
+        """
+        rng = random.Random(options['seed'])
+        students = list(User.objects.filter(
+            username__startswith=f"{options['prefix']}-",
+            groups__name='STUDENT'
+        ).order_by('id')[:options['students']])
+
+        if not students:
+            raise CommandError(
+                f"There are no students with the prefix \"{options['prefix']}\", "
+                "run generate_dataset first")
+
+        paths = {}
+        wrong_answers = {}
+
+        for student in students:
+            token = issue_token_pair(student)[ACCESS_TOKEN]
+            course_ids = list(CourseEnrollment.objects.filter(
+                user=student).values_list('course_id', flat=True))
+            lessons = list(LessonEnrollment.objects.filter(
+                user=student, is_approved=False).values_list('lesson__course_id', 'lesson_id'))
+
+            student_paths = ['/students/courses/', '/students/courses/unlock_tree/']
+            student_paths += [f'/students/courses/{course_id}/lessons/' for course_id in course_ids]
+            student_paths += [
+                f'/students/courses/{course_id}/lessons/{lesson_id}/get_test/'
+                for course_id, lesson_id in lessons
+            ]
+
+            # failed tests can be sent again and again, a course is subscribed once
+            tests = [
+                (f'/students/courses/{course_id}/lessons/{lesson_id}/send_test/',
+                 self.wrong_answers(wrong_answers, lesson_id))
+                for course_id, lesson_id in lessons
+            ]
+            subscriptions = [
+                f'/students/courses/{course_id}/subscribe/'
+                for course_id in Course.objects.exclude(
+                    pk__in=course_ids).values_list('id', flat=True)
+                if Course.objects.can_subscribe(course_id, student.id)
+            ]
+            rng.shuffle(subscriptions)
+            paths[student.id] = (token, student_paths, tests, subscriptions)
+
+        workload = []
+
+        for _ in range(options['requests']):
+            token, student_paths, tests, subscriptions = paths[rng.choice(students).id]
+            roll = rng.random()
+
+            if roll < 0.1:
+                scenarios = [
+                    {'N': rng.randint(1, 10 ** 6), 'M': rng.randint(1, 10 ** 6)}
+                    for _ in range(100)
+                ]
+                workload.append(('post', '/logic_test', token, json.dumps(scenarios)))
+            elif roll < 0.1 + options['writes'] and subscriptions and rng.random() < 0.5:
+                workload.append(('post', subscriptions.pop(), token, None))
+            elif roll < 0.1 + options['writes'] and tests:
+                path, questions = rng.choice(tests)
+                workload.append(('post', path, token, json.dumps({'questions': questions})))
+            else:
+                workload.append(('get', rng.choice(student_paths), token, None))
+
+        return workload
+
+    def wrong_answers(self, answers, lesson_id):
+        """
+        a wrong answer to every question of the lesson, the test is failed so
+        the lesson stays open to the next requests
+        """
+        if lesson_id not in answers:
+            questions = {}
+
+            for question_id, answer_id in Answer.objects.by_lesson(lesson_id).filter(
+                    is_correct=False).order_by('id').values_list('question_id', 'id'):
+                questions.setdefault(question_id, answer_id)
+
+            answers[lesson_id] = [
+                {'id': question_id, 'answers': [{'id': answer_id}]}
+                for question_id, answer_id in questions.items()
+            ]
+
+        return answers[lesson_id]
+
+    def last_ids(self):
+        return tuple(
+            model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            for model in (CourseEnrollment, UserAnswer)
+        )
+
+    def undo_writes(self, last_enrollment_id, last_answer_id):
+        """
+        remove the subscriptions and answers of a mode, every mode starts from
+        the same dataset
+        """
+        enrollments = CourseEnrollment.objects.filter(pk__gt=last_enrollment_id)
+        subscribed = list(enrollments.values_list('user_id', 'course_id'))
+        enrollments.delete()
+        UserAnswer.objects.filter(pk__gt=last_answer_id).delete()
+
+        if subscribed:
+            user_ids, course_ids = zip(*subscribed)
+            refresh_course_progress(set(user_ids), set(course_ids))
+
+    def run_wsgi(self, workload, concurrency):
+        def send(request):
+            method, path, token, data = request
+            # a locked database is a 500 of the request, counted in the errors
+            client = Client(raise_request_exception=False)
+            start = time.perf_counter()
+
+            try:
+                response = getattr(client, method)(
+                    f'{API_PREFIX}{path}',
+                    data=data,
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Bearer {token}'
+                )
+            finally:
+                close_old_connections()
+
+            elapsed = time.perf_counter() - start
+
+            return path.endswith(WRITE_PATHS), response.status_code, elapsed
+
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            responses = list(executor.map(send, workload))
+
+        return _result(responses, time.perf_counter() - start)
+
+    async def run_asgi(self, workload, concurrency):
+        client = AsyncClient(raise_request_exception=False)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            method, path, token, data = request
+
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.generic(
+                    method.upper(), f'{API_PREFIX}{path}', data or '',
+                    content_type='application/json', authorization=f'Bearer {token}'
+                )
+
+                elapsed = time.perf_counter() - start
+
+                return path.endswith(WRITE_PATHS), response.status_code, elapsed
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(send(request) for request in workload))
+
+        return _result(responses, time.perf_counter() - start)
+
+
+def _percentiles(latencies):
+    return {
+        f'p{percentile}': round(float(np.percentile(latencies or [0], percentile)), 3)
+        for percentile in (50, 90, 99)
+    }
+
+
+def _result(responses, elapsed):
+    return {
+        'requests': len(responses),
+        'errors': sum(1 for _, status_code, _ in responses if status_code >= 400),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(responses) / elapsed, 1),
+        'latency_ms': _percentiles([latency * 1000 for _, _, latency in responses]),
+        'write_latency_ms': _percentiles([
+            latency * 1000 for is_write, _, latency in responses if is_write
+        ]),
+    }
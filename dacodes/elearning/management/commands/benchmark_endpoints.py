@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from elearning.benchmark import Benchmark, BenchmarkDataset, over_budget
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a parametrized dataset and measure the queries, SQL time and latency "
+        "of every endpoint and service, the dataset is rolled back at the end"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=5)
+        parser.add_argument('--lessons', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--answers', type=int, default=4)
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--case', action='append', dest='cases',
+                            help="run only the named case, can be repeated")
+        parser.add_argument('--output', help="write the results as JSON to the file")
+        parser.add_argument('--check-budgets', action='store_true',
+                            help="fail when a case goes over its query budget")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            dataset = BenchmarkDataset(
+                courses=options['courses'],
+                lessons=options['lessons'],
+                questions=options['questions'],
+                answers=options['answers'],
+                students=options['students'],
+                seed=options['seed']
+            )
+            benchmark = Benchmark(dataset, iterations=options['iterations'])
+
+            try:
+                results = benchmark.run(options['cases'])
+            finally:
+                benchmark.cleanup()
+                transaction.set_rollback(True)
+
+        for result in results:
+            self.stdout.write(
+                f"{result['name']:<40} queries {result['queries']:>3}"
+                f" (budget {result['budget']})"
+                f"  sql p50 {result['sql_ms']['p50']:>8.3f}ms"
+                f"  wall p50 {result['wall_ms']['p50']:>8.3f}ms"
+                f" p90 {result['wall_ms']['p90']:>8.3f}ms"
+                f" p99 {result['wall_ms']['p99']:>8.3f}ms"
+            )
+
+        if options['output']:
+            report = {
+                'parameters': {
+                    key: options[key]
+                    for key in ('courses', 'lessons', 'questions', 'answers',
+                                'students', 'iterations', 'seed')
+                },
+                'results': results,
+            }
+
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if options['check_budgets']:
+            failures = over_budget(results)
+
+            if failures:
+                raise CommandError("over the query budget: " + ", ".join(
+                    f"{result['name']} ({result['queries']} > {result['budget']})"
+                    for result in failures
+                ))
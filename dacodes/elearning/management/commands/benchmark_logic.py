@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from elearning.serializer import LogicSerializer
+from elearning.services.logic import LogicTest, VectorLogicTest
+
+
+class Command(BaseCommand):
+    help = "Compare the throughput of the LogicTest engine and the vectorized engine"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', type=int, default=200000)
+        parser.add_argument('--max-value', type=int, default=10 ** 9)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        scenarios = [
+            {'N': rng.randint(1, options['max_value']), 'M': rng.randint(1, options['max_value'])}
+            for _ in range(options['scenarios'])
+        ]
+
+        def reference():
+            serializer = LogicSerializer(data=scenarios, many=True)
+            serializer.is_valid(raise_exception=True)
+
+            return LogicTest(serializer.data).get_results()
+
+        def vector():
+            return VectorLogicTest.from_scenarios(scenarios).get_results()
+
+        reference_results, reference_elapsed = self.measure(reference)
+        vector_results, vector_elapsed = self.measure(vector)
+
+        if reference_results != vector_results:
+            self.stderr.write("the engines returned different results")
+
+        for name, elapsed in (('reference', reference_elapsed), ('vector', vector_elapsed)):
+            self.stdout.write(
+                f"{name}: {len(scenarios)} scenarios in {elapsed:.3f}s, "
+                f"{len(scenarios) / elapsed:,.0f} scenarios/s"
+            )
+
+        self.stdout.write(f"speedup {reference_elapsed / vector_elapsed:.1f}x")
+
+    def measure(self, engine):
+        start = time.perf_counter()
+        results = engine()
+
+        return results, time.perf_counter() - start
@@ -0,0 +1,269 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+from core.roles import invalidate_user_roles
+from elearning.models import (
+    Answer,
+    Course,
+    CourseEnrollment,
+    Lesson,
+    LessonEnrollment,
+    Question,
+    UserAnswer,
+)
+from elearning.services.content import bump_catalog_version
+from elearning.settings import QUESTION_TYPES
+
+
+class BulkWriter:
+    """
+    buffer of model instances written with bulk_create every batch_size rows,
+    the primary keys are assigned here so related rows can point to them
+    without reading them back
+    """
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.next_id = (model.objects.aggregate(last_id=Max('id'))['last_id'] or 0) + 1
+        self.total = 0
+        self._rows = []
+
+    def add(self, **values):
+        pk = self.next_id
+        self.next_id += 1
+        self._rows.append(self.model(id=pk, **values))
+
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+        return pk
+
+    def flush(self):
+        if self._rows:
+            self.model.objects.bulk_create(self._rows, batch_size=self.batch_size)
+            self.total += len(self._rows)
+            self._rows = []
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset: course prerequisite chains, lessons "
+        "with dependencies, questions of every type, teachers and students, enrollments "
+        "and the answer history of the approved lessons"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--chain-length', type=int, default=4,
+                            help="courses of each prerequisite chain")
+        parser.add_argument('--lessons', type=int, default=10, help="lessons per course")
+        parser.add_argument('--questions', type=int, default=10, help="questions per lesson")
+        parser.add_argument('--answers', type=int, default=4, help="answers per question")
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic',
+                            help="prefix of the generated usernames and names")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-progress', action='store_true',
+                            help="do not rebuild the progress tables at the end")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        prefix = options['prefix']
+
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"There are users with the prefix \"{prefix}\", use another --prefix")
+
+        start = time.perf_counter()
+        writers = {
+            model: BulkWriter(model, options['batch_size'])
+            for model in (User, User.groups.through, Course, Lesson, Question, Answer,
+                          CourseEnrollment, LessonEnrollment, UserAnswer)
+        }
+        self.writers = writers
+
+        with transaction.atomic():
+            self.create_users()
+            chains = self.create_catalog()
+            self.create_enrollments(chains)
+
+            for writer in writers.values():
+                writer.flush()
+
+            self.reset_sequences()
+
+        bump_catalog_version()
+
+        for model, writer in writers.items():
+            self.stdout.write(f"{model._meta.label}: {writer.total} rows")
+
+        if not options['skip_progress']:
+            call_command('rebuild_progress', stdout=self.stdout)
+
+        total = sum(writer.total for writer in writers.values())
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"generated {total} rows in {elapsed:.1f}s, {total / elapsed:,.0f} rows/s")
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        # hashing is slow, every generated user shares the password "synthetic"
+        password = make_password('synthetic')
+        groups = {
+            name: Group.objects.get_or_create(name=name)[0].id
+            for name in ('TEACHER', 'STUDENT')
+        }
+
+        self.users = []
+        self.students = []
+
+        for role, total in (('TEACHER', self.options['teachers']),
+                            ('STUDENT', self.options['students'])):
+            for index in range(total):
+                user_id = self.writers[User].add(
+                    username=f'{prefix}-{role.lower()}-{index}',
+                    password=password
+                )
+                self.writers[User.groups.through].add(user_id=user_id, group_id=groups[role])
+                self.users.append(user_id)
+
+                if role == 'STUDENT':
+                    self.students.append(user_id)
+
+        # the ids may have been cached for users that no longer exist
+        invalidate_user_roles(*self.users)
+
+    def create_catalog(self):
+        """
+        chains of courses, every chain a list of courses, every course a list
+        of lessons with the correct answers and score of its questions
+        """
+        options = self.options
+        chains = []
+
+        for course_index in range(options['courses']):
+            if course_index % max(options['chain_length'], 1) == 0:
+                chains.append([])
+
+            chain = chains[-1]
+            course_id = self.writers[Course].add(
+                name=f"{options['prefix']} course {course_index}",
+                dependent_id=chain[-1]['id'] if chain else None,
+                lesson_count=options['lessons']
+            )
+            course = {'id': course_id, 'lessons': []}
+            chain.append(course)
+
+            for lesson_index in range(options['lessons']):
+                course['lessons'].append(
+                    self.create_lesson(course, lesson_index))
+
+        return chains
+
+    def create_lesson(self, course, index):
+        specs = []
+
+        for question_index in range(self.options['questions']):
+            question_type = self.rng.choice(QUESTION_TYPES)[0]
+            total_answers = 2 if question_type == 'BOOLEAN' else max(self.options['answers'], 2)
+
+            if question_type == 'CHOOSE_ALL_THE_RIGHT':
+                correct = set(self.rng.sample(
+                    range(total_answers), self.rng.randint(1, total_answers - 1)))
+            else:
+                correct = {self.rng.randrange(total_answers)}
+
+            specs.append((question_type, self.rng.randint(1, 5), total_answers, correct))
+
+        total_score = sum(score for _, score, _, _ in specs)
+        lesson_id = self.writers[Lesson].add(
+            course_id=course['id'],
+            dependent_id=course['lessons'][-1]['id'] if course['lessons'] else None,
+            title=f"lesson {index} of course {course['id']}",
+            description=f"lesson {index}",
+            approval_score=max(round(total_score * 0.6), 1)
+        )
+        questions = []
+
+        for question_index, (question_type, score, total_answers, correct) in enumerate(specs):
+            question_id = self.writers[Question].add(
+                lesson_id=lesson_id,
+                description=f"question {question_index} of lesson {lesson_id}",
+                score=score,
+                question_type=question_type
+            )
+            correct_ids = []
+
+            for answer_index in range(total_answers):
+                answer_id = self.writers[Answer].add(
+                    question_id=question_id,
+                    description=f"answer {answer_index}",
+                    is_correct=answer_index in correct
+                )
+
+                if answer_index in correct:
+                    correct_ids.append(answer_id)
+
+            questions.append(correct_ids)
+
+        return {'id': lesson_id, 'score': total_score, 'questions': questions}
+
+    def create_enrollments(self, chains):
+        """
+        every student advances through a random prefix of a random chain,
+        approving lessons in order with the correct answers
+        """
+        for user_id in self.students:
+            chain = self.rng.choice(chains)
+            # lessons the student has approved along the chain
+            remaining = self.rng.randint(0, sum(len(course['lessons']) for course in chain))
+
+            for course in chain:
+                approved_lessons = min(remaining, len(course['lessons']))
+                remaining -= approved_lessons
+                is_approved = approved_lessons == len(course['lessons'])
+
+                self.writers[CourseEnrollment].add(
+                    course_id=course['id'], user_id=user_id, is_approved=is_approved,
+                    approved_lesson_count=approved_lessons)
+
+                for lesson in course['lessons'][:approved_lessons]:
+                    self.approve_lesson(user_id, lesson)
+
+                if not is_approved:
+                    if approved_lessons < len(course['lessons']):
+                        self.writers[LessonEnrollment].add(
+                            lesson_id=course['lessons'][approved_lessons]['id'],
+                            user_id=user_id,
+                            is_approved=False,
+                            score=0
+                        )
+                    break
+
+    def approve_lesson(self, user_id, lesson):
+        self.writers[LessonEnrollment].add(
+            lesson_id=lesson['id'], user_id=user_id, is_approved=True, score=lesson['score'])
+
+        for correct_ids in lesson['questions']:
+            for answer_id in correct_ids:
+                self.writers[UserAnswer].add(user_id=user_id, answer_id=answer_id)
+
+    def reset_sequences(self):
+        connection = connections[User.objects.db]
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.writers))
+
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
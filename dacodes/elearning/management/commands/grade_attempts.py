@@ -0,0 +1,55 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from elearning.models import TestAttempt
+from elearning.services.grading_queue import GradingPool, GradingWorker
+from elearning.settings import GRADING_BATCH_SIZE, GRADING_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = (
+        "Grade in batches the tests sent with send_test?mode=async, the workers are "
+        "local threads reading the attempts table, more processes can run at once"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=GRADING_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=GRADING_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true',
+                            help="grade the pending attempts and exit")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            worker = GradingWorker(batch_size=options['batch_size'])
+            total = 0
+            start = time.perf_counter()
+
+            while TestAttempt.objects.pending().exists():
+                total += worker.run_once()
+
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"graded {total} attempts in {elapsed:.2f}s")
+            return
+
+        pool = GradingPool(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval']
+        )
+
+        def stop(signum, frame):
+            pool.stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        pool.start()
+        self.stdout.write(f"grading with {options['workers']} workers, stop with CTRL-C")
+
+        while not pool.stop_event.wait(1):
+            pass
+
+        pool.stop()
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.parsers import NDJSONParser
+from elearning.models import Lesson
+from elearning.services.question_import import QuestionImport
+
+
+class Command(BaseCommand):
+    help = "Import a JSONL bank of questions, one question with its answers per line, into a lesson"
+
+    def add_arguments(self, parser):
+        parser.add_argument('lesson', type=int)
+        parser.add_argument('path', help="JSONL file, - reads the standard input")
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not Lesson.objects.filter(pk=options['lesson']).exists():
+            raise CommandError(f"Lesson {options['lesson']} does not exist")
+
+        if options['path'] == '-':
+            report, elapsed = self.run(options, sys.stdin.buffer)
+        else:
+            try:
+                with open(options['path'], 'rb') as stream:
+                    report, elapsed = self.run(options, stream)
+            except OSError as ex:
+                raise CommandError(ex)
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+
+        rate = report['imported'] / elapsed if elapsed > 0 else 0
+
+        self.stdout.write(
+            f"imported {report['imported']} questions ({report['rejected']} rejected) "
+            f"in {elapsed:.3f}s, {rate:,.0f} questions/s"
+        )
+
+    def run(self, options, stream):
+        kwargs = {}
+
+        if options['chunk_size']:
+            kwargs['chunk_size'] = options['chunk_size']
+
+        questions = NDJSONParser().parse(stream)
+
+        start = time.perf_counter()
+        report = QuestionImport(options['lesson'], questions, **kwargs).run()
+
+        return report, time.perf_counter() - start
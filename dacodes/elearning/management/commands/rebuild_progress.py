@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from elearning.models import CourseProgress, LessonProgress
+from elearning.services.progress import (
+    expected_course_progress,
+    expected_lesson_progress,
+    stored_progress,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the course and lesson progress tables from the enrollments, or verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help="compare the progress tables with the enrollments without changing them"
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        tables = (
+            (CourseProgress, 'course_id', expected_course_progress),
+            (LessonProgress, 'lesson_id', expected_lesson_progress),
+        )
+
+        if options['verify']:
+            drift = sum(self.verify(*table) for table in tables)
+
+            if drift > 0:
+                raise CommandError(f"{drift} progress rows do not match the enrollments")
+
+            self.stdout.write("progress tables match the enrollments")
+            return
+
+        with transaction.atomic():
+            for model, field, expected in tables:
+                self.rebuild(model, field, expected(), options['batch_size'])
+
+    def rebuild(self, model, field, expected, batch_size):
+        model.objects.all().delete()
+        model.objects.bulk_create([
+            model(**{
+                'user_id': user_id,
+                field: item_id,
+                'is_subscribed': is_subscribed,
+                'is_approved': is_approved,
+                'dependent_is_approved': dependent_is_approved,
+            })
+            for (user_id, item_id), (is_subscribed, is_approved, dependent_is_approved)
+            in expected.items()
+        ], batch_size=batch_size)
+
+        self.stdout.write(f"{model.__name__}: {len(expected)} rows")
+
+    def verify(self, model, field, expected):
+        expected = expected()
+        stored = stored_progress(model, field)
+        drift = 0
+
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                drift += 1
+                self.stdout.write(
+                    f"{model.__name__} user={key[0]} {field}={key[1]}: "
+                    f"expected {expected.get(key)}, stored {stored.get(key)}"
+                )
+
+        return drift
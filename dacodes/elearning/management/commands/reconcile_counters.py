@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from elearning.services.counters import counter_drift, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the lesson counters of the courses and the approved lesson counters "
+        "of the course enrollments against the rows they count, or recompute them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="recompute every counter instead of only reporting the drift"
+        )
+
+    def handle(self, *args, **options):
+        if options['fix']:
+            with transaction.atomic():
+                updated = reconcile_counters()
+
+            self.stdout.write(f"{updated} counters recomputed")
+            return
+
+        drift = counter_drift()
+
+        for model, pk, stored, expected in drift:
+            self.stdout.write(
+                f"{model.__name__} id={pk}: expected {expected}, stored {stored}")
+
+        if drift:
+            raise CommandError(f"{len(drift)} counters do not match the rows they count")
+
+        self.stdout.write("counters match the rows they count")
@@ -0,0 +1,106 @@
+# Generated by Django 3.1 on 2026-10-18 08:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def expected_progress(enrollments, dependents):
+    """
+    {(user, item): (is_subscribed, is_approved, dependent_is_approved)} for
+    every pair with at least one flag set, a copy of the logic of
+    elearning.services.progress as it was when the tables were added
+    """
+    successors = {}
+
+    for item_id, dependent_id in dependents.items():
+        if dependent_id is not None:
+            successors.setdefault(dependent_id, []).append(item_id)
+
+    progress = {}
+
+    for user_id, item_id, is_approved in enrollments:
+        flags = progress.setdefault((user_id, item_id), [False, False, False])
+        flags[0] = True
+        flags[1] = flags[1] or is_approved
+
+        if is_approved:
+            for successor_id in successors.get(item_id, []):
+                progress.setdefault(
+                    (user_id, successor_id), [False, False, False])[2] = True
+
+    return {key: tuple(flags) for key, flags in progress.items()}
+
+
+def fill_progress(apps, schema_editor):
+    tables = (
+        ('CourseProgress', 'course_id', 'Course', 'CourseEnrollment'),
+        ('LessonProgress', 'lesson_id', 'Lesson', 'LessonEnrollment'),
+    )
+
+    for model_name, field, item_name, enrollment_name in tables:
+        model = apps.get_model('elearning', model_name)
+        items = apps.get_model('elearning', item_name)
+        enrollments = apps.get_model('elearning', enrollment_name)
+        expected = expected_progress(
+            enrollments.objects.values_list('user_id', field, 'is_approved'),
+            dict(items.objects.values_list('id', 'dependent_id'))
+        )
+
+        model.objects.bulk_create([
+            model(**{
+                'user_id': user_id,
+                field: item_id,
+                'is_subscribed': is_subscribed,
+                'is_approved': is_approved,
+                'dependent_is_approved': dependent_is_approved,
+            })
+            for (user_id, item_id), (is_subscribed, is_approved, dependent_is_approved)
+            in expected.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('elearning', '0006_auto_20200810_0653'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, null=True)),
+                ('is_subscribed', models.BooleanField(default=False)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('dependent_is_approved', models.BooleanField(default=False)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='elearning.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, null=True)),
+                ('is_subscribed', models.BooleanField(default=False)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('dependent_is_approved', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='elearning.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='lessonprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'lesson'), name='unique_lesson_progress'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_course_progress'),
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
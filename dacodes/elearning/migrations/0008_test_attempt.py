@@ -0,0 +1,37 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('elearning', '0007_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, null=True)),
+                ('questions', models.JSONField()),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('DONE', 'DONE'), ('FAILED', 'FAILED')], db_index=True, default='PENDING', max_length=10)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('graded_at', models.DateTimeField(blank=True, null=True)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('score', models.IntegerField(default=0)),
+                ('message', models.TextField(blank=True, default='')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='elearning.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def dedupe(model, field, ordering):
+    """
+    keep one row of every (user, field) pair, the first one by ordering
+    """
+    duplicated = model.objects.values('user_id', field).annotate(
+        total=Count('id')).filter(total__gt=1)
+
+    for pair in duplicated.iterator():
+        ids = list(model.objects.filter(
+            user_id=pair['user_id'], **{field: pair[field]}
+        ).order_by(*ordering).values_list('id', flat=True))
+
+        model.objects.filter(id__in=ids[1:]).delete()
+
+
+def dedupe_enrollments(apps, schema_editor):
+    # an approved enrollment (the best scored one for lessons) wins over the others
+    dedupe(apps.get_model('elearning', 'CourseEnrollment'), 'course_id',
+           ['-is_approved', 'id'])
+    dedupe(apps.get_model('elearning', 'LessonEnrollment'), 'lesson_id',
+           ['-is_approved', '-score', 'id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning', '0008_test_attempt'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_enrollments, migrations.RunPython.noop),
+    ]
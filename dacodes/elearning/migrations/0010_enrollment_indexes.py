@@ -0,0 +1,61 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('elearning', '0009_dedupe_enrollments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='elearning.question'),
+        ),
+        migrations.AlterField(
+            model_name='courseenrollment',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='elearning.course'),
+        ),
+        migrations.AlterField(
+            model_name='courseenrollment',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='courses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='lessonenrollment',
+            name='lesson',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='elearning.lesson'),
+        ),
+        migrations.AlterField(
+            model_name='lessonenrollment',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', 'is_correct'], name='answer_question_correct'),
+        ),
+        migrations.AddIndex(
+            model_name='courseenrollment',
+            index=models.Index(fields=['course', 'is_approved', 'user'], name='course_enrollment_approved'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonenrollment',
+            index=models.Index(fields=['lesson', 'is_approved', 'user'], name='lesson_enrollment_approved'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseenrollment',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_course_enrollment'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonenrollment',
+            constraint=models.UniqueConstraint(fields=('user', 'lesson'), name='unique_lesson_enrollment'),
+        ),
+    ]
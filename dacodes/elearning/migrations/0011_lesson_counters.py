@@ -0,0 +1,54 @@
+# Generated by Django 3.1.14 on 2026-10-18 08:50
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def counted(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('total')[:1]),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def count_lessons(apps, schema_editor):
+    Course = apps.get_model('elearning', 'Course')
+    CourseEnrollment = apps.get_model('elearning', 'CourseEnrollment')
+    Lesson = apps.get_model('elearning', 'Lesson')
+    LessonEnrollment = apps.get_model('elearning', 'LessonEnrollment')
+
+    Course.objects.update(lesson_count=counted(
+        Lesson.objects.filter(
+            course_id=OuterRef('id')
+        ).values('course_id').annotate(total=Count('id'))
+    ))
+    CourseEnrollment.objects.update(approved_lesson_count=counted(
+        LessonEnrollment.objects.filter(
+            user_id=OuterRef('user_id'),
+            lesson__course_id=OuterRef('course_id'),
+            is_approved=True
+        ).values('user_id').annotate(total=Count('id'))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elearning', '0010_enrollment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='courseenrollment',
+            name='approved_lesson_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_lessons, migrations.RunPython.noop),
+    ]
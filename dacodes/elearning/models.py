@@ -1,77 +1,81 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
 from django.conf import settings
+from django.utils import timezone
 
+from django.db.models import F, OuterRef, Q, Subquery
 from django.db.models.query import QuerySet
 
 from core.models import TimeStampedModel
-from .settings import QUESTION_TYPES
+from .settings import ATTEMPT_STATUSES, QUESTION_TYPES
 
 
-class CourseManager(models.Manager):
-    def can_subscribe(self, course_id, user_id):
-        try:
-            course = Course.objects.get(pk=course_id)
+def _course_snapshot(course_id, user_id, snapshot=None):
+    from .services.enrollment import EnrollmentSnapshot
 
-            if self.is_subscribed(course_id, user_id):
-                return False
+    if snapshot is not None and snapshot.has_course(course_id):
+        return snapshot
 
-            if course.dependent is None:
-                return True
+    return EnrollmentSnapshot.for_course(course_id, user_id)
 
-            if self.is_approved(course.dependent.id, user_id):
-                return True
 
-        except Exception as ex:
+def _lesson_snapshot(lesson_id, user_id, snapshot=None):
+    from .services.enrollment import EnrollmentSnapshot
 
-            return False
+    if snapshot is not None and snapshot.has_lesson(lesson_id):
+        return snapshot
 
-    def is_subscribed(self, course_id, user_id):
-        course_enrollment = CourseEnrollment.objects.filter(
-            course_id=course_id, user_id=user_id)
+    return EnrollmentSnapshot.for_lesson(lesson_id, user_id)
 
-        if course_enrollment.exists():
-            return True
 
-        return False
+class CourseManager(models.Manager):
+    def snapshot(self, course_id, user_id):
+        return _course_snapshot(course_id, user_id)
 
-    def subscribe(self, course_id, user_id):
-        if not Course.objects.is_subscribed(course_id, user_id):
-            if Course.objects.can_subscribe(course_id, user_id):
-                CourseEnrollment.objects.create(
-                    course_id=course_id, user_id=user_id)
-                return True
-        else:
-            return True
+    def can_subscribe(self, course_id, user_id, snapshot=None):
+        snapshot = _course_snapshot(course_id, user_id, snapshot)
 
-        return False
+        return snapshot.course_can_subscribe(course_id)
 
-    def is_available_for_user(self, course_id, user_id):
-        try:
-            course = Course.objects.get(pk=course_id)
+    def is_subscribed(self, course_id, user_id, snapshot=None):
+        snapshot = _course_snapshot(course_id, user_id, snapshot)
 
-            if course.dependent is None:
-                return True
+        return snapshot.course_is_subscribed(course_id)
 
-            if self.is_approved(course.dependent.id, user_id):
-                return True
+    def subscribe(self, course_id, user_id, snapshot=None):
+        snapshot = _course_snapshot(course_id, user_id, snapshot)
 
-            if self.is_approved(course.id, user_id):
-                return True
+        if snapshot.course_is_subscribed(course_id):
+            return True
+
+        if snapshot.course_can_subscribe(course_id):
+            from .services.progress import refresh_course_progress
 
-        except Exception as ex:
-            return False
+            try:
+                with transaction.atomic():
+                    CourseEnrollment.objects.create(
+                        course_id=course_id, user_id=user_id)
+                    refresh_course_progress([user_id], [course_id])
+            except IntegrityError:
+                # a concurrent request subscribed the user first
+                pass
+
+            snapshot.add_course_enrollment(course_id)
+            return True
 
         return False
 
-    def is_approved(self, course_id, user_id):
-        course_enrollment = CourseEnrollment.objects.filter(
-            course_id=course_id, user_id=user_id)
+    def is_available_for_user(self, course_id, user_id, snapshot=None):
+        snapshot = _course_snapshot(course_id, user_id, snapshot)
 
-        if course_enrollment.exists():
-            if course_enrollment[0].is_approved:
-                return True
+        return snapshot.course_is_available(course_id)
 
-        return False
+    def is_approved(self, course_id, user_id, snapshot=None):
+        if snapshot is not None and snapshot.covers_course(course_id):
+            return snapshot.course_is_approved(course_id)
+
+        return CourseEnrollment.objects.filter(
+            course_id=course_id, user_id=user_id, is_approved=True
+        ).exists()
 
 
 class Course(TimeStampedModel):
@@ -82,6 +86,8 @@ class Course(TimeStampedModel):
         null=True,
         related_name="predecessor_course"
     )
+    # maintained by the signals of Lesson, see services.counters
+    lesson_count = models.PositiveIntegerField(default=0)
 
     objects = CourseManager()
 
@@ -101,74 +107,103 @@ class LessonManager(models.Manager):
     def by_course(self, course_id):
         return self.get_queryset().by_course(course_id)
 
-    def can_subscribe(self, lesson_id, user_id):
-        try:
-            lesson = Lesson.objects.get(pk=lesson_id)
-
-            if self.is_subscribed(lesson_id, user_id):
-                return False
-
-            if lesson.dependent is None:
-                if lesson.course.dependent_id is None:
-                    return True
+    def snapshot(self, lesson_id, user_id):
+        return _lesson_snapshot(lesson_id, user_id)
 
-                if Course.objects.is_approved(lesson.course.dependent_id, user_id):
-                    return True
+    def can_subscribe(self, lesson_id, user_id, snapshot=None):
+        snapshot = _lesson_snapshot(lesson_id, user_id, snapshot)
 
-            if self.is_approved(lesson.dependent.id, user_id):
-                return True
+        return snapshot.lesson_can_subscribe(lesson_id)
 
-        except Exception as ex:
+    def is_subscribed(self, lesson_id, user_id, snapshot=None):
+        snapshot = _lesson_snapshot(lesson_id, user_id, snapshot)
 
-            return False
+        return snapshot.lesson_is_subscribed(lesson_id)
 
-    def is_subscribed(self, lesson_id, user_id):
-        lesson_enrollment = LessonEnrollment.objects.filter(
-            lesson_id=lesson_id, user_id=user_id)
+    def subscribe(self, lesson_id, user_id, snapshot=None):
+        snapshot = _lesson_snapshot(lesson_id, user_id, snapshot)
 
-        if lesson_enrollment.exists():
+        if snapshot.lesson_is_subscribed(lesson_id):
             return True
 
-        return False
-
-    def subscribe(self, lesson_id, user_id):
-        if not Lesson.objects.is_subscribed(lesson_id, user_id):
-            if Lesson.objects.can_subscribe(lesson_id, user_id):
-                LessonEnrollment.objects.create(
-                    lesson_id=lesson_id, user_id=user_id)
-                return True
-        else:
+        if snapshot.lesson_can_subscribe(lesson_id):
+            self.ensure_enrollment(lesson_id, user_id)
+            snapshot.add_lesson_enrollment(lesson_id)
             return True
 
         return False
 
-    def is_available_for_user(self, lesson_id, user_id):
-        try:
-            lesson = Lesson.objects.get(pk=lesson_id)
-
-            if lesson.dependent is None:
-                return True
-
-            if self.is_approved(lesson.dependent.id, user_id):
-                return True
-
-            if self.is_approved(lesson.id, user_id):
-                return True
-
-        except Exception as ex:
-            return False
-
-        return False
-
-    def is_approved(self, lesson_id, user_id):
-        lesson_enrollment = LessonEnrollment.objects.filter(
-            lesson_id=lesson_id, user_id=user_id)
-
-        if lesson_enrollment.exists():
-            if lesson_enrollment[0].is_approved:
-                return True
-
-        return False
+    def ensure_enrollment(self, lesson_id, user_id):
+        """
+        subscribe the user to the lesson if the prerequisites are met and it is
+        not subscribed yet, the check and the insert are a single
+        INSERT ... SELECT so concurrent requests can not duplicate the enrollment.
+        Returns True when the enrollment was created
+        """
+        from .services.progress import refresh_lesson_progress
+
+        lesson_table = Lesson._meta.db_table
+        course_table = Course._meta.db_table
+        lesson_enrollment_table = LessonEnrollment._meta.db_table
+        course_enrollment_table = CourseEnrollment._meta.db_table
+
+        sql = f"""
+            INSERT INTO {lesson_enrollment_table}
+                (created_at, updated_at, lesson_id, user_id, is_approved, score)
+            SELECT %s, %s, lesson.id, %s, %s, 0
+            FROM {lesson_table} lesson
+            INNER JOIN {course_table} course ON course.id = lesson.course_id
+            WHERE lesson.id = %s
+            AND NOT EXISTS (
+                SELECT 1 FROM {lesson_enrollment_table} enrollment
+                WHERE enrollment.lesson_id = lesson.id AND enrollment.user_id = %s
+            )
+            AND (
+                (lesson.dependent_id IS NULL AND (
+                    course.dependent_id IS NULL
+                    OR EXISTS (
+                        SELECT 1 FROM {course_enrollment_table} enrollment
+                        WHERE enrollment.course_id = course.dependent_id
+                        AND enrollment.user_id = %s AND enrollment.is_approved
+                    )
+                ))
+                OR EXISTS (
+                    SELECT 1 FROM {lesson_enrollment_table} enrollment
+                    WHERE enrollment.lesson_id = lesson.dependent_id
+                    AND enrollment.user_id = %s AND enrollment.is_approved
+                )
+            )
+        """
+
+        # self.db is the read alias, it can be a replica
+        using = router.db_for_write(LessonEnrollment)
+        connection = connections[using]
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [
+                    now, now, user_id, False, lesson_id, user_id, user_id, user_id
+                ])
+                created = cursor.rowcount == 1
+
+            if created:
+                refresh_lesson_progress([user_id], [lesson_id])
+
+        return created
+
+    def is_available_for_user(self, lesson_id, user_id, snapshot=None):
+        snapshot = _lesson_snapshot(lesson_id, user_id, snapshot)
+
+        return snapshot.lesson_is_available(lesson_id)
+
+    def is_approved(self, lesson_id, user_id, snapshot=None):
+        if snapshot is not None and snapshot.has_lesson(lesson_id):
+            return snapshot.lesson_is_approved(lesson_id)
+
+        return LessonEnrollment.objects.filter(
+            lesson_id=lesson_id, user_id=user_id, is_approved=True
+        ).exists()
 
 
 class Lesson(TimeStampedModel):
@@ -252,32 +287,95 @@ class AnswerManager(models.Manager):
 
 
 class Answer(TimeStampedModel):
+    # the index of the foreign key is a prefix of the composite one
     question = models.ForeignKey(
         'Question',
         on_delete=models.CASCADE,
-        related_name="answers"
+        related_name="answers",
+        db_index=False
     )
     description = models.CharField(max_length=200)
     is_correct = models.BooleanField()
 
     objects = AnswerManager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', 'is_correct'], name='answer_question_correct'),
+        ]
+
     def __str__(self):
         return self.description
 
 
+class CourseEnrollmentQuerySet(QuerySet):
+    def count_approved_lesson(self, course_id, user_ids):
+        return self.filter(course_id=course_id, user_id__in=user_ids).update(
+            approved_lesson_count=F('approved_lesson_count') + 1,
+            updated_at=timezone.now()
+        )
+
+    def approve_completed(self, course_id, user_ids):
+        """
+        approve, in a single compare-and-set UPDATE, the enrollments of the
+        users that have approved as many lessons as the course has, a course
+        without lessons is never completed
+        """
+        lesson_count = Course.objects.filter(
+            pk=OuterRef('course_id'), lesson_count__gt=0
+        ).values('lesson_count')
+
+        return self.filter(
+            course_id=course_id,
+            user_id__in=user_ids,
+            is_approved=False,
+            approved_lesson_count__gte=Subquery(lesson_count)
+        ).update(is_approved=True, updated_at=timezone.now())
+
+
+class CourseEnrollmentManager(models.Manager):
+    def get_queryset(self):
+        return CourseEnrollmentQuerySet(self.model, using=self._db)
+
+    def count_approved_lesson(self, course_id, user_ids):
+        return self.get_queryset().count_approved_lesson(course_id, user_ids)
+
+    def approve_completed(self, course_id, user_ids):
+        return self.get_queryset().approve_completed(course_id, user_ids)
+
+
 class CourseEnrollment(TimeStampedModel):
+    # the single column indexes of the foreign keys are prefixes of the
+    # composite ones
     course = models.ForeignKey(
         'Course',
         on_delete=models.CASCADE,
-        related_name="enrollments"
+        related_name="enrollments",
+        db_index=False
     )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='courses'
+        related_name='courses',
+        db_index=False
     )
     is_approved = models.BooleanField(default=False)
+    # approved lessons of the course, see services.counters
+    approved_lesson_count = models.PositiveIntegerField(default=0)
+
+    objects = CourseEnrollmentManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'course'], name='unique_course_enrollment'),
+        ]
+        indexes = [
+            # covers the users of a course by approval
+            models.Index(
+                fields=['course', 'is_approved', 'user'],
+                name='course_enrollment_approved'),
+        ]
 
 
 class LessonEnrollmentQuerySet(QuerySet):
@@ -306,21 +404,37 @@ class LessonEnrollmentManager(models.Manager):
 
 
 class LessonEnrollment(TimeStampedModel):
+    # the single column indexes of the foreign keys are prefixes of the
+    # composite ones
     lesson = models.ForeignKey(
         'Lesson',
         on_delete=models.CASCADE,
-        related_name="enrollments"
+        related_name="enrollments",
+        db_index=False
     )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='lessons'
+        related_name='lessons',
+        db_index=False
     )
     is_approved = models.BooleanField(default=False)
     score = models.IntegerField(default=0)
 
     objects = LessonEnrollmentManager()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'lesson'], name='unique_lesson_enrollment'),
+        ]
+        indexes = [
+            # covers the users of a lesson by approval
+            models.Index(
+                fields=['lesson', 'is_approved', 'user'],
+                name='lesson_enrollment_approved'),
+        ]
+
 
 class UserAnswer(TimeStampedModel):
     user = models.ForeignKey(
@@ -333,3 +447,114 @@ class UserAnswer(TimeStampedModel):
         on_delete=models.CASCADE,
         related_name="answered"
     )
+
+
+class CourseProgress(TimeStampedModel):
+    """
+    Denormalized enrollment flags of a user in a course, maintained in the
+    transactions that subscribe and approve, read by the student catalog
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='course_progress'
+    )
+    course = models.ForeignKey(
+        'Course',
+        on_delete=models.CASCADE,
+        related_name="progress"
+    )
+    is_subscribed = models.BooleanField(default=False)
+    is_approved = models.BooleanField(default=False)
+    dependent_is_approved = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'course'], name='unique_course_progress'),
+        ]
+
+
+class LessonProgress(TimeStampedModel):
+    """
+    Denormalized enrollment flags of a user in a lesson, maintained in the
+    transactions that subscribe and approve, read by the student catalog
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='lesson_progress'
+    )
+    lesson = models.ForeignKey(
+        'Lesson',
+        on_delete=models.CASCADE,
+        related_name="progress"
+    )
+    is_subscribed = models.BooleanField(default=False)
+    is_approved = models.BooleanField(default=False)
+    dependent_is_approved = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'lesson'], name='unique_lesson_progress'),
+        ]
+
+
+class TestAttemptManager(models.Manager):
+    def pending(self):
+        return self.filter(status='PENDING')
+
+    def claim(self, worker, limit, stale_before=None):
+        """
+        mark as RUNNING by the worker, in a single UPDATE, the oldest pending
+        attempts (and the ones claimed before stale_before) so concurrent
+        workers never grade the same attempt, the claimed attempts are returned
+        """
+        claimable = Q(status='PENDING')
+
+        if stale_before is not None:
+            claimable |= Q(status='RUNNING', claimed_at__lt=stale_before)
+
+        ids = self.filter(claimable).order_by('id').values('id')[:limit]
+        now = timezone.now()
+
+        claimed = self.filter(claimable, id__in=ids).update(
+            status='RUNNING', worker=worker, claimed_at=now, updated_at=now)
+
+        if claimed == 0:
+            return []
+
+        return list(self.filter(status='RUNNING', worker=worker, claimed_at=now))
+
+
+class TestAttempt(TimeStampedModel):
+    """
+    A submission of the test of a lesson stored to be graded by the
+    background workers, the student polls it for the result
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='attempts'
+    )
+    lesson = models.ForeignKey(
+        'Lesson',
+        on_delete=models.CASCADE,
+        related_name="attempts"
+    )
+    questions = models.JSONField()
+    status = models.CharField(
+        max_length=10,
+        choices=ATTEMPT_STATUSES,
+        default='PENDING',
+        db_index=True
+    )
+    worker = models.CharField(max_length=100, blank=True, default='')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    graded_at = models.DateTimeField(blank=True, null=True)
+    is_approved = models.BooleanField(default=False)
+    score = models.IntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+
+    objects = TestAttemptManager()
@@ -1,4 +1,5 @@
 from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from .models import (
@@ -8,8 +9,16 @@ from .models import (
     Lesson,
     LessonEnrollment,
     Question,
+    TestAttempt,
     UserAnswer
 )
+from .services.content import bump_lesson_version
+from .services.prerequisites import CycleError, PrerequisiteGraph
+from .services.question_import import (
+    DEFAULT_QUESTION_TYPE,
+    InvalidQuestion,
+    check_answers,
+)
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -21,6 +30,21 @@ class CourseSerializer(serializers.ModelSerializer):
             'dependent',
         )
 
+    def validate_dependent(self, value):
+        """
+        check that the dependency does not create a cycle
+        """
+        if value is not None:
+            course_id = self.instance.id if self.instance else None
+
+            try:
+                PrerequisiteGraph.for_catalog().check_course_dependency(
+                    course_id, value.id)
+            except CycleError as ex:
+                raise serializers.ValidationError(str(ex))
+
+        return value
+
 
 class CourseAvailableSerializer(serializers.ModelSerializer):
     is_approved = serializers.BooleanField()
@@ -69,6 +93,21 @@ class LessonSerializer(serializers.ModelSerializer):
             'course',
         )
 
+    def validate_dependent(self, value):
+        """
+        check that the dependency does not create a cycle
+        """
+        if value is not None:
+            lesson_id = self.instance.id if self.instance else None
+
+            try:
+                PrerequisiteGraph.for_catalog().check_lesson_dependency(
+                    lesson_id, value.id)
+            except CycleError as ex:
+                raise serializers.ValidationError(str(ex))
+
+        return value
+
 
 class LessonPreviewSerializer(serializers.ModelSerializer):
     is_approved = serializers.BooleanField()
@@ -116,14 +155,27 @@ class QuestionSerializer(serializers.ModelSerializer):
             answers = validated_data.pop('answers')
             question = Question.objects.create(**validated_data)
 
-            for answer in answers:
-                Answer.objects.create(question=question, **answer)
+            Answer.objects.bulk_create([
+                Answer(
+                    question=question,
+                    description=answer['description'],
+                    is_correct=answer['is_correct']
+                )
+                for answer in answers
+            ])
+
+            bump_lesson_version(question.lesson_id)
 
             return question
 
     def update(self, instance, validated_data):
+        """
+        write the answers with a bulk update, a bulk create and a single
+        delete, the queries do not grow with the number of answers
+        """
         with transaction.atomic():
             answers = validated_data.pop('answers')
+            previous_lesson_id = instance.lesson_id
 
             instance.description = validated_data.get(
                 'description',
@@ -137,22 +189,36 @@ class QuestionSerializer(serializers.ModelSerializer):
             instance.lesson = validated_data.get('lesson', instance.lesson)
             instance.save()
 
-            previous_answers = Answer.objects.filter(question_id=instance.id)
-            previous_answers_ids = [answer.id for answer in previous_answers]
+            now = timezone.now()
+            updated_answers = []
+            new_answers = []
 
             for answer in answers:
-                if 'id' in answer:
-                    answer_update = Answer.objects.get(pk=answer['id'])
-                    answer_update.description = answer['description']
-                    answer_update.is_correct = answer['is_correct']
-                    answer_update.save()
-
-                    previous_answers_ids.remove(answer['id'])
+                values = {
+                    'question': instance,
+                    'description': answer['description'],
+                    'is_correct': answer['is_correct'],
+                }
+
+                if answer.get('id') is not None:
+                    updated_answers.append(
+                        Answer(id=answer['id'], updated_at=now, **values))
                 else:
-                    Answer.objects.create(question=instance, **answer)
+                    new_answers.append(Answer(**values))
 
-            if len(previous_answers_ids) > 0:
-                Answer.objects.filter(pk__in=previous_answers_ids).delete()
+            # the delete loads the answers with their question, so the delete
+            # signals do not look it up once per answer
+            Answer.objects.by_question(instance.id).exclude(
+                pk__in=[answer.id for answer in updated_answers]
+            ).prefetch_related('question').delete()
+
+            Answer.objects.bulk_update(
+                updated_answers,
+                ['description', 'is_correct', 'updated_at']
+            )
+            Answer.objects.bulk_create(new_answers)
+
+            bump_lesson_version(previous_lesson_id, instance.lesson_id)
 
             return instance
 
@@ -160,26 +226,47 @@ class QuestionSerializer(serializers.ModelSerializer):
         """
         check that the answers are as expected
         """
-        if len(data['answers']) < 2:
-            raise serializers.ValidationError(
-                "At least two possible answers are required")
+        try:
+            check_answers(data.get('question_type', DEFAULT_QUESTION_TYPE), data['answers'])
+        except InvalidQuestion as ex:
+            raise serializers.ValidationError(str(ex))
 
-        corrects = 0
+        self.validate_answer_ids(data['answers'])
 
-        for answer in data['answers']:
-            if answer['is_correct'] == True:
-                corrects += 1
+        return data
 
-        if corrects == 0:
-            raise serializers.ValidationError(
-                "At least one correct answer was expected")
+    def validate_answer_ids(self, answers):
+        """
+        check that the answers sent with an id belong to the question
+        """
+        answers_ids = [
+            answer['id'] for answer in answers if answer.get('id') is not None
+        ]
 
-        if data['question_type'] == "BOOLEAN":
-            if len(data['answers']) != 2:
-                raise serializers.ValidationError(
-                    "Two responses were expected")
+        if len(answers_ids) == 0:
+            return
 
-        return data
+        if len(answers_ids) != len(set(answers_ids)):
+            raise serializers.ValidationError({
+                'answers': "An answer can not be sent twice"
+            })
+
+        question_answers_ids = set()
+
+        if self.instance is not None:
+            question_answers_ids = set(Answer.objects.by_question(
+                self.instance.id
+            ).filter(pk__in=answers_ids).values_list('id', flat=True))
+
+        foreign_ids = [
+            answer_id for answer_id in answers_ids
+            if answer_id not in question_answers_ids
+        ]
+
+        if len(foreign_ids) > 0:
+            raise serializers.ValidationError({
+                'answers': f"The answers {foreign_ids} do not belong to the question"
+            })
 
 
 class CourseEnrollmentSerializer(serializers.ModelSerializer):
@@ -287,6 +374,24 @@ class SendTestSerializer(serializers.Serializer):
         return data
 
 
+class TestAttemptSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='attempt-detail')
+
+    class Meta:
+        model = TestAttempt
+        fields = (
+            'id',
+            'url',
+            'lesson',
+            'status',
+            'is_approved',
+            'score',
+            'message',
+            'created_at',
+            'graded_at',
+        )
+
+
 class LogicSerializer(serializers.Serializer):
     N = serializers.IntegerField(required=True, min_value=1)
     M = serializers.IntegerField(required=True, min_value=1)
@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from core.db_router import primary_reads
+
+from elearning.models import Lesson
+from elearning.settings import ANSWER_KEY_CACHE_TIMEOUT
+
+from .content import get_lesson_version
+
+AnswerKeyQuestion = namedtuple(
+    'AnswerKeyQuestion',
+    ['question_type', 'score', 'description', 'answers']
+)
+
+
+class AnswerKey:
+    """
+    Compiled answer key of a lesson: question id -> type, score and the
+    frozenset of correct answer ids, cached by lesson content version
+    """
+    CACHE_KEY = 'elearning:answer_key:{}:{}'
+
+    def __init__(self, lesson_id, course_id, approval_score, questions,
+                 answer_questions=None):
+        self.lesson_id = lesson_id
+        self.course_id = course_id
+        self.approval_score = approval_score
+        self.questions = questions
+        self.answer_questions = answer_questions or {}
+
+    @classmethod
+    def for_lesson(cls, lesson_id):
+        key = cls.CACHE_KEY.format(int(lesson_id), get_lesson_version(lesson_id))
+        answer_key = cache.get(key)
+
+        if answer_key is None:
+            with primary_reads():
+                answer_key = cls.compile(lesson_id)
+
+            cache.set(key, answer_key, timeout=ANSWER_KEY_CACHE_TIMEOUT)
+
+        return answer_key
+
+    @classmethod
+    def compile(cls, lesson_id):
+        rows = Lesson.objects.filter(pk=lesson_id).values_list(
+            'course_id',
+            'approval_score',
+            'question__id',
+            'question__question_type',
+            'question__score',
+            'question__description',
+            'question__answers__id',
+            'question__answers__is_correct',
+        )
+
+        course_id = None
+        approval_score = None
+        questions = {}
+        correct_answers = {}
+        answer_questions = {}
+
+        for row in rows:
+            (course_id, approval_score, question_id, question_type,
+             score, description, answer_id, is_correct) = row
+
+            if question_id is None:
+                continue
+
+            if question_id not in questions:
+                questions[question_id] = (question_type, score, description)
+                correct_answers[question_id] = set()
+
+            if answer_id is not None:
+                answer_questions[answer_id] = question_id
+
+            if is_correct:
+                correct_answers[question_id].add(answer_id)
+
+        if course_id is None:
+            raise Lesson.DoesNotExist(f"Lesson {lesson_id} does not exist")
+
+        compiled = {
+            question_id: AnswerKeyQuestion(
+                question_type,
+                score,
+                description,
+                frozenset(correct_answers[question_id])
+            )
+            for question_id, (question_type, score, description) in questions.items()
+        }
+
+        return cls(
+            int(lesson_id),
+            course_id,
+            approval_score,
+            compiled,
+            answer_questions
+        )
+
+    @property
+    def question_ids(self):
+        return frozenset(self.questions.keys())
+
+    def is_correct(self, question_id, user_answers):
+        """
+        check the answers given by the user to a question
+        """
+        question = self.questions.get(question_id)
+
+        if question is None:
+            return False
+
+        if question.question_type in ("BOOLEAN", "MULTIPLE_CHOOSE_A_CORRECT_ONE"):
+            return not question.answers.isdisjoint(user_answers)
+
+        if question.question_type == "CHOOSE_ALL_THE_RIGHT":
+            return question.answers == user_answers
+
+        return False
+
+    def score(self, user_answers):
+        """
+        total score of the answers of a user, {question_id: frozenset(answer ids)}
+        """
+        return sum(
+            question.score
+            for question_id, question in self.questions.items()
+            if self.is_correct(question_id, user_answers.get(question_id, frozenset()))
+        )
@@ -0,0 +1,252 @@
+import numpy as np
+
+from django.db import transaction
+from django.utils import timezone
+
+from elearning.models import (
+    CourseEnrollment,
+    LessonEnrollment,
+    UserAnswer,
+)
+
+from .answer_key import AnswerKey
+from .progress import refresh_course_progress, refresh_lesson_progress
+
+ANSWER_BITS = 32
+
+
+class BatchTestReview:
+    """
+    Grade many submissions of the test of a lesson at once: every selected
+    answer becomes a cell of a submission x question incidence matrix that is
+    checked against a single loaded answer key, approved results are then
+    persisted in bulk
+    """
+    PERSIST_CHUNK_SIZE = 500
+
+    def __init__(self, lesson_id, submissions=[], answer_key=None):
+        self._lesson_id = lesson_id
+        self._submissions = submissions
+        self.__answer_key = answer_key
+
+        self.__users = []
+        self.__results = []
+        self.__selections = None
+
+    def evaluate(self):
+        results = self.grade()
+
+        self.__save_results()
+
+        return results
+
+    def grade(self):
+        if self.__answer_key is None:
+            self.__answer_key = AnswerKey.for_lesson(self._lesson_id)
+
+        rows, columns, answers = self.__process_submissions()
+
+        if len(self.__users) > 0:
+            self.__grade_matrix(rows, columns, answers)
+
+        return self.__results
+
+    def __process_submissions(self):
+        question_index = {
+            question_id: index
+            for index, question_id in enumerate(sorted(self.__answer_key.questions))
+        }
+        seen_users = set()
+        rows = []
+        columns = []
+        answers = []
+
+        for submission in self._submissions:
+            result = {
+                'user': None,
+                'score': 0,
+                'is_approved': False,
+                'message': "",
+            }
+            self.__results.append(result)
+
+            try:
+                if isinstance(submission, Exception):
+                    raise ValueError(submission)
+
+                user_id = int(submission['user'])
+                result['user'] = user_id
+
+                if user_id in seen_users:
+                    raise ValueError("duplicated submission for the user")
+
+                row = len(self.__users)
+                submission_rows = []
+
+                for question in submission['questions']:
+                    column = question_index.get(int(question['id']))
+
+                    for answer in question['answers']:
+                        answer_id = int(answer['id'])
+
+                        # the ids are packed with the cell in an int64
+                        if not 0 <= answer_id < 1 << ANSWER_BITS:
+                            raise ValueError(f"answer id {answer_id} is out of range")
+
+                        if column is not None:
+                            submission_rows.append((column, answer_id))
+
+            except (KeyError, TypeError, ValueError) as ex:
+                result['message'] = f"invalid submission: {ex}"
+                continue
+
+            seen_users.add(user_id)
+            self.__users.append((user_id, result))
+
+            for column, answer_id in submission_rows:
+                rows.append(row)
+                columns.append(column)
+                answers.append(answer_id)
+
+        return rows, columns, answers
+
+    def __grade_matrix(self, rows, columns, answers):
+        answer_key = self.__answer_key
+        question_ids = sorted(answer_key.questions)
+        questions = [answer_key.questions[question_id] for question_id in question_ids]
+        total_questions = len(questions)
+        total_submissions = len(self.__users)
+
+        scores = np.array([question.score for question in questions], dtype=np.int64)
+        total_correct = np.array([len(question.answers) for question in questions])
+        choose_all = np.array([
+            question.question_type == "CHOOSE_ALL_THE_RIGHT"
+            for question in questions
+        ], dtype=bool)
+        single_choice = np.array([
+            question.question_type in ("BOOLEAN", "MULTIPLE_CHOOSE_A_CORRECT_ONE")
+            for question in questions
+        ], dtype=bool)
+
+        column_of_question = {
+            question_id: column for column, question_id in enumerate(question_ids)
+        }
+        correct_codes = np.array([
+            (column << ANSWER_BITS) | answer_id
+            for column, question in enumerate(questions)
+            for answer_id in question.answers
+        ], dtype=np.int64)
+        valid_codes = np.array([
+            (column_of_question[question_id] << ANSWER_BITS) | answer_id
+            for answer_id, question_id in answer_key.answer_questions.items()
+        ], dtype=np.int64)
+
+        # unique (submission, question, answer) selections
+        cells = (np.array(rows, dtype=np.int64) * total_questions
+                 + np.array(columns, dtype=np.int64))
+        selections = np.unique(
+            (cells << ANSWER_BITS) | np.array(answers, dtype=np.int64))
+        cells = selections >> ANSWER_BITS
+        answer_ids = selections & ((1 << ANSWER_BITS) - 1)
+        codes = ((cells % total_questions) << ANSWER_BITS) | answer_ids
+
+        is_hit = np.isin(codes, correct_codes)
+        is_valid = np.isin(codes, valid_codes)
+
+        total_cells = total_submissions * total_questions
+        shape = (total_submissions, total_questions)
+        selected = np.bincount(cells, minlength=total_cells).reshape(shape)
+        hits = np.bincount(cells, weights=is_hit, minlength=total_cells).reshape(shape)
+
+        is_correct = np.where(
+            choose_all,
+            (hits == selected) & (selected == total_correct),
+            single_choice & (hits > 0)
+        )
+
+        user_scores = is_correct.astype(np.int64) @ scores
+        answered = selected > 0
+        complete = answered.all(axis=1)
+        approved = complete & (user_scores >= answer_key.approval_score)
+
+        for row, (user_id, result) in enumerate(self.__users):
+            result['score'] = int(user_scores[row])
+            result['is_approved'] = bool(approved[row])
+
+            if not complete[row]:
+                result['message'] = "".join(
+                    f"question \"{questions[column].description}\" was not answered \n"
+                    for column in np.flatnonzero(~answered[row])
+                )
+
+        self.__selections = (
+            cells[is_valid] // total_questions,
+            answer_ids[is_valid]
+        )
+
+    def __save_results(self):
+        approved = [
+            (row, user_id, result)
+            for row, (user_id, result) in enumerate(self.__users)
+            if result['is_approved']
+        ]
+
+        if len(approved) == 0:
+            return
+
+        selection_rows, selection_answers = self.__selections
+        now = timezone.now()
+
+        with transaction.atomic():
+            for start in range(0, len(approved), self.PERSIST_CHUNK_SIZE):
+                chunk = approved[start:start + self.PERSIST_CHUNK_SIZE]
+                by_user = {user_id: (row, result) for row, user_id, result in chunk}
+
+                # locked, so a lesson approved concurrently is counted once
+                enrollments = list(LessonEnrollment.objects.select_for_update().filter(
+                    lesson_id=self._lesson_id,
+                    user_id__in=by_user.keys(),
+                    is_approved=False
+                ))
+
+                persisted_rows = []
+
+                for enrollment in enrollments:
+                    row, result = by_user.pop(enrollment.user_id, (None, None))
+
+                    if row is None:
+                        continue
+
+                    enrollment.score = result['score']
+                    enrollment.is_approved = True
+                    enrollment.updated_at = now
+                    persisted_rows.append(row)
+
+                for row, result in by_user.values():
+                    result['is_approved'] = False
+                    result['message'] = "the test is not available to the user"
+
+                LessonEnrollment.objects.bulk_update(
+                    enrollments,
+                    ['score', 'is_approved', 'updated_at']
+                )
+
+                mask = np.isin(selection_rows, persisted_rows)
+                UserAnswer.objects.bulk_create([
+                    UserAnswer(user_id=self.__users[row][0], answer_id=answer_id)
+                    for row, answer_id in zip(
+                        selection_rows[mask].tolist(),
+                        selection_answers[mask].tolist()
+                    )
+                ])
+
+                user_ids = [enrollment.user_id for enrollment in enrollments]
+                course_id = self.__answer_key.course_id
+
+                CourseEnrollment.objects.count_approved_lesson(course_id, user_ids)
+                refresh_lesson_progress(
+                    user_ids, [self._lesson_id], with_successors=True)
+
+                if CourseEnrollment.objects.approve_completed(course_id, user_ids):
+                    refresh_course_progress(
+                        user_ids, [course_id], with_successors=True)
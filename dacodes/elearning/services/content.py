@@ -0,0 +1,134 @@
+import time
+
+from django.db import transaction
+
+from core.cache import shared_cache
+
+LESSON_VERSION_KEY = 'elearning:lesson:{}:version'
+CATALOG_VERSION_KEY = 'elearning:catalog:version'
+USER_PROGRESS_VERSION_KEY = 'elearning:user:{}:progress:version'
+
+
+def _lesson_version_key(lesson_id):
+    return LESSON_VERSION_KEY.format(int(lesson_id))
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _pending_bumps():
+    connection = transaction.get_connection()
+
+    if not connection.in_atomic_block:
+        return []
+
+    return [
+        callback for _, callback in connection.run_on_commit
+        if isinstance(callback, _VersionBump)
+    ]
+
+
+def _get_version(key):
+    # the versions are shared by the workers and the grader, the artifacts
+    # keyed by them are cached by every process on its own
+    versions = shared_cache()
+    version = versions.get(key)
+
+    if version is None:
+        version = _new_version()
+
+        if not versions.add(key, version, timeout=None):
+            version = versions.get(key, version)
+
+        # a later write of the transaction must delete the new version too
+        for bump in _pending_bumps():
+            bump.deleted.discard(key)
+
+    return version
+
+
+class _VersionBump:
+    """
+    delete of versions run on commit, a deleted version is replaced by a new
+    one on its next read, a single statement for the database cache
+    """
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self.deleted = set(keys)
+
+    def __call__(self):
+        shared_cache().delete_many(list(self.keys))
+
+
+def _bump_versions(keys):
+    """
+    the versions are deleted right away and again on commit, once per
+    transaction while they are not read again, however many rows of a lesson
+    the transaction writes
+    """
+    keys = set(keys)
+
+    for bump in _pending_bumps():
+        keys -= bump.deleted
+
+    if not keys:
+        return
+
+    shared_cache().delete_many(list(keys))
+
+    pending = _pending_bumps()
+
+    if pending:
+        pending[-1].keys |= keys
+        pending[-1].deleted |= keys
+    elif transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_VersionBump(keys))
+
+
+def get_lesson_version(lesson_id):
+    """
+    current content version of a lesson, every cached artifact built from
+    the questions and answers of the lesson must be keyed by it
+    """
+    return _get_version(_lesson_version_key(lesson_id))
+
+
+def bump_lesson_version(*lesson_ids):
+    """
+    invalidate the cached content of the lessons, the version is bumped right
+    away and again on commit so nothing compiled from uncommitted data survives
+    """
+    _bump_versions({
+        _lesson_version_key(lesson_id)
+        for lesson_id in lesson_ids
+        if lesson_id is not None
+    })
+
+
+def get_catalog_version():
+    """
+    current version of the structure of the catalog, the courses and the
+    lessons with their dependencies
+    """
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    _bump_versions({CATALOG_VERSION_KEY})
+
+
+def get_user_progress_version(user_id):
+    """
+    current version of the enrollments of a user, every cached artifact built
+    from them must be keyed by it
+    """
+    return _get_version(USER_PROGRESS_VERSION_KEY.format(int(user_id)))
+
+
+def bump_user_progress_version(*user_ids):
+    _bump_versions({
+        USER_PROGRESS_VERSION_KEY.format(int(user_id))
+        for user_id in user_ids
+        if user_id is not None
+    })
@@ -0,0 +1,107 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from elearning.models import Course, CourseEnrollment, Lesson, LessonEnrollment
+
+from .progress import refresh_course_progress
+
+
+def _approved_users(lesson_id):
+    return LessonEnrollment.objects.filter(
+        lesson_id=lesson_id, is_approved=True).values('user_id')
+
+
+def lesson_added(course_id):
+    Course.objects.filter(pk=course_id).update(lesson_count=F('lesson_count') + 1)
+
+
+def lesson_removed(lesson_id, course_id):
+    """
+    discount the lesson from its course, before its enrollments are deleted
+    """
+    Course.objects.filter(pk=course_id).update(lesson_count=F('lesson_count') - 1)
+    CourseEnrollment.objects.filter(
+        course_id=course_id, user_id__in=_approved_users(lesson_id)
+    ).update(approved_lesson_count=F('approved_lesson_count') - 1)
+    _approve_completed(course_id)
+
+
+def _approve_completed(course_id):
+    """
+    approve the enrollments that completed the course once it has a lesson
+    less, the students may have approved every remaining lesson. Without
+    lessons left nobody completed it
+    """
+    lesson_count = Course.objects.filter(
+        pk=course_id, lesson_count__gt=0).values('lesson_count')
+    user_ids = list(CourseEnrollment.objects.filter(
+        course_id=course_id,
+        is_approved=False,
+        approved_lesson_count__gte=Subquery(lesson_count)
+    ).values_list('user_id', flat=True))
+
+    if user_ids and CourseEnrollment.objects.approve_completed(course_id, user_ids):
+        refresh_course_progress(user_ids, [course_id], with_successors=True)
+
+
+def lesson_moved(lesson_id, previous_course_id, course_id):
+    lesson_removed(lesson_id, previous_course_id)
+    lesson_added(course_id)
+    CourseEnrollment.objects.filter(
+        course_id=course_id, user_id__in=_approved_users(lesson_id)
+    ).update(approved_lesson_count=F('approved_lesson_count') + 1)
+
+
+def _counted(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values('total')[:1]),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _lesson_count():
+    return _counted(Lesson.objects.filter(
+        course_id=OuterRef('id')
+    ).values('course_id').annotate(total=Count('id')))
+
+
+def _approved_lesson_count():
+    return _counted(LessonEnrollment.objects.filter(
+        user_id=OuterRef('user_id'),
+        lesson__course_id=OuterRef('course_id'),
+        is_approved=True
+    ).values('user_id').annotate(total=Count('id')))
+
+
+def counter_drift():
+    """
+    (model, id, stored, expected) of every counter that does not match the
+    rows it counts
+    """
+    courses = Course.objects.annotate(expected=_lesson_count()).exclude(
+        lesson_count=F('expected')).values_list('id', 'lesson_count', 'expected')
+    enrollments = CourseEnrollment.objects.annotate(
+        expected=_approved_lesson_count()
+    ).exclude(
+        approved_lesson_count=F('expected')
+    ).values_list('id', 'approved_lesson_count', 'expected')
+
+    return (
+        [(Course, pk, stored, expected) for pk, stored, expected in courses]
+        + [(CourseEnrollment, pk, stored, expected) for pk, stored, expected in enrollments]
+    )
+
+
+def reconcile_counters():
+    """
+    recompute every counter, set-based, the rows updated are returned
+    """
+    now = timezone.now()
+
+    return (
+        Course.objects.update(lesson_count=_lesson_count(), updated_at=now)
+        + CourseEnrollment.objects.update(
+            approved_lesson_count=_approved_lesson_count(), updated_at=now)
+    )
@@ -0,0 +1,135 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import CharField, Value
+from rest_framework.renderers import JSONRenderer
+
+from core.db_router import primary_reads
+
+from elearning.models import CourseEnrollment, LessonEnrollment
+from elearning.settings import PROGRESS_DASHBOARD_CACHE_TIMEOUT
+
+from .content import get_catalog_version, get_user_progress_version
+from .prerequisites import LOCKED, PrerequisiteGraph
+
+
+class ProgressDashboard:
+    """
+    Rendered JSON of every course a student is enrolled in with its lessons,
+    approvals, scores and unlock state. It is built from the cached catalog
+    graph and one query of the enrollments of the student, and cached by the
+    catalog version and the progress version of the student
+    """
+    CACHE_KEY = 'elearning:progress_dashboard:{}:{}:{}'
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+    @classmethod
+    def for_user(cls, user_id):
+        catalog_version = get_catalog_version()
+        key = cls.CACHE_KEY.format(
+            int(user_id), catalog_version, get_user_progress_version(user_id))
+        dashboard = cache.get(key)
+
+        if dashboard is None:
+            with primary_reads():
+                dashboard = cls.render(user_id, catalog_version)
+
+            cache.set(key, dashboard, timeout=PROGRESS_DASHBOARD_CACHE_TIMEOUT)
+
+        return dashboard
+
+    @classmethod
+    def enrollments(cls, user_id):
+        """
+        {course id: (is_approved, approved lessons)} and
+        {lesson id: (is_approved, score)} of the user, in one query
+        """
+        course_enrollments = CourseEnrollment.objects.filter(
+            user_id=user_id
+        ).annotate(
+            kind=Value('course', output_field=CharField()),
+        ).values_list('course_id', 'is_approved', 'approved_lesson_count', 'kind')
+
+        lesson_enrollments = LessonEnrollment.objects.filter(
+            user_id=user_id
+        ).annotate(
+            kind=Value('lesson', output_field=CharField()),
+        ).values_list('lesson_id', 'is_approved', 'score', 'kind')
+
+        enrollments = {'course': {}, 'lesson': {}}
+
+        for pk, is_approved, value, kind in course_enrollments.union(lesson_enrollments, all=True):
+            enrollments[kind][pk] = (bool(is_approved), value)
+
+        return enrollments['course'], enrollments['lesson']
+
+    @classmethod
+    def render(cls, user_id, catalog_version=None):
+        graph = PrerequisiteGraph.for_catalog(catalog_version)
+        courses, lessons = cls.enrollments(user_id)
+        state = {
+            'course': {pk: is_approved for pk, (is_approved, _) in courses.items()},
+            'lesson': {pk: is_approved for pk, (is_approved, _) in lessons.items()},
+        }
+
+        data = {
+            'courses': [
+                cls.course(graph, state, course_id, courses[course_id], lessons)
+                for course_id in graph.courses
+                if course_id in courses
+            ],
+        }
+
+        return cls(JSONRenderer().render(data))
+
+    @classmethod
+    def course(cls, graph, state, course_id, enrollment, lessons):
+        name, dependent_id = graph.courses[course_id]
+        is_approved, approved_lesson_count = enrollment
+        lesson_ids = graph.course_lessons.get(course_id, [])
+
+        return {
+            'id': course_id,
+            'name': name,
+            'dependent': dependent_id,
+            'status': graph.course_status(state, course_id),
+            'is_approved': is_approved,
+            'lesson_count': len(lesson_ids),
+            'approved_lesson_count': approved_lesson_count,
+            'lessons': [
+                cls.lesson(graph, state, lesson_id, lessons.get(lesson_id))
+                for lesson_id in lesson_ids
+            ],
+        }
+
+    @classmethod
+    def lesson(cls, graph, state, lesson_id, enrollment):
+        title, course_id, dependent_id = graph.lessons[lesson_id]
+        lesson_status = graph.lesson_status(state, lesson_id)
+        is_approved, score = enrollment or (False, None)
+
+        return {
+            'id': lesson_id,
+            'title': title,
+            'dependent': dependent_id,
+            'status': lesson_status,
+            'is_unlocked': lesson_status != LOCKED,
+            'is_subscribed': enrollment is not None,
+            'is_approved': is_approved,
+            'score': score,
+        }
+
+    def matches(self, if_none_match):
+        """
+        check an If-None-Match header against the ETag of the dashboard
+        """
+        if not if_none_match:
+            return False
+
+        if if_none_match.strip() == '*':
+            return True
+
+        return self.etag in [etag.strip() for etag in if_none_match.split(',')]
@@ -0,0 +1,232 @@
+from django.db.models import CharField, F, IntegerField, Subquery, Value
+
+from elearning.models import (
+    Course,
+    CourseEnrollment,
+    Lesson,
+    LessonEnrollment,
+)
+
+
+class EnrollmentSnapshot:
+    """
+    Enrollment state of a user inside a course (the course, its dependent
+    course and every lesson of the course), loaded once so that all the
+    prerequisite and approval checks of a request are answered from memory
+    """
+    COURSE = 'course'
+    LESSON = 'lesson'
+
+    def __init__(self, user_id, course_id=None, lesson_id=None):
+        self._user_id = user_id
+        self._course_id = None
+        self._course_dependent_id = None
+        self._lessons = {}
+        self._course_enrollments = {}
+        self._lesson_enrollments = {}
+        self._other_lesson_approvals = {}
+
+        self.__load_structure(course_id, lesson_id)
+
+        if self._course_id is not None:
+            self.__load_enrollments()
+
+    @classmethod
+    def for_course(cls, course_id, user_id):
+        return cls(user_id, course_id=course_id)
+
+    @classmethod
+    def for_lesson(cls, lesson_id, user_id):
+        return cls(user_id, lesson_id=lesson_id)
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @property
+    def course_id(self):
+        return self._course_id
+
+    @property
+    def course_dependent_id(self):
+        return self._course_dependent_id
+
+    @property
+    def lesson_ids(self):
+        return list(self._lessons.keys())
+
+    def __load_structure(self, course_id, lesson_id):
+        courses = Course.objects.all()
+
+        if course_id is not None:
+            courses = courses.filter(pk=course_id)
+        else:
+            courses = courses.filter(pk=Subquery(
+                Lesson.objects.filter(pk=lesson_id).values('course_id')
+            ))
+
+        rows = courses.values_list(
+            'id',
+            'dependent_id',
+            'lessons__id',
+            'lessons__dependent_id'
+        )
+
+        for course, dependent, lesson, lesson_dependent in rows:
+            self._course_id = course
+            self._course_dependent_id = dependent
+
+            if lesson is not None:
+                self._lessons[lesson] = lesson_dependent
+
+    def __load_enrollments(self):
+        courses_ids = [self._course_id]
+
+        if self._course_dependent_id is not None:
+            courses_ids.append(self._course_dependent_id)
+
+        course_enrollments = CourseEnrollment.objects.filter(
+            user_id=self._user_id,
+            course_id__in=courses_ids
+        ).annotate(
+            kind=Value(self.COURSE, output_field=CharField()),
+            enrollment_score=Value(0, output_field=IntegerField()),
+        ).values_list('course_id', 'is_approved', 'kind', 'enrollment_score')
+
+        lesson_enrollments = LessonEnrollment.objects.by_course(
+            self._course_id
+        ).by_user(self._user_id).annotate(
+            kind=Value(self.LESSON, output_field=CharField()),
+            enrollment_score=F('score'),
+        ).values_list('lesson_id', 'is_approved', 'kind', 'enrollment_score')
+
+        # annotations go after the model fields in the SELECT of both sides
+        for pk, is_approved, kind, score in course_enrollments.union(
+                lesson_enrollments, all=True):
+            if kind == self.COURSE:
+                self._course_enrollments[pk] = bool(is_approved)
+            else:
+                self._lesson_enrollments[pk] = {
+                    'is_approved': bool(is_approved),
+                    'score': score,
+                }
+
+    def has_course(self, course_id):
+        return self._course_id is not None and int(course_id) == self._course_id
+
+    def covers_course(self, course_id):
+        return self.has_course(course_id) or (
+            self._course_dependent_id is not None
+            and int(course_id) == self._course_dependent_id
+        )
+
+    def has_lesson(self, lesson_id):
+        return int(lesson_id) in self._lessons
+
+    def course_is_subscribed(self, course_id):
+        return int(course_id) in self._course_enrollments
+
+    def course_is_approved(self, course_id):
+        return self._course_enrollments.get(int(course_id), False)
+
+    def course_can_subscribe(self, course_id):
+        if not self.has_course(course_id):
+            return False
+
+        if self.course_is_subscribed(course_id):
+            return False
+
+        if self._course_dependent_id is None:
+            return True
+
+        return self.course_is_approved(self._course_dependent_id)
+
+    def course_is_available(self, course_id):
+        if not self.has_course(course_id):
+            return False
+
+        if self._course_dependent_id is None:
+            return True
+
+        if self.course_is_approved(self._course_dependent_id):
+            return True
+
+        return self.course_is_approved(course_id)
+
+    def lesson_is_subscribed(self, lesson_id):
+        return int(lesson_id) in self._lesson_enrollments
+
+    def lesson_is_approved(self, lesson_id):
+        enrollment = self._lesson_enrollments.get(int(lesson_id))
+
+        return enrollment is not None and enrollment['is_approved']
+
+    def dependent_lesson_is_approved(self, dependent_id):
+        """
+        the dependent lesson can be a lesson of another course, its enrollment
+        is not in the snapshot and is read on its own
+        """
+        dependent_id = int(dependent_id)
+
+        if dependent_id in self._lessons:
+            return self.lesson_is_approved(dependent_id)
+
+        if dependent_id not in self._other_lesson_approvals:
+            self._other_lesson_approvals[dependent_id] = LessonEnrollment.objects.filter(
+                user_id=self._user_id,
+                lesson_id=dependent_id,
+                is_approved=True
+            ).exists()
+
+        return self._other_lesson_approvals[dependent_id]
+
+    def lesson_score(self, lesson_id):
+        enrollment = self._lesson_enrollments.get(int(lesson_id))
+
+        return enrollment['score'] if enrollment is not None else 0
+
+    def lesson_can_subscribe(self, lesson_id):
+        if not self.has_lesson(lesson_id):
+            return False
+
+        if self.lesson_is_subscribed(lesson_id):
+            return False
+
+        dependent_id = self._lessons[int(lesson_id)]
+
+        if dependent_id is None:
+            if self._course_dependent_id is None:
+                return True
+
+            return self.course_is_approved(self._course_dependent_id)
+
+        return self.dependent_lesson_is_approved(dependent_id)
+
+    def lesson_is_available(self, lesson_id):
+        if not self.has_lesson(lesson_id):
+            return False
+
+        dependent_id = self._lessons[int(lesson_id)]
+
+        if dependent_id is None:
+            return True
+
+        if self.dependent_lesson_is_approved(dependent_id):
+            return True
+
+        return self.lesson_is_approved(lesson_id)
+
+    def approved_lessons_count(self):
+        return sum(
+            1 for enrollment in self._lesson_enrollments.values()
+            if enrollment['is_approved']
+        )
+
+    def add_course_enrollment(self, course_id, is_approved=False):
+        self._course_enrollments[int(course_id)] = is_approved
+
+    def add_lesson_enrollment(self, lesson_id, is_approved=False, score=0):
+        self._lesson_enrollments[int(lesson_id)] = {
+            'is_approved': is_approved,
+            'score': score,
+        }
@@ -0,0 +1,179 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from elearning.models import TestAttempt
+from elearning.settings import (
+    GRADING_BATCH_SIZE,
+    GRADING_CLAIM_TIMEOUT,
+    GRADING_POLL_INTERVAL,
+)
+
+from .answer_key import AnswerKey
+from .batch_review import BatchTestReview
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_attempt(user_id, lesson_id, questions):
+    """
+    store a validated submission to be graded by the workers
+    """
+    return TestAttempt.objects.create(
+        user_id=user_id, lesson_id=lesson_id, questions=questions)
+
+
+def _worker_name():
+    return f'{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}'
+
+
+def _rounds(attempts):
+    """
+    the attempts split in groups without two attempts of the same user, the
+    batch review grades one submission per user
+    """
+    rounds = []
+
+    for attempt in attempts:
+        for attempts_round in rounds:
+            if attempt.user_id not in attempts_round:
+                attempts_round[attempt.user_id] = attempt
+                break
+        else:
+            rounds.append({attempt.user_id: attempt})
+
+    return [list(attempts_round.values()) for attempts_round in rounds]
+
+
+class GradingWorker:
+    """
+    Grade the attempts of the job table in batches: the oldest pending
+    attempts are claimed with a single UPDATE, grouped by lesson and graded
+    by BatchTestReview against one answer key, the results of a group are
+    written in the same transaction as the approvals
+    """
+    def __init__(self, name=None, batch_size=GRADING_BATCH_SIZE,
+                 poll_interval=GRADING_POLL_INTERVAL):
+        self.name = name or _worker_name()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            close_old_connections()
+
+            try:
+                graded = self.run_once()
+            except Exception:
+                logger.exception("grading worker %s failed", self.name)
+                graded = 0
+
+            if graded == 0:
+                stop_event.wait(self.poll_interval)
+
+        close_old_connections()
+
+    def run_once(self):
+        """
+        grade a batch of attempts, the number graded is returned
+        """
+        stale_before = timezone.now() - timedelta(seconds=GRADING_CLAIM_TIMEOUT)
+        attempts = TestAttempt.objects.claim(self.name, self.batch_size, stale_before)
+        lessons = {}
+
+        for attempt in attempts:
+            lessons.setdefault(attempt.lesson_id, []).append(attempt)
+
+        for lesson_id, lesson_attempts in lessons.items():
+            answer_key = AnswerKey.for_lesson(lesson_id)
+
+            for attempts_round in _rounds(lesson_attempts):
+                try:
+                    self.grade(lesson_id, answer_key, attempts_round)
+                except Exception as ex:
+                    logger.exception("grading of lesson %s failed", lesson_id)
+                    self.fail(attempts_round, ex)
+
+        return len(attempts)
+
+    def grade(self, lesson_id, answer_key, attempts):
+        submissions = [
+            {'user': attempt.user_id, 'questions': attempt.questions}
+            for attempt in attempts
+        ]
+        now = timezone.now()
+
+        with transaction.atomic():
+            results = BatchTestReview(lesson_id, submissions, answer_key).evaluate()
+
+            for attempt, result in zip(attempts, results):
+                attempt.status = 'DONE'
+                attempt.is_approved = result['is_approved']
+                attempt.score = result['score']
+                attempt.message = result['message']
+                attempt.graded_at = now
+                attempt.updated_at = now
+
+            TestAttempt.objects.bulk_update(
+                attempts,
+                ['status', 'is_approved', 'score', 'message', 'graded_at', 'updated_at']
+            )
+
+    def fail(self, attempts, error):
+        TestAttempt.objects.filter(id__in=[attempt.id for attempt in attempts]).update(
+            status='FAILED',
+            message=f"unexpected error: {error}",
+            graded_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+
+
+class GradingPool:
+    """
+    grading workers running on local threads, no broker is needed since the
+    job table is the queue, more processes can share it
+    """
+    def __init__(self, workers=2, **options):
+        self.stop_event = threading.Event()
+        self.workers = [
+            GradingWorker(name=f'{_worker_name()}-{index}', **options)
+            for index in range(workers)
+        ]
+        self.threads = []
+
+    def start(self):
+        for index, worker in enumerate(self.workers):
+            thread = threading.Thread(
+                target=worker.run, args=(self.stop_event, ),
+                name=f'grading-{index}', daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+def wait_for_attempt(attempt_id, timeout, interval):
+    """
+    the attempt once it is graded or when the timeout expires
+    """
+    deadline = time.monotonic() + timeout
+
+    while True:
+        attempt = TestAttempt.objects.filter(pk=attempt_id).first()
+
+        if (attempt is None or attempt.status in ('DONE', 'FAILED')
+                or time.monotonic() >= deadline):
+            return attempt
+
+        time.sleep(interval)
@@ -1,3 +1,9 @@
+import numpy as np
+
+from core.parsers import numbered
+from elearning.settings import LOGIC_STREAM_CHUNK_SIZE
+
+
 class LogicTest:
     def __init__(self, scenarios=[]):
         self._scenarios = scenarios
@@ -31,3 +37,166 @@ class LogicTest:
                         results.append("D")
 
         return results
+
+
+class InvalidScenarios(ValueError):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class VectorLogicTest:
+    """
+    LogicTest over whole columns of N and M: the input is parsed into integer
+    arrays, the bounds are checked as arrays and the direction is picked with
+    NumPy masks, there is no per scenario Python code after the parsing
+    """
+    DIRECTIONS = np.array(['L', 'R', 'U', 'D'])
+    MAX_REPORTED_POSITIONS = 10
+
+    def __init__(self, n, m):
+        self._n = self.__column('N', n)
+        self._m = self.__column('M', m)
+
+        if len(self._n) != len(self._m):
+            raise InvalidScenarios({'M': ["N and M must have the same length"]})
+
+        self.__check_bounds()
+
+    @classmethod
+    def from_scenarios(cls, scenarios):
+        """
+        from the list of {"N", "M"} objects of the JSON body
+        """
+        try:
+            return cls(
+                [scenario['N'] for scenario in scenarios],
+                [scenario['M'] for scenario in scenarios]
+            )
+        except (KeyError, TypeError):
+            raise InvalidScenarios({
+                'non_field_errors': ["Every scenario must be an object with N and M"]
+            })
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        from a columnar body, {"N": [...], "M": [...]}
+        """
+        for column in ('N', 'M'):
+            if not isinstance(columns.get(column), list):
+                raise InvalidScenarios({column: ["A list of integers is required"]})
+
+        return cls(columns['N'], columns['M'])
+
+    @classmethod
+    def from_table(cls, header, rows):
+        """
+        from the rows of a CSV body, the columns are N, M unless a header says
+        otherwise
+        """
+        header = header or ['N', 'M']
+
+        if rows.size == 0:
+            return cls([], [])
+
+        if 'N' not in header or 'M' not in header or rows.shape[1] != len(header):
+            raise InvalidScenarios({
+                'non_field_errors': ["The CSV must have the N and M columns"]
+            })
+
+        return cls(rows[:, header.index('N')], rows[:, header.index('M')])
+
+    def __column(self, name, values):
+        column = np.asarray(values)
+
+        if column.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if column.ndim != 1 or column.dtype.kind not in 'iu':
+            raise InvalidScenarios({name: ["A valid integer is required"]})
+
+        return column.astype(np.int64, copy=False)
+
+    def __check_bounds(self):
+        errors = {}
+
+        for name, column in (('N', self._n), ('M', self._m)):
+            invalid = np.flatnonzero(column < 1)
+
+            if len(invalid) > 0:
+                positions = invalid[:self.MAX_REPORTED_POSITIONS].tolist()
+                errors[name] = [
+                    f"Ensure this value is greater than or equal to 1, "
+                    f"{len(invalid)} invalid values at positions {positions}"
+                ]
+
+        if errors:
+            raise InvalidScenarios(errors)
+
+    def get_results(self):
+        n = self._n
+        m = self._m
+
+        # N <= M turns left or right by the parity of N, otherwise up or down
+        # by the parity of M
+        directions = np.where(n <= m, n & 1, 2 + (m & 1))
+
+        return self.DIRECTIONS[directions].tolist()
+
+
+def _scenario_errors(scenario):
+    """
+    the errors LogicSerializer would report for a scenario, None when valid
+    """
+    if not isinstance(scenario, dict):
+        return {'non_field_errors': ["Invalid data. Expected a dictionary."]}
+
+    errors = {}
+
+    for field in ('N', 'M'):
+        value = scenario.get(field)
+
+        if value is None:
+            errors[field] = ["This field is required."]
+        elif not isinstance(value, int) or isinstance(value, bool):
+            errors[field] = ["A valid integer is required."]
+        elif value < 1:
+            errors[field] = ["Ensure this value is greater than or equal to 1."]
+
+    return errors or None
+
+
+def stream_results(scenarios, chunk_size=LOGIC_STREAM_CHUNK_SIZE):
+    """
+    evaluate a stream of scenarios, yielding {"line", "result"} or
+    {"line", "errors"} per scenario in order; scenarios are read and
+    evaluated a chunk at a time so memory does not grow with the stream
+    """
+    chunk = []
+
+    for line, scenario in numbered(scenarios):
+        if isinstance(scenario, Exception):
+            errors = {'non_field_errors': [str(getattr(scenario, 'detail', scenario))]}
+        else:
+            errors = _scenario_errors(scenario)
+
+        chunk.append((line, scenario, errors))
+
+        if len(chunk) >= chunk_size:
+            yield from _evaluate_chunk(chunk)
+            chunk = []
+
+    if len(chunk) > 0:
+        yield from _evaluate_chunk(chunk)
+
+
+def _evaluate_chunk(chunk):
+    valid = [scenario for line, scenario, errors in chunk if errors is None]
+    results = iter(VectorLogicTest.from_scenarios(valid).get_results())
+
+    for line, scenario, errors in chunk:
+        if errors is None:
+            yield {'line': line, 'result': next(results)}
+        else:
+            yield {'line': line, 'errors': errors}
@@ -0,0 +1,226 @@
+from django.core.cache import cache
+from django.db.models import CharField, Value
+
+from core.db_router import primary_reads
+
+from elearning.models import (
+    Course,
+    CourseEnrollment,
+    Lesson,
+    LessonEnrollment,
+)
+from elearning.settings import PREREQUISITE_GRAPH_CACHE_TIMEOUT
+
+from .content import get_catalog_version
+
+APPROVED = 'approved'
+SUBSCRIBED = 'subscribed'
+AVAILABLE = 'available'
+LOCKED = 'locked'
+
+
+class CycleError(Exception):
+    pass
+
+
+class PrerequisiteGraph:
+    """
+    Courses and lessons with their dependencies, every node points to the
+    one it depends on. It is compiled with two queries and cached by the
+    catalog version so prerequisite questions are answered from memory
+    """
+    CACHE_KEY = 'elearning:prerequisites:{}'
+
+    def __init__(self, courses, lessons):
+        # course id -> (name, dependent id)
+        self.courses = courses
+        # lesson id -> (title, course id, dependent id)
+        self.lessons = lessons
+
+        self.course_successors = {}
+        self.course_lessons = {}
+
+        for course_id, (name, dependent_id) in courses.items():
+            self.course_successors.setdefault(dependent_id, []).append(course_id)
+
+        for lesson_id, (title, course_id, dependent_id) in lessons.items():
+            self.course_lessons.setdefault(course_id, []).append(lesson_id)
+
+    @classmethod
+    def for_catalog(cls, version=None):
+        if version is None:
+            version = get_catalog_version()
+
+        key = cls.CACHE_KEY.format(version)
+        graph = cache.get(key)
+
+        if graph is None:
+            with primary_reads():
+                graph = cls.compile()
+
+            cache.set(key, graph, timeout=PREREQUISITE_GRAPH_CACHE_TIMEOUT)
+
+        return graph
+
+    @classmethod
+    def compile(cls):
+        courses = {
+            course_id: (name, dependent_id)
+            for course_id, name, dependent_id
+            in Course.objects.order_by('id').values_list('id', 'name', 'dependent_id')
+        }
+        lessons = {
+            lesson_id: (title, course_id, dependent_id)
+            for lesson_id, title, course_id, dependent_id
+            in Lesson.objects.order_by('id').values_list(
+                'id', 'title', 'course_id', 'dependent_id')
+        }
+
+        return cls(courses, lessons)
+
+    def __chain(self, nodes, node_id, dependent_index):
+        chain = []
+        seen = set()
+
+        while node_id is not None and node_id in nodes and node_id not in seen:
+            seen.add(node_id)
+            chain.append(node_id)
+            node_id = nodes[node_id][dependent_index]
+
+        chain.reverse()
+
+        return chain
+
+    def course_path(self, course_id):
+        """
+        prerequisite courses of a course, from the first one to the course itself
+        """
+        return self.__chain(self.courses, course_id, 1)
+
+    def lesson_path(self, lesson_id):
+        """
+        prerequisite lessons of a lesson, from the first one to the lesson itself
+        """
+        return self.__chain(self.lessons, lesson_id, 2)
+
+    def check_course_dependency(self, course_id, dependent_id):
+        if course_id is not None and course_id in self.course_path(dependent_id):
+            raise CycleError("The course can not depend on itself or on a course that depends on it")
+
+    def check_lesson_dependency(self, lesson_id, dependent_id):
+        if lesson_id is not None and lesson_id in self.lesson_path(dependent_id):
+            raise CycleError("The lesson can not depend on itself or on a lesson that depends on it")
+
+    def user_state(self, user_id):
+        """
+        enrollments of the user in every course and lesson, in one query
+        """
+        course_enrollments = CourseEnrollment.objects.filter(
+            user_id=user_id
+        ).annotate(
+            kind=Value('course', output_field=CharField()),
+        ).values_list('course_id', 'is_approved', 'kind')
+
+        lesson_enrollments = LessonEnrollment.objects.filter(
+            user_id=user_id
+        ).annotate(
+            kind=Value('lesson', output_field=CharField()),
+        ).values_list('lesson_id', 'is_approved', 'kind')
+
+        state = {'course': {}, 'lesson': {}}
+
+        for pk, is_approved, kind in course_enrollments.union(lesson_enrollments, all=True):
+            state[kind][pk] = bool(is_approved)
+
+        return state
+
+    def course_status(self, state, course_id):
+        courses = state['course']
+
+        if courses.get(course_id):
+            return APPROVED
+
+        if course_id in courses:
+            return SUBSCRIBED
+
+        dependent_id = self.courses[course_id][1]
+
+        if dependent_id is None or courses.get(dependent_id):
+            return AVAILABLE
+
+        return LOCKED
+
+    def lesson_status(self, state, lesson_id):
+        lessons = state['lesson']
+
+        if lessons.get(lesson_id):
+            return APPROVED
+
+        if lesson_id in lessons:
+            return SUBSCRIBED
+
+        title, course_id, dependent_id = self.lessons[lesson_id]
+
+        if course_id not in state['course']:
+            return LOCKED
+
+        if dependent_id is None:
+            course_dependent_id = self.courses[course_id][1]
+
+            if course_dependent_id is None or state['course'].get(course_dependent_id):
+                return AVAILABLE
+
+            return LOCKED
+
+        if lessons.get(dependent_id):
+            return AVAILABLE
+
+        return LOCKED
+
+    def unlock_next(self, state):
+        """
+        courses and lessons the user can subscribe to right now
+        """
+        return {
+            'courses': [
+                course_id for course_id in self.courses
+                if self.course_status(state, course_id) == AVAILABLE
+            ],
+            'lessons': [
+                lesson_id for lesson_id in self.lessons
+                if self.lesson_status(state, lesson_id) == AVAILABLE
+            ],
+        }
+
+    def course_tree(self, state, dependent_id=None):
+        """
+        courses nested under the course they depend on, with their lessons
+        """
+        return [
+            {
+                'id': course_id,
+                'name': self.courses[course_id][0],
+                'status': self.course_status(state, course_id),
+                'lessons': [
+                    {
+                        'id': lesson_id,
+                        'title': self.lessons[lesson_id][0],
+                        'dependent': self.lessons[lesson_id][2],
+                        'status': self.lesson_status(state, lesson_id),
+                    }
+                    for lesson_id in self.course_lessons.get(course_id, [])
+                ],
+                'unlocks': self.course_tree(state, course_id),
+            }
+            for course_id in self.course_successors.get(dependent_id, [])
+        ]
+
+    def course_path_status(self, state, course_id):
+        return [
+            {
+                'id': path_course_id,
+                'name': self.courses[path_course_id][0],
+                'status': self.course_status(state, path_course_id),
+            }
+            for path_course_id in self.course_path(course_id)
+        ]
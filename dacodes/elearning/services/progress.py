@@ -0,0 +1,185 @@
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from elearning.models import (
+    Course,
+    CourseEnrollment,
+    CourseProgress,
+    Lesson,
+    LessonEnrollment,
+    LessonProgress,
+)
+
+from .content import bump_user_progress_version
+
+
+def _course_flags():
+    enrollments = CourseEnrollment.objects.filter(
+        user_id=OuterRef('user_id')
+    )
+
+    return {
+        'is_subscribed': Exists(enrollments.filter(course_id=OuterRef('course_id'))),
+        'is_approved': Exists(enrollments.filter(
+            course_id=OuterRef('course_id'), is_approved=True)),
+        'dependent_is_approved': Exists(enrollments.filter(
+            course__predecessor_course=OuterRef('course_id'), is_approved=True)),
+    }
+
+
+def _lesson_flags():
+    enrollments = LessonEnrollment.objects.filter(
+        user_id=OuterRef('user_id')
+    )
+
+    return {
+        'is_subscribed': Exists(enrollments.filter(lesson_id=OuterRef('lesson_id'))),
+        'is_approved': Exists(enrollments.filter(
+            lesson_id=OuterRef('lesson_id'), is_approved=True)),
+        'dependent_is_approved': Exists(enrollments.filter(
+            lesson__predecessor_lesson=OuterRef('lesson_id'), is_approved=True)),
+    }
+
+
+def refresh_course_progress(user_ids, course_ids, with_successors=False):
+    """
+    recompute from the enrollment tables the progress of the users in the
+    courses (and in the courses that depend on them), set-based
+    """
+    course_ids = set(course_ids)
+
+    if with_successors:
+        course_ids.update(Course.objects.filter(
+            dependent_id__in=course_ids).values_list('id', flat=True))
+
+    CourseProgress.objects.bulk_create([
+        CourseProgress(user_id=user_id, course_id=course_id)
+        for user_id in user_ids
+        for course_id in course_ids
+    ], ignore_conflicts=True)
+
+    CourseProgress.objects.filter(
+        user_id__in=user_ids,
+        course_id__in=course_ids
+    ).update(updated_at=timezone.now(), **_course_flags())
+
+    bump_user_progress_version(*user_ids)
+
+
+def refresh_lesson_progress(user_ids, lesson_ids, with_successors=False):
+    """
+    recompute from the enrollment tables the progress of the users in the
+    lessons (and in the lessons that depend on them), set-based
+    """
+    lesson_ids = set(lesson_ids)
+
+    if with_successors:
+        lesson_ids.update(Lesson.objects.filter(
+            dependent_id__in=lesson_ids).values_list('id', flat=True))
+
+    LessonProgress.objects.bulk_create([
+        LessonProgress(user_id=user_id, lesson_id=lesson_id)
+        for user_id in user_ids
+        for lesson_id in lesson_ids
+    ], ignore_conflicts=True)
+
+    LessonProgress.objects.filter(
+        user_id__in=user_ids,
+        lesson_id__in=lesson_ids
+    ).update(updated_at=timezone.now(), **_lesson_flags())
+
+    bump_user_progress_version(*user_ids)
+
+
+def refresh_course_dependency(course_id):
+    """
+    the dependent course changed, recompute the flag for every user
+    """
+    course = Course.objects.filter(pk=course_id).values('dependent_id').first()
+
+    if course is None:
+        return
+
+    CourseProgress.objects.bulk_create([
+        CourseProgress(user_id=user_id, course_id=course_id)
+        for user_id in CourseEnrollment.objects.filter(
+            course_id=course['dependent_id'], is_approved=True
+        ).values_list('user_id', flat=True)
+    ], ignore_conflicts=True)
+
+    CourseProgress.objects.filter(course_id=course_id).update(
+        updated_at=timezone.now(),
+        dependent_is_approved=_course_flags()['dependent_is_approved']
+    )
+
+
+def refresh_lesson_dependency(lesson_id):
+    """
+    the dependent lesson changed, recompute the flag for every user
+    """
+    lesson = Lesson.objects.filter(pk=lesson_id).values('dependent_id').first()
+
+    if lesson is None:
+        return
+
+    LessonProgress.objects.bulk_create([
+        LessonProgress(user_id=user_id, lesson_id=lesson_id)
+        for user_id in LessonEnrollment.objects.filter(
+            lesson_id=lesson['dependent_id'], is_approved=True
+        ).values_list('user_id', flat=True)
+    ], ignore_conflicts=True)
+
+    LessonProgress.objects.filter(lesson_id=lesson_id).update(
+        updated_at=timezone.now(),
+        dependent_is_approved=_lesson_flags()['dependent_is_approved']
+    )
+
+
+def _expected_progress(enrollments, dependents):
+    """
+    {(user, item): (is_subscribed, is_approved, dependent_is_approved)} for
+    every pair with at least one flag set
+    """
+    successors = {}
+
+    for item_id, dependent_id in dependents.items():
+        if dependent_id is not None:
+            successors.setdefault(dependent_id, []).append(item_id)
+
+    progress = {}
+
+    for user_id, item_id, is_approved in enrollments:
+        flags = progress.setdefault((user_id, item_id), [False, False, False])
+        flags[0] = True
+        flags[1] = flags[1] or is_approved
+
+        if is_approved:
+            for successor_id in successors.get(item_id, []):
+                progress.setdefault(
+                    (user_id, successor_id), [False, False, False])[2] = True
+
+    return {key: tuple(flags) for key, flags in progress.items()}
+
+
+def expected_course_progress():
+    return _expected_progress(
+        CourseEnrollment.objects.values_list('user_id', 'course_id', 'is_approved'),
+        dict(Course.objects.values_list('id', 'dependent_id'))
+    )
+
+
+def expected_lesson_progress():
+    return _expected_progress(
+        LessonEnrollment.objects.values_list('user_id', 'lesson_id', 'is_approved'),
+        dict(Lesson.objects.values_list('id', 'dependent_id'))
+    )
+
+
+def stored_progress(model, field):
+    return {
+        (user_id, item_id): (is_subscribed, is_approved, dependent_is_approved)
+        for user_id, item_id, is_subscribed, is_approved, dependent_is_approved
+        in model.objects.values_list(
+            'user_id', field, 'is_subscribed', 'is_approved', 'dependent_is_approved')
+        if is_subscribed or is_approved or dependent_is_approved
+    }
@@ -0,0 +1,207 @@
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.parsers import numbered
+from elearning.models import Answer, Lesson, Question
+from elearning.settings import (
+    QUESTION_IMPORT_CHUNK_SIZE,
+    QUESTION_IMPORT_MAX_ERRORS,
+    QUESTION_TYPES,
+)
+
+from .content import bump_lesson_version
+
+QUESTION_TYPE_VALUES = frozenset(value for value, label in QUESTION_TYPES)
+DEFAULT_QUESTION_TYPE = Question._meta.get_field('question_type').default
+DESCRIPTION_MAX_LENGTH = Question._meta.get_field('description').max_length
+
+
+class InvalidQuestion(ValueError):
+    pass
+
+
+def check_answers(question_type, answers):
+    """
+    rules every question must follow about its answers
+    """
+    if len(answers) < 2:
+        raise InvalidQuestion("At least two possible answers are required")
+
+    if not any(answer['is_correct'] is True for answer in answers):
+        raise InvalidQuestion("At least one correct answer was expected")
+
+    if question_type == "BOOLEAN" and len(answers) != 2:
+        raise InvalidQuestion("Two responses were expected")
+
+
+def _description(value, field):
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidQuestion(f"{field} is required")
+
+    if len(value) > DESCRIPTION_MAX_LENGTH:
+        raise InvalidQuestion(
+            f"{field} can not have more than {DESCRIPTION_MAX_LENGTH} characters")
+
+    return value
+
+
+class QuestionImport:
+    """
+    Import a stream of questions, with their answers, into a lesson. Every
+    element is validated on its own and the valid ones are written with bulk
+    inserts in chunked transactions, so the memory used is bounded by the
+    chunk size and not by the size of the stream
+    """
+    COLUMNS = {
+        Question: ('created_at', 'updated_at', 'lesson_id', 'description',
+                   'score', 'question_type'),
+        Answer: ('created_at', 'updated_at', 'question_id', 'description',
+                 'is_correct'),
+    }
+
+    def __init__(self, lesson_id, questions, chunk_size=QUESTION_IMPORT_CHUNK_SIZE):
+        self._lesson_id = lesson_id
+        self._questions = questions
+        self._chunk_size = chunk_size
+
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+
+    def run(self):
+        chunk = []
+
+        for line, question in numbered(self._questions):
+            try:
+                chunk.append(self.parse(question))
+            except InvalidQuestion as ex:
+                self.reject(line, str(ex))
+                continue
+
+            if len(chunk) >= self._chunk_size:
+                self.write(chunk)
+                chunk = []
+
+        if len(chunk) > 0:
+            self.write(chunk)
+
+        return self.report()
+
+    def report(self):
+        return {
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+        }
+
+    def reject(self, line, message):
+        self.rejected += 1
+
+        if len(self.errors) < QUESTION_IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def parse(self, question):
+        """
+        validated (description, score, question_type, answers) of an element
+        of the stream, the parse errors of the stream are elements too
+        """
+        if isinstance(question, Exception):
+            raise InvalidQuestion(getattr(question, 'detail', str(question)))
+
+        if not isinstance(question, dict):
+            raise InvalidQuestion("A question object was expected")
+
+        description = _description(question.get('description'), 'description')
+
+        score = question.get('score')
+
+        if not isinstance(score, int) or isinstance(score, bool):
+            raise InvalidQuestion("score must be an integer")
+
+        question_type = question.get('question_type', DEFAULT_QUESTION_TYPE)
+
+        if question_type not in QUESTION_TYPE_VALUES:
+            raise InvalidQuestion(f"\"{question_type}\" is not a valid question_type")
+
+        answers = question.get('answers')
+
+        if not isinstance(answers, list):
+            raise InvalidQuestion("answers must be a list")
+
+        parsed_answers = []
+
+        for answer in answers:
+            if not isinstance(answer, dict):
+                raise InvalidQuestion("An answer object was expected")
+
+            if not isinstance(answer.get('is_correct'), bool):
+                raise InvalidQuestion("is_correct of the answers must be a boolean")
+
+            parsed_answers.append((
+                _description(answer.get('description'), 'answer description'),
+                answer['is_correct'],
+            ))
+
+        check_answers(question_type, [
+            {'is_correct': is_correct} for _, is_correct in parsed_answers
+        ])
+
+        return description, score, question_type, parsed_answers
+
+    def write(self, chunk):
+        """
+        insert the questions and answers of a chunk with one executemany each,
+        model instances are not built so the rate is bound by the database
+        """
+        using = router.db_for_write(Question)
+        connection = connections[using]
+        now = timezone.now()
+        timestamp = connection.ops.adapt_datetimefield_value(now)
+
+        with transaction.atomic(using=using):
+            question_ids = self.__insert_questions(
+                using, connection, now, timestamp, chunk)
+
+            self.__insert(connection, Answer, [
+                (timestamp, timestamp, question_id, description, is_correct)
+                for question_id, (_, _, _, answers) in zip(question_ids, chunk)
+                for description, is_correct in answers
+            ])
+
+            bump_lesson_version(self._lesson_id)
+
+        self.imported += len(chunk)
+
+    def __insert_questions(self, using, connection, now, timestamp, chunk):
+        rows = [
+            (timestamp, timestamp, self._lesson_id, description, score, question_type)
+            for description, score, question_type, _ in chunk
+        ]
+
+        # the rows of the chunk must be the last ones of the lesson when they
+        # are read back: the lesson row is written before the last id is read,
+        # a deferred sqlite transaction takes the write lock on its first
+        # write and the other databases lock the row until the commit
+        Lesson.objects.using(using).filter(pk=self._lesson_id).update(updated_at=now)
+        last_id = Question.objects.using(using).aggregate(
+            last_id=Max('id'))['last_id'] or 0
+
+        self.__insert(connection, Question, rows)
+
+        return Question.objects.using(using).by_lesson(self._lesson_id).filter(
+            pk__gt=last_id
+        ).order_by('id').values_list('id', flat=True)
+
+    def __insert(self, connection, model, rows):
+        columns = self.COLUMNS[model]
+        quote_name = connection.ops.quote_name
+
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote_name(model._meta.db_table),
+            ', '.join(quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
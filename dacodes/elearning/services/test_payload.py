@@ -0,0 +1,88 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core.db_router import primary_reads
+
+from elearning.models import Answer, Question
+from elearning.serializer import GetLessonQuestionSerializer
+from elearning.settings import (
+    TEST_PAYLOAD_CACHE_TIMEOUT,
+    TEST_PAYLOAD_RENDER_TIMEOUT,
+)
+
+from .content import get_lesson_version
+
+
+class TestPayload:
+    """
+    Rendered JSON of the test of a lesson, shared by every student and cached
+    by lesson content version. Concurrent misses wait for a single render
+    """
+    CACHE_KEY = 'elearning:test_payload:{}:{}'
+    LOCK_KEY = 'elearning:test_payload:{}:{}:lock'
+    WAIT_INTERVAL = 0.05
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+
+    @classmethod
+    def for_lesson(cls, lesson_id):
+        version = get_lesson_version(lesson_id)
+        key = cls.CACHE_KEY.format(int(lesson_id), version)
+        payload = cache.get(key)
+
+        if payload is not None:
+            return payload
+
+        lock_key = cls.LOCK_KEY.format(int(lesson_id), version)
+
+        if cache.add(lock_key, True, timeout=TEST_PAYLOAD_RENDER_TIMEOUT):
+            try:
+                with primary_reads():
+                    payload = cls.render(lesson_id)
+
+                cache.set(key, payload, timeout=TEST_PAYLOAD_CACHE_TIMEOUT)
+            finally:
+                cache.delete(lock_key)
+
+            return payload
+
+        deadline = time.monotonic() + TEST_PAYLOAD_RENDER_TIMEOUT
+
+        while time.monotonic() < deadline:
+            time.sleep(cls.WAIT_INTERVAL)
+            payload = cache.get(key)
+
+            if payload is not None:
+                return payload
+
+        with primary_reads():
+            return cls.render(lesson_id)
+
+    @classmethod
+    def render(cls, lesson_id):
+        # the composite index of the answers would return the correct ones last
+        questions = Question.objects.by_lesson(lesson_id).prefetch_related(
+            Prefetch('answers', queryset=Answer.objects.order_by('id'))
+        ).order_by('id')
+
+        serializer = GetLessonQuestionSerializer(questions, many=True)
+
+        return cls(JSONRenderer().render(serializer.data))
+
+    def matches(self, if_none_match):
+        """
+        check an If-None-Match header against the ETag of the payload
+        """
+        if not if_none_match:
+            return False
+
+        if if_none_match.strip() == '*':
+            return True
+
+        return self.etag in [etag.strip() for etag in if_none_match.split(',')]
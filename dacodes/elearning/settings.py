@@ -7,3 +7,48 @@ QUESTION_TYPES = (
     ('MULTIPLE_CHOOSE_A_CORRECT_ONE', 'MULTIPLE_CHOOSE_A_CORRECT_ONE'),
     ('CHOOSE_ALL_THE_RIGHT', 'CHOOSE_ALL_THE_RIGHT'),
 )
+
+# seconds a compiled lesson answer key is kept in cache, it is also
+# discarded whenever the content version of the lesson changes
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+
+# seconds the compiled prerequisite graph of the catalog is kept in cache,
+# it is also discarded whenever a course or a lesson changes
+PREREQUISITE_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+
+# seconds the rendered test of a lesson is kept in cache and the longest a
+# request waits for a concurrent render of the same test
+TEST_PAYLOAD_CACHE_TIMEOUT = 60 * 60 * 24
+TEST_PAYLOAD_RENDER_TIMEOUT = 10
+
+# seconds the progress dashboard of a student is kept in cache, it is also
+# discarded whenever the enrollments of the student or the catalog change
+PROGRESS_DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+# questions written per transaction by the bulk question import and the
+# most per line errors it reports
+QUESTION_IMPORT_CHUNK_SIZE = 2000
+QUESTION_IMPORT_MAX_ERRORS = 1000
+
+# scenarios evaluated together by the streaming mode of the logic test,
+# the memory of a streamed request is bounded by it
+LOGIC_STREAM_CHUNK_SIZE = 1000
+
+# states of a test attempt graded in the background
+ATTEMPT_STATUSES = (
+    ('PENDING', 'PENDING'),
+    ('RUNNING', 'RUNNING'),
+    ('DONE', 'DONE'),
+    ('FAILED', 'FAILED'),
+)
+
+# attempts a grading worker claims and grades together, the seconds it sleeps
+# when the queue is empty and the seconds after which the attempts claimed by
+# a worker that died are claimed again
+GRADING_BATCH_SIZE = 200
+GRADING_POLL_INTERVAL = 0.5
+GRADING_CLAIM_TIMEOUT = 60 * 5
+
+# longest a request waits (?wait=seconds) for an attempt to be graded
+ATTEMPT_MAX_WAIT = 20
+ATTEMPT_WAIT_INTERVAL = 0.25
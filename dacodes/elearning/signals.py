@@ -0,0 +1,90 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Answer, Course, Lesson, Question
+from .services.content import bump_catalog_version, bump_lesson_version
+from .services.counters import lesson_added, lesson_moved, lesson_removed
+from .services.progress import refresh_course_dependency, refresh_lesson_dependency
+
+
+def _dependent_changed(model, instance):
+    if instance.pk is None:
+        return instance.dependent_id is not None
+
+    previous = model.objects.filter(
+        pk=instance.pk
+    ).values_list('dependent_id', flat=True).first()
+
+    return previous != instance.dependent_id
+
+
+@receiver(pre_save, sender=Course)
+def course_will_change(sender, instance, **kwargs):
+    instance._dependent_changed = _dependent_changed(Course, instance)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+
+    if getattr(instance, '_dependent_changed', False):
+        refresh_course_dependency(instance.id)
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_will_change(sender, instance, **kwargs):
+    previous = None
+
+    if instance.pk is not None:
+        previous = Lesson.objects.filter(
+            pk=instance.pk
+        ).values_list('dependent_id', 'course_id').first()
+
+    if previous is None:
+        instance._dependent_changed = instance.dependent_id is not None
+        instance._previous_course_id = None
+    else:
+        instance._dependent_changed = previous[0] != instance.dependent_id
+        instance._previous_course_id = previous[1]
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created, **kwargs):
+    previous_course_id = getattr(instance, '_previous_course_id', None)
+
+    if created:
+        lesson_added(instance.course_id)
+    elif previous_course_id not in (None, instance.course_id):
+        lesson_moved(instance.id, previous_course_id, instance.course_id)
+
+
+@receiver(pre_delete, sender=Lesson)
+def lesson_will_be_deleted(sender, instance, **kwargs):
+    # before the cascade removes the approved enrollments
+    lesson_removed(instance.id, instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    bump_lesson_version(instance.id)
+    bump_catalog_version()
+
+    if getattr(instance, '_dependent_changed', False):
+        refresh_lesson_dependency(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_lesson_version(instance.lesson_id)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    if Answer.question.is_cached(instance):
+        lesson_id = instance.question.lesson_id
+    else:
+        lesson_id = Question.objects.filter(
+            pk=instance.question_id
+        ).values_list('lesson_id', flat=True).first()
+
+    bump_lesson_version(lesson_id)
@@ -1,10 +1,48 @@
+import itertools
 import json
 import os
+import shutil
+import tempfile
+import time
+import unittest
+from io import StringIO
+from unittest.mock import patch
 
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from core.db_router import ReplicaRouter
+from core.roles import get_user_roles
+
+from .benchmark import QUERY_BUDGETS, Benchmark, BenchmarkDataset, over_budget
+from .models import (
+    Answer,
+    Course,
+    CourseEnrollment,
+    CourseProgress,
+    Lesson,
+    LessonEnrollment,
+    Question,
+    TestAttempt,
+    UserAnswer,
+)
+from .services.answer_key import AnswerKey
+from .services.batch_review import BatchTestReview
+from .services.content import get_user_progress_version
+from .services.grading_queue import GradingWorker
+from .services.logic import LogicTest, VectorLogicTest, stream_results
+from .services.prerequisites import PrerequisiteGraph
+from .services.review import TestReview
+
 
 class LogicTests(APITestCase):
     def setUp(self):
@@ -26,4 +64,1247 @@ class LogicTests(APITestCase):
         valid_response = self.load_json('logic_results.json')
         response.render()
         json_response = json.loads(response.content)
-        self.assertEqual(json_response, valid_response)
\ No newline at end of file
+        self.assertEqual(json_response, valid_response)
+
+    def test_vector_engine_matches_the_reference(self):
+        url = reverse('logic_test')
+        data = self.load_json('logic.json')
+        valid_response = self.load_json('logic_results.json')
+
+        response = self.client.post(f'{url}?engine=vector', data, format='json')
+        self.assertEqual(response.data, valid_response)
+
+        columns = {
+            'N': [scenario['N'] for scenario in data],
+            'M': [scenario['M'] for scenario in data],
+        }
+        response = self.client.post(url, columns, format='json')
+        self.assertEqual(response.data, valid_response)
+
+        csv = 'N,M\n' + '\n'.join(f"{scenario['N']},{scenario['M']}" for scenario in data)
+        response = self.client.post(url, csv, content_type='text/csv')
+        self.assertEqual(response.data, valid_response)
+
+        scenarios = [{'N': n, 'M': m} for n in range(1, 30) for m in range(1, 30)]
+        self.assertEqual(
+            VectorLogicTest.from_scenarios(scenarios).get_results(),
+            LogicTest(scenarios).get_results()
+        )
+
+    def test_vector_engine_checks_bounds(self):
+        url = reverse('logic_test')
+
+        response = self.client.post(url, {'N': [1, 0, 2], 'M': [1, 1, -3]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('[1]', response.data['N'][0])
+        self.assertIn('[2]', response.data['M'][0])
+
+        response = self.client.post(url, {'N': [1, 1.5], 'M': [1, 1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(url, '1,2\n3,x', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_mode_reports_errors_inline(self):
+        data = self.load_json('logic.json')
+        lines = [json.dumps(scenario) for scenario in data]
+        lines.insert(1, '{"N": 0, "M": 1}')
+        lines.insert(3, 'nope')
+
+        response = self.client.post(
+            reverse('logic_test'), '\n'.join(lines), content_type='application/x-ndjson')
+
+        self.assertTrue(response.streaming)
+        results = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(len(results), 7)
+        self.assertIn('N', results[1]['errors'])
+        self.assertIn('non_field_errors', results[3]['errors'])
+        self.assertEqual(
+            [result['result'] for result in results if 'result' in result],
+            self.load_json('logic_results.json')['result']
+        )
+
+    def test_stream_is_evaluated_by_chunks(self):
+        scenarios = ({'N': index, 'M': 2} for index in itertools.count(1))
+        results = stream_results(scenarios, chunk_size=10)
+
+        self.assertEqual(
+            [result['result'] for result in itertools.islice(results, 3)],
+            ['R', 'L', 'U']
+        )
+
+def worker(name):
+    """
+    settings of another worker process, the default cache is its own
+    """
+    return override_settings(CACHES=dict(settings.CACHES, default={
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'worker-{name}',
+    }))
+
+
+class ElearningTestCase(APITestCase):
+    """
+    Base test case with a course chain (basic -> advanced) of two lessons each
+    """
+    def setUp(self):
+        self.student = User.objects.create_user('student', password='student')
+        self.teacher = User.objects.create_user('teacher', password='teacher')
+
+        Group.objects.create(name='STUDENT').user_set.add(self.student)
+        Group.objects.create(name='TEACHER').user_set.add(self.teacher)
+
+        self.basic = Course.objects.create(name='basic')
+        self.advanced = Course.objects.create(
+            name='advanced', dependent=self.basic)
+
+        self.first_lesson = self.create_lesson(self.basic, 'first')
+        self.second_lesson = self.create_lesson(
+            self.basic, 'second', dependent=self.first_lesson)
+        self.third_lesson = self.create_lesson(self.advanced, 'third')
+
+    def create_lesson(self, course, title, dependent=None, approval_score=10):
+        lesson = Lesson.objects.create(
+            course=course,
+            dependent=dependent,
+            title=title,
+            description=title,
+            approval_score=approval_score
+        )
+
+        for index in range(2):
+            question = Question.objects.create(
+                lesson=lesson,
+                description=f'{title} question {index}',
+                score=5,
+                question_type='MULTIPLE_CHOOSE_A_CORRECT_ONE'
+            )
+            Answer.objects.create(
+                question=question, description='right', is_correct=True)
+            Answer.objects.create(
+                question=question, description='wrong', is_correct=False)
+
+        return lesson
+
+    def answers_for(self, lesson, correct=True):
+        questions = []
+
+        for question in Question.objects.by_lesson(lesson.id):
+            answer = question.answers.get(is_correct=correct)
+            questions.append({'id': question.id, 'answers': [{'id': answer.id}]})
+
+        return questions
+
+
+    def send_test(self, lesson, correct=True):
+        url = reverse('lesson-send-test', args=[lesson.course_id, lesson.id])
+        data = {'questions': self.answers_for(lesson, correct)}
+
+        return self.client.post(url, data, format='json')
+
+    def retrieve(self, lesson):
+        url = reverse('lesson-detail', args=[lesson.course_id, lesson.id])
+
+        return self.client.get(url)
+
+
+class EnrollmentSnapshotTests(ElearningTestCase):
+    def test_snapshot_answers_checks_with_two_queries(self):
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        Lesson.objects.subscribe(self.first_lesson.id, self.student.id)
+
+        with self.assertNumQueries(2):
+            snapshot = Lesson.objects.snapshot(
+                self.second_lesson.id, self.student.id)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(Course.objects.is_subscribed(
+                self.basic.id, self.student.id, snapshot))
+            self.assertTrue(Lesson.objects.is_subscribed(
+                self.first_lesson.id, self.student.id, snapshot))
+            self.assertFalse(Lesson.objects.is_approved(
+                self.first_lesson.id, self.student.id, snapshot))
+            self.assertFalse(Lesson.objects.can_subscribe(
+                self.second_lesson.id, self.student.id, snapshot))
+            self.assertTrue(Lesson.objects.is_available_for_user(
+                self.first_lesson.id, self.student.id, snapshot))
+
+    def test_prerequisites(self):
+        self.assertFalse(Course.objects.can_subscribe(
+            self.advanced.id, self.student.id))
+        self.assertTrue(Course.objects.subscribe(
+            self.basic.id, self.student.id))
+        self.assertFalse(Course.objects.can_subscribe(
+            self.basic.id, self.student.id))
+
+        CourseEnrollment.objects.filter(
+            course=self.basic, user=self.student).update(is_approved=True)
+
+        self.assertTrue(Course.objects.is_approved(
+            self.basic.id, self.student.id))
+        self.assertTrue(Course.objects.can_subscribe(
+            self.advanced.id, self.student.id))
+        self.assertTrue(Lesson.objects.can_subscribe(
+            self.third_lesson.id, self.student.id))
+        self.assertFalse(Course.objects.can_subscribe(0, self.student.id))
+        self.assertFalse(Lesson.objects.can_subscribe(0, self.student.id))
+
+
+    def test_a_prerequisite_of_another_course_is_read_on_its_own(self):
+        cross = self.create_lesson(self.advanced, 'cross', dependent=self.first_lesson)
+
+        self.assertFalse(Lesson.objects.is_available_for_user(cross.id, self.student.id))
+        self.assertFalse(Lesson.objects.can_subscribe(cross.id, self.student.id))
+
+        LessonEnrollment.objects.create(
+            lesson=self.first_lesson, user=self.student, is_approved=True, score=10)
+
+        self.assertTrue(Lesson.objects.is_available_for_user(cross.id, self.student.id))
+        self.assertTrue(Lesson.objects.can_subscribe(cross.id, self.student.id))
+
+
+class AnswerKeyTests(ElearningTestCase):
+    def test_answer_key_is_cached_and_invalidated(self):
+        answer_key = AnswerKey.for_lesson(self.first_lesson.id)
+
+        self.assertEqual(len(answer_key.questions), 2)
+        self.assertEqual(answer_key.approval_score, 10)
+
+        # only the content version of the shared cache
+        with self.assertNumQueries(1):
+            AnswerKey.for_lesson(self.first_lesson.id)
+
+        question = Question.objects.by_lesson(self.first_lesson.id).first()
+        answer = question.answers.get(is_correct=False)
+        answer.is_correct = True
+        answer.save()
+
+        answer_key = AnswerKey.for_lesson(self.first_lesson.id)
+        self.assertIn(answer.id, answer_key.questions[question.id].answers)
+
+    def test_edits_of_another_worker_invalidate_the_key(self):
+        with worker('grader'):
+            AnswerKey.for_lesson(self.first_lesson.id)
+
+        question = Question.objects.by_lesson(self.first_lesson.id).first()
+        answer = question.answers.get(is_correct=False)
+
+        with worker('web'):
+            answer.is_correct = True
+            answer.save()
+
+        with worker('grader'):
+            answer_key = AnswerKey.for_lesson(self.first_lesson.id)
+
+        self.assertIn(answer.id, answer_key.questions[question.id].answers)
+
+    def test_review_reads_only_the_cached_key(self):
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        Lesson.objects.subscribe(self.first_lesson.id, self.student.id)
+        AnswerKey.for_lesson(self.first_lesson.id)
+
+        review = TestReview(
+            self.student.id,
+            self.first_lesson.id,
+            self.answers_for(self.first_lesson, correct=False)
+        )
+
+        # only the content version of the shared cache
+        with self.assertNumQueries(1):
+            self.assertEqual(review.evaluate(), (False, ""))
+
+    def test_review_reports_unanswered_questions(self):
+        questions = self.answers_for(self.first_lesson)
+        review = TestReview(self.student.id, self.first_lesson.id, questions[:1])
+
+        is_approved, message = review.evaluate()
+
+        self.assertFalse(is_approved)
+        self.assertIn("was not answered", str(message))
+
+
+class SendTestTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def test_passing_every_lesson_approves_the_course(self):
+        Course.objects.subscribe(self.basic.id, self.student.id)
+
+        self.assertEqual(self.retrieve(self.first_lesson).status_code, 200)
+        self.assertEqual(self.retrieve(self.second_lesson).status_code, 403)
+
+        response = self.send_test(self.first_lesson, correct=False)
+        self.assertEqual(response.data, {"message": "Failed test"})
+
+        response = self.send_test(self.first_lesson)
+        self.assertEqual(response.data, {"message": "success"})
+        self.assertEqual(self.send_test(self.first_lesson).status_code, 403)
+
+        self.assertEqual(self.retrieve(self.second_lesson).status_code, 200)
+        self.assertFalse(Course.objects.is_approved(
+            self.basic.id, self.student.id))
+
+        self.send_test(self.second_lesson)
+
+        enrollment = LessonEnrollment.objects.get(
+            lesson=self.second_lesson, user=self.student)
+        self.assertEqual(enrollment.score, 10)
+        self.assertTrue(enrollment.is_approved)
+        self.assertTrue(Course.objects.is_approved(
+            self.basic.id, self.student.id))
+        self.assertEqual(UserAnswer.objects.filter(user=self.student).count(), 4)
+
+    def test_review_queries_do_not_grow_with_questions(self):
+        lesson = self.create_lesson(self.basic, 'large')
+        Course.objects.subscribe(self.basic.id, self.student.id)
+
+        for index in range(2, 40):
+            question = Question.objects.create(
+                lesson=lesson, description=f'q{index}', score=1)
+            Answer.objects.create(question=question, description='a', is_correct=True)
+            Answer.objects.create(question=question, description='b', is_correct=False)
+
+        LessonEnrollment.objects.create(lesson=lesson, user=self.student)
+        AnswerKey.for_lesson(lesson.id)
+
+        review = TestReview(self.student.id, lesson.id, self.answers_for(lesson))
+
+        # content version, savepoint, enrollment update, approved lesson
+        # counter, answers insert, three lesson progress statements, course
+        # approval update and savepoint release
+        with self.assertNumQueries(10):
+            self.assertEqual(review.evaluate(), (True, ""))
+
+
+class GradingQueueTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        self.retrieve(self.first_lesson)
+
+    def send_test_async(self, lesson, correct=True):
+        url = reverse('lesson-send-test', args=[lesson.course_id, lesson.id])
+        data = {'questions': self.answers_for(lesson, correct)}
+
+        return self.client.post(f'{url}?mode=async', data, format='json')
+
+    def test_attempts_are_graded_in_the_background(self):
+        failed = self.send_test_async(self.first_lesson, correct=False)
+        passed = self.send_test_async(self.first_lesson)
+
+        self.assertEqual(passed.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(passed['Location'], passed.data['url'])
+        self.assertEqual(passed.data['status'], 'PENDING')
+        self.assertFalse(Lesson.objects.is_approved(self.first_lesson.id, self.student.id))
+
+        # both attempts of the student are claimed, they are graded in order
+        self.assertEqual(GradingWorker(batch_size=10).run_once(), 2)
+        self.assertEqual(GradingWorker().run_once(), 0)
+
+        response = self.client.get(failed.data['url'])
+        self.assertEqual(response.data['status'], 'DONE')
+        self.assertFalse(response.data['is_approved'])
+
+        response = self.client.get(passed.data['url'], {'wait': 1})
+        self.assertEqual(response.data['status'], 'DONE')
+        self.assertTrue(response.data['is_approved'])
+        self.assertEqual(response.data['score'], 10)
+        self.assertTrue(Lesson.objects.is_approved(self.first_lesson.id, self.student.id))
+        self.assertEqual(self.send_test_async(self.first_lesson).status_code, 403)
+
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.get(passed.data['url']).status_code, 403)
+
+    def test_the_dashboard_shows_the_grades_of_another_process(self):
+        def first_lesson():
+            courses = self.client.get(reverse('progress-list')).json()['courses']
+            lesson = courses[0]['lessons'][0]
+
+            return lesson['is_approved'], lesson['score']
+
+        with worker('web'):
+            self.send_test_async(self.first_lesson)
+            self.assertEqual(first_lesson(), (False, 0))
+
+        with worker('grader'):
+            self.assertEqual(GradingWorker().run_once(), 1)
+
+        with worker('web'):
+            self.assertEqual(first_lesson(), (True, 10))
+
+    def test_workers_never_claim_the_same_attempt(self):
+        for _ in range(3):
+            self.send_test_async(self.first_lesson)
+
+        first = TestAttempt.objects.claim('first', 2)
+        second = TestAttempt.objects.claim('second', 2)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({attempt.id for attempt in first} & {attempt.id for attempt in second})
+        self.assertEqual(TestAttempt.objects.claim('third', 2), [])
+
+
+class BatchGradingTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+        self.url = reverse(
+            'lesson-grade', args=[self.basic.id, self.first_lesson.id])
+
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        Lesson.objects.subscribe(self.first_lesson.id, self.student.id)
+
+    def test_grades_and_persists_a_json_batch(self):
+        other = User.objects.create_user('other')
+        submissions = [
+            {'user': self.student.id, 'questions': self.answers_for(self.first_lesson)},
+            {'user': other.id, 'questions': self.answers_for(self.first_lesson)},
+            {'user': self.teacher.id, 'questions': self.answers_for(self.first_lesson)[:1]},
+            {'questions': []},
+        ]
+
+        response = self.client.post(self.url, submissions, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['approved'], 1)
+
+        student, other_result, teacher, invalid = response.data['results']
+        self.assertEqual((student['score'], student['is_approved']), (10, True))
+        self.assertEqual(other_result['message'], "the test is not available to the user")
+        self.assertIn("was not answered", teacher['message'])
+        self.assertIn("invalid submission", invalid['message'])
+
+        self.assertTrue(Lesson.objects.is_approved(self.first_lesson.id, self.student.id))
+        self.assertEqual(UserAnswer.objects.filter(user=self.student).count(), 2)
+
+    def test_out_of_range_answer_ids_only_reject_their_submission(self):
+        other = User.objects.create_user('other')
+        Lesson.objects.subscribe(self.first_lesson.id, other.id)
+
+        questions = self.answers_for(self.first_lesson)
+        negative = [dict(questions[0], answers=[{'id': -1}])] + questions[1:]
+        too_large = [dict(questions[0], answers=[{'id': 2 ** 32}])] + questions[1:]
+
+        response = self.client.post(self.url, [
+            {'user': self.student.id, 'questions': questions},
+            {'user': other.id, 'questions': negative},
+            {'user': self.teacher.id, 'questions': too_large},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+
+        student, other_result, teacher = response.data['results']
+        self.assertTrue(student['is_approved'])
+        self.assertIn("invalid submission: answer id -1", other_result['message'])
+        self.assertIn("invalid submission: answer id 4294967296", teacher['message'])
+
+    def test_grades_a_ndjson_stream(self):
+        lines = [
+            json.dumps({'user': self.student.id,
+                        'questions': self.answers_for(self.first_lesson, correct=False)}),
+            '{not json',
+        ]
+
+        response = self.client.post(
+            self.url, '\n'.join(lines), content_type='application/x-ndjson')
+
+        failed, invalid = response.data['results']
+        self.assertEqual((failed['score'], failed['is_approved']), (0, False))
+        self.assertIn("line 2", invalid['message'])
+
+    def test_matches_the_single_submission_review(self):
+        base = self.answers_for(self.first_lesson)
+        question = Question.objects.create(
+            lesson=self.first_lesson,
+            description='choose all',
+            score=3,
+            question_type='CHOOSE_ALL_THE_RIGHT'
+        )
+        answers = [
+            Answer.objects.create(question=question, description=str(index),
+                                  is_correct=index < 2)
+            for index in range(3)
+        ]
+        answer_key = AnswerKey.for_lesson(self.first_lesson.id)
+        choices = [answers[:1], answers[:2], answers, answers[1:2] + answers[:1]]
+
+        submissions = [
+            {'user': user_id, 'questions': base + [{
+                'id': question.id,
+                'answers': [{'id': answer.id} for answer in chosen],
+            }]}
+            for user_id, chosen in enumerate(choices, start=1)
+        ]
+
+        results = BatchTestReview(self.first_lesson.id, submissions).grade()
+
+        for submission, result in zip(submissions, results):
+            user_answers = {
+                item['id']: frozenset(answer['id'] for answer in item['answers'])
+                for item in submission['questions']
+            }
+            self.assertEqual(result['score'], answer_key.score(user_answers))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is sqlite syntax")
+class IndexUsageTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        Lesson.objects.subscribe(self.first_lesson.id, self.student.id)
+
+    def assertSearches(self, queryset, table, columns, covering_index=None):
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+
+        index = f'COVERING INDEX {covering_index} ' if covering_index else 'INDEX '
+        self.assertTrue(any(
+            detail.startswith(f'SEARCH {table} USING') and index in detail
+            and detail.endswith(f'({columns})')
+            for detail in plan
+        ), plan)
+
+    def test_enrollment_lookups_use_the_composite_indexes(self):
+        student_id = self.student.id
+
+        # is_approved of the manager and the availability of get_test
+        self.assertSearches(
+            LessonEnrollment.objects.filter(
+                lesson_id=self.first_lesson.id, user_id=student_id, is_approved=False),
+            'elearning_lessonenrollment', 'user_id=? AND lesson_id=?')
+        # the lesson enrollments of the enrollment snapshot
+        self.assertSearches(
+            LessonEnrollment.objects.by_course(self.basic.id).by_user(student_id),
+            'elearning_lessonenrollment', 'user_id=?')
+        self.assertSearches(
+            CourseEnrollment.objects.filter(
+                course_id=self.basic.id, user_id__in=[student_id], is_approved=False),
+            'elearning_courseenrollment', 'user_id=? AND course_id=?')
+        # the lessons list of the students joins through the course enrollment
+        self.assertSearches(
+            Lesson.objects.filter(
+                course_id=self.basic.id, course__enrollments__user_id=student_id),
+            'elearning_courseenrollment', 'user_id=? AND course_id=?')
+
+    def test_approved_users_and_correct_answers_are_read_from_covering_indexes(self):
+        self.assertSearches(
+            CourseEnrollment.objects.filter(
+                course_id=self.basic.id, is_approved=True).values_list('user_id'),
+            'elearning_courseenrollment', 'course_id=?', covering_index='course_enrollment_approved')
+        self.assertSearches(
+            LessonEnrollment.objects.filter(
+                lesson_id=self.first_lesson.id, is_approved=True).values_list('user_id'),
+            'elearning_lessonenrollment', 'lesson_id=?', covering_index='lesson_enrollment_approved')
+        self.assertSearches(
+            Answer.objects.filter(
+                question__lesson_id=self.first_lesson.id, is_correct=True).values_list('id'),
+            'elearning_answer', 'question_id=?', covering_index='answer_question_correct')
+
+    def test_enrollments_are_unique(self):
+        course = Course.objects.create(name='open')
+        snapshot = Course.objects.snapshot(course.id, self.student.id)
+        CourseEnrollment.objects.create(course=course, user=self.student)
+
+        # a stale snapshot, as a concurrent request would see it
+        self.assertTrue(Course.objects.subscribe(course.id, self.student.id, snapshot))
+        self.assertEqual(CourseEnrollment.objects.filter(user=self.student).count(), 2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LessonEnrollment.objects.create(lesson=self.first_lesson, user=self.student)
+
+
+class ProgressTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def catalog(self):
+        response = self.client.get(reverse('course-list'))
+
+        return {
+            course['id']: (
+                course['is_subscribed'],
+                course['is_approved'],
+                course['dependent_is_approved'],
+            )
+            for course in response.data['results']
+        }
+
+    def test_catalog_reads_the_maintained_progress(self):
+        self.assertEqual(self.catalog()[self.basic.id], (False, False, False))
+
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+        self.assertEqual(self.catalog()[self.basic.id], (True, False, False))
+
+        for lesson in (self.first_lesson, self.second_lesson):
+            self.retrieve(lesson)
+            self.send_test(lesson)
+
+        catalog = self.catalog()
+        self.assertEqual(catalog[self.basic.id], (True, True, False))
+        self.assertEqual(catalog[self.advanced.id], (False, False, True))
+
+        out = StringIO()
+        call_command('rebuild_progress', verify=True, stdout=out)
+        self.assertIn("match", out.getvalue())
+
+    def test_rebuild_fixes_drift(self):
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        CourseProgress.objects.all().delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_progress', verify=True, stdout=StringIO())
+
+        call_command('rebuild_progress', stdout=StringIO())
+        call_command('rebuild_progress', verify=True, stdout=StringIO())
+        self.assertEqual(self.catalog()[self.basic.id], (True, False, False))
+
+
+class CounterTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def counters(self, course):
+        course.refresh_from_db()
+        enrollment = CourseEnrollment.objects.filter(
+            course=course, user=self.student).first()
+
+        return course.lesson_count, enrollment and enrollment.approved_lesson_count
+
+    def test_counters_follow_lessons_and_approvals(self):
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+        self.assertEqual(self.counters(self.basic), (2, 0))
+
+        self.retrieve(self.first_lesson)
+        self.send_test(self.first_lesson)
+        self.assertEqual(self.counters(self.basic), (2, 1))
+
+        # an extra lesson keeps the course from being approved
+        extra = self.create_lesson(self.basic, 'extra', dependent=self.second_lesson)
+        self.retrieve(self.second_lesson)
+        self.send_test(self.second_lesson)
+        self.assertEqual(self.counters(self.basic), (3, 2))
+        self.assertFalse(Course.objects.is_approved(self.basic.id, self.student.id))
+
+        self.retrieve(extra)
+        self.send_test(extra)
+        self.assertTrue(Course.objects.is_approved(self.basic.id, self.student.id))
+
+        CourseEnrollment.objects.create(course=self.advanced, user=self.student)
+        extra.course = self.advanced
+        extra.save()
+        self.assertEqual(self.counters(self.basic), (2, 2))
+        self.assertEqual(self.counters(self.advanced), (2, 1))
+
+        extra.delete()
+        self.assertEqual(self.counters(self.advanced), (1, 0))
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn("match", out.getvalue())
+
+    def test_removing_the_last_pending_lesson_approves_the_course(self):
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+        self.retrieve(self.first_lesson)
+        self.send_test(self.first_lesson)
+        self.assertFalse(Course.objects.is_approved(self.basic.id, self.student.id))
+
+        self.second_lesson.delete()
+
+        self.assertEqual(self.counters(self.basic), (1, 1))
+        self.assertTrue(Course.objects.is_approved(self.basic.id, self.student.id))
+        self.assertTrue(CourseProgress.objects.get(
+            course=self.advanced, user=self.student).dependent_is_approved)
+
+    def test_removing_every_lesson_does_not_approve_the_course(self):
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+
+        self.second_lesson.delete()
+        self.first_lesson.delete()
+
+        self.assertEqual(self.counters(self.basic), (0, 0))
+        self.assertFalse(Course.objects.is_approved(self.basic.id, self.student.id))
+        self.assertFalse(CourseEnrollment.objects.approve_completed(
+            self.basic.id, [self.student.id]))
+        self.assertFalse(CourseProgress.objects.filter(
+            course=self.advanced, user=self.student, dependent_is_approved=True
+        ).exists())
+
+    def test_reconcile_fixes_drift(self):
+        CourseEnrollment.objects.create(course=self.basic, user=self.student)
+        Course.objects.filter(pk=self.basic.id).update(lesson_count=7)
+        CourseEnrollment.objects.update(approved_lesson_count=3)
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_counters', stdout=StringIO())
+
+        call_command('reconcile_counters', fix=True, stdout=StringIO())
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(self.basic), (2, 0))
+
+
+class ProgressDashboardTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def progress(self, **headers):
+        return self.client.get(reverse('progress-list'), **headers)
+
+    def test_dashboard_lists_enrolled_courses_with_their_lessons(self):
+        self.assertEqual(self.progress().json(), {'courses': []})
+
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+        self.retrieve(self.first_lesson)
+        self.send_test(self.first_lesson)
+
+        courses = self.progress().json()['courses']
+        self.assertEqual([course['id'] for course in courses], [self.basic.id])
+
+        course = courses[0]
+        self.assertEqual(
+            (course['status'], course['lesson_count'], course['approved_lesson_count']),
+            ('subscribed', 2, 1))
+        self.assertEqual(
+            [(lesson['id'], lesson['status'], lesson['is_approved'], lesson['score'])
+             for lesson in course['lessons']],
+            [(self.first_lesson.id, 'approved', True, 10),
+             (self.second_lesson.id, 'available', False, None)])
+
+    def test_dashboard_queries_do_not_grow_with_courses(self):
+        for index in range(5):
+            course = Course.objects.create(name=f'open {index}')
+            self.create_lesson(course, f'open {index}')
+            Course.objects.subscribe(course.id, self.student.id)
+            self.retrieve(Lesson.objects.get(course=course))
+
+        # warm the catalog graph
+        self.progress()
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        get_user_progress_version(self.student.id)
+
+        # the two versions and the union of the enrollments of the student
+        with self.assertNumQueries(3):
+            response = self.progress()
+
+        self.assertEqual(len(response.json()['courses']), 6)
+
+        with self.assertNumQueries(2):
+            self.progress()
+
+    def test_enrollment_changes_invalidate_the_cached_dashboard(self):
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        etag = self.progress()['ETag']
+
+        response = self.progress(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.retrieve(self.first_lesson)
+        response = self.progress(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['courses'][0]['lessons'][0]['is_subscribed'])
+
+
+class PaginationTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+
+        for index in range(23):
+            Course.objects.create(name=f'course {index}')
+
+        self.expected = list(
+            Course.objects.order_by('created_at', 'id').values_list('id', flat=True))
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        url = '/api/elearning/admin/courses/?limit=10&count=true'
+        pages = []
+
+        while url:
+            response = self.client.get(url)
+            pages.append(response.data)
+            url = response.data['next']
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0]['count'], 25)
+        self.assertEqual(
+            [course['id'] for page in pages for course in page['results']],
+            self.expected
+        )
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+
+    def test_offset_mode_is_kept(self):
+        response = self.client.get('/api/elearning/admin/courses/?limit=10&offset=20')
+
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/elearning/admin/courses/?cursor=nope')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class PrerequisiteGraphTests(ElearningTestCase):
+    def test_cycles_are_rejected(self):
+        self.client.force_authenticate(self.teacher)
+
+        url = f'/api/elearning/admin/courses/{self.basic.id}/'
+        response = self.client.patch(url, {'dependent': self.advanced.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(url, {'dependent': self.basic.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        url = f'/api/elearning/admin/courses/{self.basic.id}/lessons/{self.first_lesson.id}/'
+        response = self.client.patch(url, {'dependent': self.second_lesson.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        other = Course.objects.create(name='other')
+        url = f'/api/elearning/admin/courses/{self.advanced.id}/'
+        response = self.client.patch(url, {'dependent': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unlock_tree_in_one_query(self):
+        self.client.force_authenticate(self.student)
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        PrerequisiteGraph.for_catalog()
+        get_user_roles(self.student)
+
+        # the catalog version and the enrollments
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('course-unlock-tree'))
+
+        self.assertEqual(response.data['next'], {
+            'courses': [],
+            'lessons': [self.first_lesson.id],
+        })
+
+        basic, = response.data['courses']
+        advanced, = basic['unlocks']
+        self.assertEqual(basic['status'], 'subscribed')
+        self.assertEqual(advanced['status'], 'locked')
+        self.assertEqual(
+            [lesson['status'] for lesson in basic['lessons']], ['available', 'locked'])
+
+        response = self.client.get(reverse('course-path', args=[self.advanced.id]))
+        self.assertEqual(
+            [course['id'] for course in response.data], [self.basic.id, self.advanced.id])
+
+
+class LessonRetrieveTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        get_user_roles(self.student)
+
+    def test_retrieve_query_counts(self):
+        # lesson select, savepoint, insert ... select, two progress
+        # statements and release
+        with self.assertNumQueries(6):
+            self.assertEqual(self.retrieve(self.first_lesson).status_code, 200)
+
+        # lesson select with the enrollment annotation
+        with self.assertNumQueries(1):
+            self.assertEqual(self.retrieve(self.first_lesson).status_code, 200)
+
+        # lesson select, savepoint, insert ... select, release, enrollment check
+        with self.assertNumQueries(5):
+            self.assertEqual(self.retrieve(self.second_lesson).status_code, 403)
+
+    def test_ensure_enrollment_is_idempotent(self):
+        self.assertTrue(Lesson.objects.ensure_enrollment(
+            self.first_lesson.id, self.student.id))
+        self.assertFalse(Lesson.objects.ensure_enrollment(
+            self.first_lesson.id, self.student.id))
+        self.assertFalse(Lesson.objects.ensure_enrollment(
+            self.second_lesson.id, self.student.id))
+
+        self.assertEqual(LessonEnrollment.objects.filter(user=self.student).count(), 1)
+
+    def test_ensure_enrollment_writes_to_the_primary(self):
+        # an alias without a connection, a write routed to it would fail
+        with patch.object(ReplicaRouter, 'db_for_read', return_value='replica'):
+            self.assertTrue(Lesson.objects.ensure_enrollment(
+                self.first_lesson.id, self.student.id))
+
+    def test_concurrent_subscription_is_not_an_error(self):
+        def concurrent_enrollment(lesson_id, user_id):
+            LessonEnrollment.objects.create(lesson_id=lesson_id, user_id=user_id)
+            raise IntegrityError('UNIQUE constraint failed')
+
+        with patch.object(Lesson.objects, 'ensure_enrollment', concurrent_enrollment):
+            self.assertEqual(self.retrieve(self.first_lesson).status_code, 200)
+
+
+class TestPayloadTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+        self.url = reverse(
+            'lesson-get-test', args=[self.basic.id, self.first_lesson.id])
+
+        Course.objects.subscribe(self.basic.id, self.student.id)
+        Lesson.objects.subscribe(self.first_lesson.id, self.student.id)
+        get_user_roles(self.student)
+
+    def test_payload_is_cached_and_revalidated(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        questions = json.loads(response.content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(questions), 2)
+        self.assertNotIn('is_correct', questions[0]['answers'][0])
+
+        # the enrollment check and the content version
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+        Answer.objects.create(
+            question_id=questions[0]['id'], description='new', is_correct=False)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_available(self):
+        url = reverse('lesson-get-test', args=[self.basic.id, self.second_lesson.id])
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+        url = reverse('lesson-get-test', args=[self.basic.id, 0])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ConditionalGetTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        get_user_roles(self.teacher)
+        get_user_roles(self.student)
+
+    def test_admin_list_is_revalidated(self):
+        self.client.force_authenticate(self.teacher)
+        url = '/api/elearning/admin/courses/'
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+        # only the validators query
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(f'{url}{self.basic.id}/')
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(
+            f'{url}{self.basic.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.basic.name = 'renamed'
+        self.basic.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deletions_are_not_hidden_by_if_modified_since(self):
+        self.client.force_authenticate(self.teacher)
+        url = '/api/elearning/admin/courses/{}/lessons/{}/questions/'.format(
+            self.basic.id, self.first_lesson.id)
+        since = http_date(time.time() + 60)
+
+        Question.objects.by_lesson(self.first_lesson.id).first().delete()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_catalog_changes_with_the_user_progress(self):
+        self.client.force_authenticate(self.student)
+        url = reverse('course-list')
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('course-subscribe', args=[self.basic.id]))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_subscribed'])
+
+    def test_lesson_retrieve_is_not_conditional(self):
+        self.client.force_authenticate(self.student)
+        Course.objects.subscribe(self.basic.id, self.student.id)
+
+        response = self.retrieve(self.first_lesson)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class QuestionWriteTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+        get_user_roles(self.teacher)
+
+        self.url = '/api/elearning/admin/courses/{}/lessons/{}/questions/'.format(
+            self.basic.id, self.first_lesson.id)
+        self.question = Question.objects.by_lesson(self.first_lesson.id).first()
+
+    def question_data(self, answers):
+        return {
+            'description': 'edited',
+            'score': 5,
+            'question_type': 'CHOOSE_ALL_THE_RIGHT',
+            'lesson': self.first_lesson.id,
+            'answers': answers,
+        }
+
+    def update_queries(self, total_answers):
+        kept = list(self.question.answers.order_by('id'))
+        answers = [
+            {'id': kept[0].id, 'description': 'kept', 'is_correct': True},
+        ] + [
+            {'description': f'new {index}', 'is_correct': index % 2 == 0}
+            for index in range(total_answers - 1)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                f'{self.url}{self.question.id}/',
+                self.question_data(answers),
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(answer['description'] for answer in response.data['answers']),
+            sorted(answer['description'] for answer in answers)
+        )
+
+        return len(queries)
+
+    def test_update_queries_do_not_grow_with_answers(self):
+        few = self.update_queries(3)
+        many = self.update_queries(40)
+
+        self.assertEqual(few, many)
+        self.assertEqual(self.question.answers.count(), 40)
+
+    def test_answers_of_another_question_are_rejected(self):
+        other = Question.objects.by_lesson(self.second_lesson.id).first()
+        foreign = other.answers.first()
+        own = self.question.answers.first()
+
+        response = self.client.put(
+            f'{self.url}{self.question.id}/',
+            self.question_data([
+                {'id': own.id, 'description': 'a', 'is_correct': True},
+                {'id': foreign.id, 'description': 'b', 'is_correct': False},
+            ]),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Answer.objects.get(pk=foreign.id).question_id, other.id)
+
+        response = self.client.post(
+            self.url,
+            self.question_data([
+                {'id': own.id, 'description': 'a', 'is_correct': True},
+                {'description': 'b', 'is_correct': False},
+            ]),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_with_bulk_answers(self):
+        response = self.client.post(
+            self.url,
+            self.question_data([
+                {'description': f'answer {index}', 'is_correct': index == 0}
+                for index in range(5)
+            ]),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['answers']), 5)
+
+
+class QuestionImportTests(ElearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+
+    def question_line(self, index, **kwargs):
+        question = {
+            'description': f'imported {index}',
+            'score': 1,
+            'question_type': 'BOOLEAN',
+            'answers': [
+                {'description': 'yes', 'is_correct': True},
+                {'description': 'no', 'is_correct': False},
+            ],
+        }
+        question.update(kwargs)
+
+        return json.dumps(question)
+
+    def test_import_stream_reports_invalid_lines(self):
+        lines = [self.question_line(index) for index in range(5)]
+        lines.insert(2, '{broken')
+        lines.insert(4, self.question_line(99, answers=[]))
+        lines.append(self.question_line(100, question_type='OPEN'))
+
+        url = '/api/elearning/admin/courses/{}/lessons/{}/import-questions/'.format(
+            self.advanced.id, self.third_lesson.id)
+        response = self.client.post(
+            url, '\n'.join(lines), content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 5)
+        self.assertEqual(response.data['rejected'], 3)
+        self.assertEqual(
+            [error['line'] for error in response.data['errors']], [3, 5, 8])
+
+        imported = Question.objects.by_lesson(self.third_lesson.id).filter(
+            description__startswith='imported').order_by('id')
+        self.assertEqual(imported.count(), 5)
+        self.assertEqual(
+            list(imported.last().answers.order_by('id').values_list('description', 'is_correct')),
+            [('yes', True), ('no', False)]
+        )
+
+        answer_key = AnswerKey.for_lesson(self.third_lesson.id)
+        self.assertEqual(len(answer_key.questions), 7)
+
+        # the blank lines are skipped but still counted
+        response = self.client.post(
+            url, '\n\n'.join([self.question_line(0), '', '{broken']),
+            content_type='application/x-ndjson')
+        self.assertEqual([error['line'] for error in response.data['errors']], [5])
+
+    def test_command_imports_in_chunks(self):
+        path = os.path.join(self.tmp_dir(), 'bank.jsonl')
+
+        with open(path, 'w') as bank:
+            for index in range(25):
+                bank.write(self.question_line(index) + '\n')
+
+        out = StringIO()
+        call_command(
+            'import_questions', self.third_lesson.id, path,
+            chunk_size=10, stdout=out, stderr=StringIO()
+        )
+
+        self.assertIn("imported 25 questions", out.getvalue())
+        self.assertEqual(
+            Answer.objects.by_lesson(self.third_lesson.id).count(), 2 * 2 + 25 * 2)
+
+    def tmp_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        return directory
+
+
+class QueryBudgetTests(APITestCase):
+    def run_benchmark(self, seed, **sizes):
+        benchmark = Benchmark(BenchmarkDataset(seed=seed, **sizes), iterations=2)
+        self.addCleanup(benchmark.cleanup)
+
+        return {result['name']: result for result in benchmark.run()}
+
+    def test_endpoints_stay_within_their_query_budget(self):
+        small = self.run_benchmark(0, courses=2, lessons=3, questions=2, students=2)
+        large = self.run_benchmark(1, courses=3, lessons=4, questions=8, students=12)
+
+        self.assertEqual(set(small), set(QUERY_BUDGETS))
+
+        for name, result in large.items():
+            self.assertLess(result.get('status', 200), 300, name)
+            self.assertLessEqual(result['queries'], result['budget'], name)
+            self.assertEqual(result['queries'], small[name]['queries'], name)
+
+        self.assertEqual(over_budget(list(small.values())), [])
+
+    def test_command_writes_the_results(self):
+        path = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        call_command(
+            'benchmark_endpoints', courses=2, lessons=2, questions=2, students=2,
+            iterations=2, case=['students.course.list'], output=path,
+            check_budgets=True, stdout=StringIO()
+        )
+
+        with open(path) as output:
+            report = json.load(output)
+
+        self.assertEqual(report['results'][0]['name'], 'students.course.list')
+        self.assertIn('p99', report['results'][0]['wall_ms'])
+        self.assertEqual(Course.objects.count(), 0)
+
+
+class GenerateDatasetTests(APITestCase):
+    def generate(self, prefix):
+        call_command(
+            'generate_dataset', courses=3, chain_length=2, lessons=3, questions=4,
+            teachers=1, students=6, prefix=prefix, batch_size=7, stdout=StringIO()
+        )
+
+        return list(Question.objects.filter(
+            description__contains='question').order_by('id').values_list(
+                'question_type', 'score'))
+
+    def test_generates_a_consistent_dataset(self):
+        questions = self.generate('first')
+
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Course.objects.filter(dependent__isnull=False).count(), 1)
+        self.assertEqual(Lesson.objects.filter(dependent__isnull=True).count(), 3)
+        self.assertEqual(len(questions), 36)
+        self.assertEqual(User.objects.filter(groups__name='STUDENT').count(), 6)
+
+        for enrollment in LessonEnrollment.objects.filter(is_approved=True):
+            answer_key = AnswerKey.for_lesson(enrollment.lesson_id)
+            answered = set(UserAnswer.objects.filter(
+                user_id=enrollment.user_id,
+                answer__question__lesson_id=enrollment.lesson_id
+            ).values_list('answer_id', flat=True))
+
+            self.assertEqual(
+                answered,
+                {answer for question in answer_key.questions.values() for answer in question.answers}
+            )
+
+        call_command('rebuild_progress', verify=True, stdout=StringIO())
+
+        # the same seed generates the same content
+        self.assertEqual(self.generate('second')[36:], questions)
+
+        with self.assertRaises(CommandError):
+            self.generate('second')
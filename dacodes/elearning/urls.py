@@ -17,6 +17,8 @@ question_router.register(r'questions', views.QuestionViewSet)
 
 available_courses_router = DefaultRouter()
 available_courses_router.register(r'courses', views.CoursesAvailableViewSet, basename="course")
+available_courses_router.register(r'attempts', views.TestAttemptViewSet, basename="attempt")
+available_courses_router.register(r'progress', views.StudentProgressViewSet, basename="progress")
 
 available_lessons_router = routers.NestedSimpleRouter(available_courses_router, r'courses', lookup='course')
 available_lessons_router.register(r'lessons', views.LessonsAvailableViewSet)
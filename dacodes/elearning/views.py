@@ -1,5 +1,10 @@
+import json
+
+from django.db import IntegrityError
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
-from django.db.models import Exists, OuterRef
+from django.db.models import Exists, FilteredRelation, OuterRef, Prefetch, Q
+from django.db.models.functions import Coalesce
 
 from rest_framework import (
     mixins,
@@ -8,18 +13,23 @@ from rest_framework import (
     viewsets,
 )
 from rest_framework.views import APIView
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 
+from core.parsers import CSVParser, CSVTable, NDJSONParser
 from core.permissions import HasValidTeacherRole, HasValidStudentRole
-from core.views import MultiSerializerViewSet
+from core.views import (
+    ConditionalGetViewSet,
+    MultiSerializerViewSet,
+    ReplicaReadViewSet,
+)
 
 from .serializer import (
     CourseAvailableSerializer,
     CourseEnrollmentSerializer,
     CourseSerializer,
     EmptySerializer,
-    GetLessonQuestionSerializer,
     LessonsAvailableSerializer,
     LessonEnrollmentSerializer,
     LessonPreviewSerializer,
@@ -27,23 +37,39 @@ from .serializer import (
     LogicSerializer,
     QuestionSerializer,
     SendTestSerializer,
+    TestAttemptSerializer,
 )
 
 from .models import (
     Answer,
     Course,
     CourseEnrollment,
+    CourseProgress,
     Lesson,
     LessonEnrollment,
+    LessonProgress,
     Question,
+    TestAttempt,
     UserAnswer
 )
 
+from .services.batch_review import BatchTestReview
+from .services.dashboard import ProgressDashboard
+from .services.grading_queue import enqueue_attempt, wait_for_attempt
+from .services.prerequisites import PrerequisiteGraph
+from .services.question_import import QuestionImport
 from .services.review import TestReview
-from .services.logic import LogicTest
+from .services.test_payload import TestPayload
+from .services.logic import (
+    InvalidScenarios,
+    LogicTest,
+    VectorLogicTest,
+    stream_results,
+)
+from .settings import ATTEMPT_MAX_WAIT, ATTEMPT_WAIT_INTERVAL
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetViewSet, viewsets.ModelViewSet):
     """
     Course administration
     """
@@ -52,7 +78,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     permission_classes = (HasValidTeacherRole, )
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(ConditionalGetViewSet, viewsets.ModelViewSet):
     """
     Lesson administration
     """
@@ -63,20 +89,67 @@ class LessonViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(course_id=self.kwargs.get('course_pk'))
 
+    @action(detail=True, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def grade(self, request, *args, **kwargs):
+        """
+        grade a batch of offline submissions of the lesson test, the body is a JSON
+        array or a NDJSON stream of {"user": id, "questions": [{"id", "answers": [{"id"}]}]}
+        """
+        lesson = self.get_object()
+
+        test_review = BatchTestReview(lesson.id, request.data)
+        results = test_review.evaluate()
+
+        response = {
+            "graded": len(results),
+            "approved": sum(1 for result in results if result['is_approved']),
+            "results": results,
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path='import-questions',
+            parser_classes=[NDJSONParser, JSONParser])
+    def import_questions(self, request, *args, **kwargs):
+        """
+        import a bank of questions into the lesson, the body is a NDJSON stream
+        (or a JSON array) of {"description", "score", "question_type", "answers":
+        [{"description", "is_correct"}]}, the invalid lines are reported
+        """
+        lesson = self.get_object()
+
+        report = QuestionImport(lesson.id, request.data).run()
+
+        return Response(report, status=status.HTTP_200_OK)
 
-class QuestionViewSet(viewsets.ModelViewSet):
+
+class QuestionViewSet(ConditionalGetViewSet, viewsets.ModelViewSet):
     """
     Questions and answers administration
     """
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
     permission_classes = (HasValidTeacherRole, )
+    # the answers of a question can be deleted
+    last_modified_actions = ()
 
     def get_queryset(self):
-        return self.queryset.filter(lesson_id=self.kwargs.get('lesson_pk'))
+        return self.queryset.filter(
+            lesson_id=self.kwargs.get('lesson_pk')
+        ).prefetch_related(
+            Prefetch('answers', queryset=Answer.objects.order_by('id'))
+        )
+
+    def get_validator_querysets(self):
+        answers = Answer.objects.by_lesson(self.kwargs.get('lesson_pk'))
 
+        if self.action == 'retrieve':
+            answers = answers.filter(question_id=self.kwargs['pk'])
 
-class CoursesAvailableViewSet(viewsets.ReadOnlyModelViewSet):
+        return super().get_validator_querysets() + [answers]
+
+
+class CoursesAvailableViewSet(ReplicaReadViewSet, ConditionalGetViewSet, viewsets.ReadOnlyModelViewSet):
     """
     courses that students have access to, courses have dependent courses, 
     it is necessary to pass the dependent course in order to subscribe
@@ -84,39 +157,33 @@ class CoursesAvailableViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseAvailableSerializer
     permission_classes = (HasValidStudentRole, )
+    replica_actions = ('list', 'retrieve', 'unlock_tree', 'path')
 
     def get_queryset(self):
-        queryset = Course.objects.all().annotate(
-            is_subscribed=Exists(
-                CourseEnrollment
-                .objects
-                .filter(
-                    course_id=OuterRef('id'),
-                    user_id=self.request.user.id
-                )
-            ),
-            is_approved=Exists(
-                CourseEnrollment
-                .objects
-                .filter(
-                    course_id=OuterRef('id'),
-                    user_id=self.request.user.id,
-                    is_approved=True
-                )
-            ),
-            dependent_is_approved=Exists(
-                CourseEnrollment
-                .objects
-                .filter(
-                    course_id=OuterRef('dependent_id'),
-                    user_id=self.request.user.id,
-                    is_approved=True
-                )
+        queryset = Course.objects.annotate(
+            user_progress=FilteredRelation(
+                'progress',
+                condition=Q(progress__user_id=self.request.user.id)
             )
+        ).annotate(
+            is_subscribed=Coalesce('user_progress__is_subscribed', False),
+            is_approved=Coalesce('user_progress__is_approved', False),
+            dependent_is_approved=Coalesce(
+                'user_progress__dependent_is_approved', False),
         )
 
         return queryset
 
+    def get_validator_querysets(self):
+        courses = Course.objects.all()
+        progress = CourseProgress.objects.filter(user_id=self.request.user.id)
+
+        if self.action == 'retrieve':
+            courses = courses.filter(pk=self.kwargs['pk'])
+            progress = progress.filter(course_id=self.kwargs['pk'])
+
+        return [courses, progress]
+
     @action(detail=True, methods=['post'], serializer_class=EmptySerializer)
     def subscribe(self, request, pk):
         """
@@ -124,20 +191,52 @@ class CoursesAvailableViewSet(viewsets.ReadOnlyModelViewSet):
         """
         course_id = pk
         user_id = request.user.id
+        snapshot = Course.objects.snapshot(course_id, user_id)
 
-        if Course.objects.is_subscribed(course_id, user_id):
+        if Course.objects.is_subscribed(course_id, user_id, snapshot):
             message = {
                 "message": "The user is already subscribed to this course"}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
-        if Course.objects.subscribe(course_id, user_id):
+        if Course.objects.subscribe(course_id, user_id, snapshot):
             return Response({"message": "success"}, status=status.HTTP_201_CREATED)
 
         message = {"message": "User cannot register for this course"}
         return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def unlock_tree(self, request):
+        """
+        every course nested under the course it depends on, with the status of the
+        course and of its lessons for the user and what can be unlocked next
+        """
+        graph = PrerequisiteGraph.for_catalog()
+        state = graph.user_state(request.user.id)
+
+        response = {
+            "next": graph.unlock_next(state),
+            "courses": graph.course_tree(state),
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def path(self, request, pk):
+        """
+        prerequisite courses of a course, from the first one to the course itself
+        """
+        graph = PrerequisiteGraph.for_catalog()
+
+        if int(pk) not in graph.courses:
+            raise Http404
+
+        state = graph.user_state(request.user.id)
+
+        return Response(graph.course_path_status(state, int(pk)), status=status.HTTP_200_OK)
+
 
-class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelViewSet):
+class LessonsAvailableViewSet(ReplicaReadViewSet, ConditionalGetViewSet, MultiSerializerViewSet,
+                              viewsets.ReadOnlyModelViewSet):
     """
     lessons of a course that students have access to, lessons have dependent lessons, 
     it is necessary to pass the dependent lesson in order to subscribe
@@ -149,34 +248,61 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
         'list': LessonPreviewSerializer,
         'send_test': SendTestSerializer
     }
+    # retrieve subscribes the user to the lesson
+    conditional_actions = ('list', )
+    replica_actions = ('list', 'get_test')
 
     def get_queryset(self):
         queryset = Lesson.objects.filter(
             course_id=self.kwargs.get('course_pk'),
             course__enrollments__user_id=self.request.user.id
         ).annotate(
-            is_approved=Exists(
-                LessonEnrollment
-                .objects
-                .filter(
-                    lesson_id=OuterRef('id'),
-                    user_id=self.request.user.id,
-                    is_approved=True
-                )
-            ),
-            dependent_is_approved=Exists(
-                LessonEnrollment
-                .objects
-                .filter(
-                    lesson_id=OuterRef('dependent_id'),
-                    user_id=self.request.user.id,
-                    is_approved=True
-                )
+            user_progress=FilteredRelation(
+                'progress',
+                condition=Q(progress__user_id=self.request.user.id)
             )
+        ).annotate(
+            is_approved=Coalesce('user_progress__is_approved', False),
+            dependent_is_approved=Coalesce(
+                'user_progress__dependent_is_approved', False),
         )
 
+        if self.action == 'retrieve':
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    LessonEnrollment
+                    .objects
+                    .filter(
+                        lesson_id=OuterRef('id'),
+                        user_id=self.request.user.id
+                    )
+                )
+            )
+
         return queryset
 
+    def get_validator_querysets(self):
+        course_id = self.kwargs.get('course_pk')
+        user_id = self.request.user.id
+
+        return [
+            Lesson.objects.by_course(course_id),
+            LessonProgress.objects.filter(user_id=user_id, lesson__course_id=course_id),
+            CourseEnrollment.objects.filter(user_id=user_id, course_id=course_id),
+        ]
+
+    def get_enrollment_snapshot(self, lesson_id):
+        """
+        enrollment state of the user in the course of the lesson, loaded once per request
+        """
+        snapshot = getattr(self, '_enrollment_snapshot', None)
+
+        if snapshot is None or not snapshot.has_lesson(lesson_id):
+            snapshot = Lesson.objects.snapshot(lesson_id, self.request.user.id)
+            self._enrollment_snapshot = snapshot
+
+        return snapshot
+
     def retrieve(self, request, *args, **kwargs):
         """
         get the content of the lesson, register the student if not registered
@@ -185,13 +311,20 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
             instance = self.get_object()
             user_id = request.user.id
 
-            if not Lesson.objects.is_subscribed(instance.id, user_id):
-                if not Lesson.objects.can_subscribe(instance.id, user_id):
-                    message = {"message": "Lesson not available to user"}
-                    return Response(message, status=status.HTTP_403_FORBIDDEN)
-
-                # subscribe the user to the lesson
-                Lesson.objects.subscribe(instance.id, user_id)
+            if not instance.is_subscribed:
+                # subscribe the user to the lesson if the prerequisites are met
+                try:
+                    created = Lesson.objects.ensure_enrollment(instance.id, user_id)
+                except IntegrityError:
+                    # a concurrent request of the same user inserted it first
+                    created = True
+
+                if not created:
+                    # lost the race against a concurrent request of the same user
+                    if not LessonEnrollment.objects.filter(
+                            lesson_id=instance.id, user_id=user_id).exists():
+                        message = {"message": "Lesson not available to user"}
+                        return Response(message, status=status.HTTP_403_FORBIDDEN)
 
             serializer = self.get_serializer(instance)
             return Response(serializer.data)
@@ -205,17 +338,29 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
         """
         Obtain the test of a lesson, it is necessary that the user is registered in the lesson
         """
-        lesson = get_object_or_404(Lesson.objects, pk=self.kwargs["pk"])
+        lesson_id = self.kwargs["pk"]
         user_id = request.user.id
 
-        if (Lesson.objects.is_subscribed(lesson.id, user_id)
-                and not Lesson.objects.is_approved(lesson.id, user_id)):
+        is_available = LessonEnrollment.objects.filter(
+            lesson_id=lesson_id,
+            user_id=user_id,
+            is_approved=False
+        ).exists()
+
+        if is_available:
+            payload = TestPayload.for_lesson(lesson_id)
+
+            if payload.matches(request.META.get('HTTP_IF_NONE_MATCH')):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(payload.content, content_type='application/json')
 
-            questions = Question.objects.filter(lesson_id=lesson.id)
+            response['ETag'] = payload.etag
+            response['Cache-Control'] = 'private, no-cache'
 
-            serializer = GetLessonQuestionSerializer(questions, many=True)
+            return response
 
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        get_object_or_404(Lesson.objects, pk=lesson_id)
 
         message = {"message": "the test is not available to the user"}
         return Response(message, status=status.HTTP_400_BAD_REQUEST)
@@ -223,7 +368,9 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
     @action(detail=True, methods=['post'])
     def send_test(self, request, pk, *args, **kwargs):
         """
-        subscribe a user to a lesson so they can be evaluated
+        subscribe a user to a lesson so they can be evaluated, with ?mode=async
+        the submission is stored and graded by the background workers, the
+        attempt is answered with 202 and polled for the result
         """
         lesson_id = pk
         user_id = request.user.id
@@ -231,8 +378,18 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        if (Lesson.objects.is_subscribed(lesson_id, user_id)
-                and not Lesson.objects.is_approved(lesson_id, user_id)):
+        snapshot = self.get_enrollment_snapshot(lesson_id)
+
+        if (Lesson.objects.is_subscribed(lesson_id, user_id, snapshot)
+                and not Lesson.objects.is_approved(lesson_id, user_id, snapshot)):
+
+            if request.query_params.get('mode') == 'async':
+                attempt = enqueue_attempt(
+                    user_id, lesson_id, serializer.data['questions'])
+                data = TestAttemptSerializer(attempt, context={'request': request}).data
+
+                return Response(data, status=status.HTTP_202_ACCEPTED,
+                                headers={'Location': data['url']})
 
             test_review = TestReview(
                 user_id, lesson_id, serializer.data['questions'])
@@ -248,9 +405,71 @@ class LessonsAvailableViewSet(MultiSerializerViewSet, viewsets.ReadOnlyModelView
         return Response(message, status=status.HTTP_403_FORBIDDEN)
 
 
+class TestAttemptViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    tests sent to be graded in the background, ?wait=seconds holds the request
+    until the attempt is graded or the seconds pass
+    """
+    serializer_class = TestAttemptSerializer
+    permission_classes = (HasValidStudentRole, )
+
+    def get_queryset(self):
+        return TestAttempt.objects.filter(user_id=self.request.user.id)
+
+    def retrieve(self, request, *args, **kwargs):
+        attempt = self.get_object()
+
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), ATTEMPT_MAX_WAIT)
+        except ValueError:
+            wait = 0
+
+        if wait > 0 and attempt.status in ('PENDING', 'RUNNING'):
+            attempt = wait_for_attempt(attempt.id, wait, ATTEMPT_WAIT_INTERVAL)
+
+        return Response(self.get_serializer(attempt).data)
+
+
+class StudentProgressViewSet(viewsets.ViewSet):
+    """
+    every course the student is enrolled in with its lessons, approvals,
+    scores and unlock state, for the home screen of the student
+    """
+    permission_classes = (HasValidStudentRole, )
+
+    def list(self, request):
+        dashboard = ProgressDashboard.for_user(request.user.id)
+
+        if dashboard.matches(request.META.get('HTTP_IF_NONE_MATCH')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(dashboard.content, content_type='application/json')
+
+        response['ETag'] = dashboard.etag
+        response['Cache-Control'] = 'private, no-cache'
+
+        return response
+
+
 @api_view(['POST'])
+@parser_classes([JSONParser, CSVParser, NDJSONParser])
 def logic_test(request):
-    serializer = LogicSerializer(data=request.data, many=True)
+    """
+    the body is a JSON list of {"N", "M"}, a columnar JSON object
+    {"N": [...], "M": [...]} or a CSV of N,M rows; the last two and
+    ?engine=vector are evaluated by the vectorized engine. A NDJSON body is
+    read and answered as a NDJSON stream, one result or error per line
+    """
+    if request.content_type.startswith(NDJSONParser.media_type):
+        return logic_test_stream(request.data)
+
+    data = request.data
+
+    if (isinstance(data, (dict, CSVTable))
+            or request.query_params.get('engine') == 'vector'):
+        return logic_test_vector(data)
+
+    serializer = LogicSerializer(data=data, many=True)
     serializer.is_valid(raise_exception=True)
 
     try:
@@ -265,3 +484,28 @@ def logic_test(request):
             "message": f"unexpected error: {ex}"}
 
         return Response(response, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def logic_test_vector(data):
+    try:
+        if isinstance(data, CSVTable):
+            logic = VectorLogicTest.from_table(data.header, data.rows)
+        elif isinstance(data, dict):
+            logic = VectorLogicTest.from_columns(data)
+        elif isinstance(data, list):
+            logic = VectorLogicTest.from_scenarios(data)
+        else:
+            raise InvalidScenarios({'non_field_errors': ["Expected a list of items"]})
+    except InvalidScenarios as ex:
+        return Response(ex.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({"result": logic.get_results()}, status=status.HTTP_200_OK)
+
+
+def logic_test_stream(scenarios):
+    lines = (
+        json.dumps(result, separators=(',', ':')) + '\n'
+        for result in stream_results(scenarios)
+    )
+
+    return StreamingHttpResponse(lines, content_type=NDJSONParser.media_type)